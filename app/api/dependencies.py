@@ -1,44 +1,211 @@
 import os
 from functools import lru_cache
 from dotenv import load_dotenv
-from database.supabase_db import SupabaseDB
-from services.openai_service import OpenAIService
+from services.openai_service import ModelRouter, OpenAIService
 from services.issue_service import IssueService
 from services.admin_service import AdminService
 from services.faq_service import FAQService
+from services.issue_sweeper import IssueSweeper
+from services.faq_search import FAQSearchIndex, VectorCompressor
+from services.lexical_search import LexicalFAQIndex
+from services.rate_limiter import ConcurrencyLimiter, MessageRateLimiter
+from services.live_feed import LiveFeed
+from database.realtime_events import get_realtime_source
+from monitoring.profiler import ProfileStore
+from monitoring.startup import StartupReport
 
 # Load environment variables
 load_dotenv()
 
 
 @lru_cache()
-def get_supabase_db():
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_KEY")
-    return SupabaseDB(supabase_url, supabase_key)
+def get_db():
+    """Storage backend selected by STORAGE_BACKEND (see README)"""
+    backend = os.getenv("STORAGE_BACKEND", "supabase").lower()
+
+    # Imported here so only the selected client library is loaded
+    if backend == "memory":
+        from database.memory_db import MemoryDB
+
+        return MemoryDB()
+
+    if backend == "sqlite":
+        from database.sqlite_db import SQLiteDB
+
+        return SQLiteDB(os.getenv("SQLITE_PATH", "customer_support.db"))
+
+    if backend == "postgres":
+        from database.postgres_db import PostgresDB
+
+        return PostgresDB(
+            os.getenv("DATABASE_URL"),
+            min_size=int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2")),
+            max_size=int(os.getenv("POSTGRES_POOL_MAX_SIZE", "10")),
+            statement_cache_size=int(os.getenv("POSTGRES_STATEMENT_CACHE_SIZE", "100")),
+        )
+
+    if backend == "supabase":
+        from database.supabase_db import SupabaseDB
+
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_KEY")
+        return SupabaseDB(supabase_url, supabase_key)
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
 
 
 @lru_cache()
 def get_openai_service():
     openai_api_key = os.getenv("OPENAI_API_KEY")
-    return OpenAIService(openai_api_key)
+    dimensions = os.getenv("OPENAI_EMBEDDING_DIMENSIONS")
+    router = ModelRouter(
+        full_model=os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo"),
+        fast_model=os.getenv("OPENAI_FAST_CHAT_MODEL") or None,
+        full_max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "500")),
+        fast_max_tokens=int(os.getenv("OPENAI_FAST_MAX_TOKENS", "250")),
+        fast_min_similarity=float(os.getenv("CHAT_FAST_MIN_SIMILARITY", "0.85")),
+        fast_max_history=int(os.getenv("CHAT_FAST_MAX_HISTORY", "6")),
+        canned_replies=os.getenv("CHAT_CANNED_REPLIES", "true").lower()
+        in ("true", "1", "yes"),
+    )
+    return OpenAIService(
+        openai_api_key,
+        embedding_model=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"),
+        embedding_dimensions=int(dimensions) if dimensions else None,
+        router=router,
+    )
+
+
+@lru_cache()
+def get_message_rate_limiter():
+    return MessageRateLimiter(
+        chat_capacity=float(os.getenv("CHAT_RATE_LIMIT_BURST", "5")),
+        chat_per_minute=float(os.getenv("CHAT_RATE_LIMIT_PER_MINUTE", "12")),
+        issue_capacity=float(os.getenv("ISSUE_RATE_LIMIT_BURST", "5")),
+        issue_per_minute=float(os.getenv("ISSUE_RATE_LIMIT_PER_MINUTE", "12")),
+    )
+
+
+@lru_cache()
+def get_llm_limiter():
+    return ConcurrencyLimiter(
+        max_in_flight=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+        retry_after=float(os.getenv("LLM_BUSY_RETRY_AFTER", "2")),
+    )
+
+
+@lru_cache()
+def get_faq_search():
+    """Compressed FAQ search tier, or None for exact search (the default)"""
+    compressor = VectorCompressor.parse(os.getenv("FAQ_SEARCH_TIER", ""))
+    if compressor is None:
+        return None
+
+    return FAQSearchIndex(
+        get_db(),
+        compressor,
+        candidates=int(os.getenv("FAQ_SEARCH_CANDIDATES", "50")),
+        refresh_seconds=float(os.getenv("FAQ_SEARCH_REFRESH_SECONDS", "300")),
+        snapshot_path=os.getenv("FAQ_SEARCH_SNAPSHOT") or None,
+    )
+
+
+@lru_cache()
+def get_lexical_index():
+    """Keyword first stage for FAQ search, or None when disabled (the default)"""
+    if os.getenv("FAQ_LEXICAL_SEARCH", "false").lower() not in ("1", "true", "yes"):
+        return None
+
+    return LexicalFAQIndex(
+        get_db(),
+        min_coverage=float(os.getenv("FAQ_LEXICAL_MIN_COVERAGE", "0.8")),
+        min_margin=float(os.getenv("FAQ_LEXICAL_MIN_MARGIN", "1.5")),
+        refresh_seconds=float(os.getenv("FAQ_SEARCH_REFRESH_SECONDS", "300")),
+    )
 
 
 @lru_cache()
 def get_issue_service():
-    supabase_db = get_supabase_db()
+    db = get_db()
     openai_service = get_openai_service()
-    return IssueService(supabase_db, openai_service)
+    return IssueService(
+        db,
+        openai_service,
+        get_llm_limiter(),
+        faq_search=get_faq_search(),
+        lexical_index=get_lexical_index(),
+    )
+
+
+@lru_cache()
+def get_issue_sweeper():
+    return IssueSweeper(
+        get_db(),
+        idle_seconds=int(float(os.getenv("ISSUE_IDLE_CLOSE_HOURS", "24")) * 3600),
+        archive_after_seconds=int(
+            float(os.getenv("MESSAGE_ARCHIVE_AFTER_DAYS", "30")) * 86400
+        ),
+        batch_size=int(os.getenv("ISSUE_SWEEP_BATCH_SIZE", "100")),
+    )
 
 
 @lru_cache()
 def get_admin_service():
-    supabase_db = get_supabase_db()
-    return AdminService(supabase_db)
+    db = get_db()
+    return AdminService(db)
 
 
 @lru_cache()
 def get_faq_service():
-    supabase_db = get_supabase_db()
+    db = get_db()
     openai_service = get_openai_service()
-    return FAQService(supabase_db, openai_service)
+    return FAQService(db, openai_service, get_faq_search(), get_lexical_index())
+
+
+@lru_cache()
+def get_live_feed():
+    """Push channel for admin dashboards, subscribed on first use"""
+    return LiveFeed(
+        lambda: get_realtime_source("api"),
+        buffer_size=int(os.getenv("LIVE_FEED_BUFFER_SIZE", "1000")),
+        max_pending=int(os.getenv("LIVE_FEED_MAX_PENDING", "1000")),
+        keepalive_seconds=float(os.getenv("LIVE_FEED_KEEPALIVE_SECONDS", "15")),
+    )
+
+
+@lru_cache()
+def get_profile_store():
+    return ProfileStore(os.getenv("PROFILE_DIR", "profiles"))
+
+
+async def warm_up(report: StartupReport):
+    """Build every client and index before the API serves its first request"""
+    with report.step("storage"):
+        db = get_db()
+        if hasattr(db, "connect"):
+            await db.connect()
+        # One round trip opens the HTTP connection or primes the pool
+        await db.get_open_issue_by_chat_id("warm-up")
+
+    with report.step("openai"):
+        get_openai_service()
+
+    with report.step("services"):
+        get_issue_service()
+        get_faq_service()
+        get_admin_service()
+        get_issue_sweeper()
+        get_message_rate_limiter()
+
+    with report.step("faq_indexes"):
+        for index in (get_faq_search(), get_lexical_index()):
+            if index is not None:
+                await index.refresh()
+
+
+async def shut_down():
+    await get_live_feed().stop()
+
+    db = get_db()
+    if hasattr(db, "close"):
+        await db.close()
@@ -2,8 +2,12 @@ from fastapi import APIRouter
 from api.private.admins import router as admins_router
 from api.private.issues import router as issues_router
 from api.private.faq import router as faq_router
+from api.private.profiles import router as profiles_router
+from api.private.live import router as live_router
 
 router = APIRouter()
 router.include_router(admins_router)
 router.include_router(issues_router)
 router.include_router(faq_router)
+router.include_router(profiles_router)
+router.include_router(live_router)
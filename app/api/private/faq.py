@@ -3,6 +3,7 @@ from typing import List
 from models.faq import FAQCreate, FAQUpdate, FAQResponse
 from services.faq_service import FAQService
 from api.dependencies import get_faq_service
+from api.responses import FastJSONResponse
 
 router = APIRouter(prefix="/faq", tags=["faq"])
 
@@ -12,9 +13,9 @@ async def get_all_faqs(faq_service: FAQService = Depends(get_faq_service)):
     """Get all FAQ entries"""
     faqs = await faq_service.get_all_faqs()
 
-    return [
-        FAQResponse(id=faq.id, question=faq.question, answer=faq.answer) for faq in faqs
-    ]
+    return FastJSONResponse(
+        [{"id": faq.id, "question": faq.question, "answer": faq.answer} for faq in faqs]
+    )
 
 
 @router.post("", response_model=FAQResponse, status_code=201)
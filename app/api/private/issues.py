@@ -1,8 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
-from models.issue import IssueResponse, MessageCreate, IssueWithMessages, Issue
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict, List, Optional
+from models.issue import (
+    BulkIssues,
+    BulkItemResult,
+    BulkMessageCreate,
+    BulkOutcome,
+    BulkResponse,
+    BulkStatusUpdate,
+    ClosedIssue,
+    IssueResponse,
+    MessageCreate,
+    IssueWithMessages,
+    Issue,
+    SweepResponse,
+)
 from services.issue_service import IssueService
-from api.dependencies import get_issue_service
+from services.issue_sweeper import IssueSweeper
+from api.dependencies import get_issue_service, get_issue_sweeper
+from api.responses import FastJSONResponse
 
 router = APIRouter(prefix="/issues", tags=["issues"])
 
@@ -12,7 +27,9 @@ async def get_all_issues(issue_service: IssueService = Depends(get_issue_service
     """Get all issues (open and closed)"""
     issues = await issue_service.get_all_issues()
 
-    return [IssueResponse(issue_id=issue.id, status=issue.status) for issue in issues]
+    return FastJSONResponse(
+        [{"issue_id": issue.id, "status": issue.status.value} for issue in issues]
+    )
 
 
 @router.get("/manual", response_model=List[IssueResponse])
@@ -20,7 +37,68 @@ async def get_manual_issues(issue_service: IssueService = Depends(get_issue_serv
     """Get only issues in manual mode"""
     issues = await issue_service.get_manual_issues()
 
-    return [IssueResponse(issue_id=issue.id, status=issue.status) for issue in issues]
+    return FastJSONResponse(
+        [{"issue_id": issue.id, "status": issue.status.value} for issue in issues]
+    )
+
+
+@router.post("/sweep", response_model=SweepResponse)
+async def sweep_issues(sweeper: IssueSweeper = Depends(get_issue_sweeper)):
+    """Close idle issues and archive messages of long-closed ones"""
+    closed, archived_issues, archived_messages = await sweeper.sweep()
+
+    return SweepResponse(
+        closed=[
+            ClosedIssue(issue_id=issue.id, telegram_chat_id=issue.telegram_chat_id)
+            for issue in closed
+        ],
+        archived_issues=archived_issues,
+        archived_messages=archived_messages,
+    )
+
+
+def _bulk_response(outcomes: Dict[str, BulkOutcome]) -> BulkResponse:
+    return BulkResponse(
+        results=[
+            BulkItemResult(issue_id=issue_id, outcome=outcome)
+            for issue_id, outcome in outcomes.items()
+        ],
+        done=sum(outcome == BulkOutcome.DONE for outcome in outcomes.values()),
+    )
+
+
+# Bulk actions are declared before the /{issue_id} routes, which would
+# otherwise take "bulk" for an issue id
+@router.post("/bulk/close", response_model=BulkResponse)
+async def close_issues(
+    request: BulkIssues, issue_service: IssueService = Depends(get_issue_service)
+):
+    """Close many issues at once"""
+    return _bulk_response(await issue_service.close_issues(request.issue_ids))
+
+
+@router.post("/bulk/status", response_model=BulkResponse)
+async def update_issues_status(
+    request: BulkStatusUpdate,
+    issue_service: IssueService = Depends(get_issue_service),
+):
+    """Set the status of many issues at once; closed issues are not reopened"""
+    outcomes = await issue_service.update_issues_status(
+        request.issue_ids, request.status
+    )
+    return _bulk_response(outcomes)
+
+
+@router.post("/bulk/messages", response_model=BulkResponse)
+async def add_admin_message_to_issues(
+    request: BulkMessageCreate,
+    issue_service: IssueService = Depends(get_issue_service),
+):
+    """Add the same admin message to many issues"""
+    outcomes = await issue_service.add_admin_message_to_issues(
+        request.issue_ids, "Admin", request.message
+    )
+    return _bulk_response(outcomes)
 
 
 @router.get("/{issue_id}", response_model=Issue)
@@ -33,21 +111,23 @@ async def get_issue(
     if not issue:
         raise HTTPException(status_code=404, detail="Issue not found")
 
-    return issue
+    return FastJSONResponse(issue)
 
 
 @router.get("/{issue_id}/messages", response_model=IssueWithMessages)
 async def get_issue_messages(
-    issue_id: str, issue_service: IssueService = Depends(get_issue_service)
+    issue_id: str,
+    after: int = Query(0, ge=0, description="Only messages with a greater seq"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    issue_service: IssueService = Depends(get_issue_service),
 ):
-    """Get all messages in an issue"""
-    issue = await issue_service.get_issue(issue_id)
-    issue_messages = await issue_service.get_messages(issue_id)
+    """Get the messages in an issue, optionally only those after a seq"""
+    issue_messages = await issue_service.get_messages(issue_id, after, limit)
 
-    if not issue:
+    if not issue_messages:
         raise HTTPException(status_code=404, detail="Issue not found")
 
-    return IssueWithMessages(issue_id=issue.id, messages=issue_messages.messages)
+    return FastJSONResponse(issue_messages)
 
 
 @router.post("/{issue_id}/messages")
@@ -0,0 +1,45 @@
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import StreamingResponse
+from models.issue import IssueStatus
+from services.live_feed import LiveFeed
+from api.dependencies import get_live_feed
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+@router.get("")
+async def live_feed(
+    issue_id: Optional[str] = None,
+    status: Optional[IssueStatus] = None,
+    cursor: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+    feed: LiveFeed = Depends(get_live_feed),
+):
+    """Server-Sent Events stream of issue status changes and new messages"""
+    try:
+        await feed.start()
+    except Exception:
+        logger.exception("Could not subscribe the live feed to realtime events")
+        raise HTTPException(status_code=503, detail="Live feed unavailable")
+
+    # Browsers resend the id of the last event they got when reconnecting
+    subscription = feed.subscribe(
+        issue_id, status.value if status else None, last_event_id or cursor
+    )
+
+    async def stream():
+        try:
+            async for frame in subscription.frames(feed.keepalive_seconds):
+                yield frame
+        finally:
+            feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
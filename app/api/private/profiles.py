@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+from monitoring.profiler import ProfileStore
+from api.dependencies import get_profile_store
+
+router = APIRouter(prefix="/profiles", tags=["profiles"])
+
+
+@router.get("/{name}", response_class=PlainTextResponse)
+async def get_profile(
+    name: str, profile_store: ProfileStore = Depends(get_profile_store)
+):
+    """Download a stored request profile (folded stacks for flamegraph tools)"""
+    profile = profile_store.load(name)
+
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return profile
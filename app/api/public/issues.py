@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from typing import Optional
-from models.issue import IssueCreate, IssueResponse, MessageCreate, MessageResponse
+from models.issue import (
+    IssueCreate,
+    IssueCreateResponse,
+    IssueResponse,
+    MessageCreate,
+    MessageResponse,
+)
 from services.issue_service import IssueService
-from api.dependencies import get_issue_service
+from services.rate_limiter import MessageRateLimiter, RateLimitExceeded
+from api.dependencies import get_issue_service, get_message_rate_limiter
 
 router = APIRouter(prefix="/issues", tags=["issues"])
 
@@ -20,23 +27,21 @@ async def check_open_issue(
     return IssueResponse(issue_id=issue.id, status=issue.status)
 
 
-@router.post("", response_model=IssueResponse, status_code=201)
+@router.post("", response_model=IssueCreateResponse, status_code=201)
 async def create_issue(
-    issue_data: IssueCreate, issue_service: IssueService = Depends(get_issue_service)
+    issue_data: IssueCreate,
+    response: Response,
+    issue_service: IssueService = Depends(get_issue_service),
 ):
-    """Create a new issue"""
-    # Check if user already has an open issue
-    existing_issue = await issue_service.get_open_issue(issue_data.telegram_chat_id)
-
-    if existing_issue:
-        raise HTTPException(status_code=400, detail="User already has an open issue")
-
-    # Create new issue
-    issue = await issue_service.create_issue(
+    """Create a new issue, or return the user's active one (200, created false)"""
+    issue, created = await issue_service.get_or_create_issue(
         issue_data.telegram_chat_id, issue_data.username
     )
 
-    return IssueResponse(issue_id=issue.id, status=issue.status)
+    if not created:
+        response.status_code = 200
+
+    return IssueCreateResponse(issue_id=issue.id, status=issue.status, created=created)
 
 
 @router.post("/{issue_id}/messages", response_model=Optional[MessageResponse])
@@ -44,6 +49,7 @@ async def add_user_message(
     issue_id: str,
     message_data: MessageCreate,
     issue_service: IssueService = Depends(get_issue_service),
+    rate_limiter: MessageRateLimiter = Depends(get_message_rate_limiter),
 ):
     """Add a message to an issue and get automatic GPT response"""
     # Get issue
@@ -55,10 +61,26 @@ async def add_user_message(
     if issue.status == "closed":
         raise HTTPException(status_code=403, detail="Issue is closed")
 
-    # Add message and get response
-    result = await issue_service.add_user_message(
-        issue_id, issue.username, message_data.message
-    )
+    try:
+        # Per-chat and per-issue token buckets
+        rate_limiter.acquire(issue.telegram_chat_id, issue_id)
+
+        # Add message and get response
+        try:
+            result = await issue_service.add_user_message(
+                issue_id, issue.username, message_data.message
+            )
+        except RateLimitExceeded:
+            # The global LLM cap rejected it before anything was stored, so
+            # the resent message shouldn't be charged to the chat twice
+            rate_limiter.release(issue.telegram_chat_id, issue_id)
+            raise
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=e.message,
+            headers={"Retry-After": e.retry_after_header},
+        )
 
     return result
 
@@ -0,0 +1,16 @@
+from typing import Any
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded by pydantic-core.
+
+    Models, enums, lists and dicts are serialized straight to bytes in Rust,
+    without jsonable_encoder or json.dumps. Returning it from an endpoint also
+    skips FastAPI's validation of the result against response_model, so use it
+    for data built from trusted storage rows.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
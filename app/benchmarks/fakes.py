@@ -0,0 +1,160 @@
+"""Offline stand-ins for SupabaseDB and OpenAIService used by the benchmarks.
+
+Both keep everything in memory and wait for a configurable, randomly drawn
+latency on each call, so the API can be load tested without network access.
+"""
+
+import time
+import random
+import asyncio
+import hashlib
+import math
+from dataclasses import dataclass
+import numpy as np
+import inspect
+from typing import List, Optional, Dict, Any
+from models.issue import ChatTurn
+from database.storage import StorageBackend
+from database.memory_db import MemoryDB
+from services.openai_service import ModelRouter
+
+EMBEDDING_DIMENSION = 1536
+
+
+@dataclass
+class LatencyModel:
+    """Log-normal latency distribution described by its median and p95 (seconds).
+
+    Parsed from strings like "lognormal:20ms:80ms", "fixed:5ms" or "0".
+    """
+
+    median: float = 0.0
+    p95: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        def seconds(value: str) -> float:
+            if value.endswith("ms"):
+                return float(value[:-2]) / 1000
+            if value.endswith("s"):
+                return float(value[:-1])
+            return float(value)
+
+        parts = spec.split(":")
+        if parts[0] == "lognormal" and len(parts) == 3:
+            return cls(seconds(parts[1]), seconds(parts[2]))
+        if parts[0] == "fixed" and len(parts) == 2:
+            return cls(seconds(parts[1]), seconds(parts[1]))
+        if len(parts) == 1:
+            return cls(seconds(parts[0]), seconds(parts[0]))
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.p95 <= self.median:
+            return self.median
+        # p95 of a log-normal is median * exp(1.645 * sigma)
+        sigma = math.log(self.p95 / self.median) / 1.645
+        return rng.lognormvariate(math.log(self.median), sigma)
+
+
+class LatencyInjector:
+    """Waits for a sampled latency, either cooperatively or by blocking the loop.
+
+    The production SupabaseDB and OpenAIService call synchronous SDK clients
+    from coroutines, which blocks the event loop; "blocking" mode reproduces
+    that, "async" mode shows what non-blocking clients would achieve.
+    """
+
+    def __init__(self, model: LatencyModel, blocking: bool, seed: int = 0):
+        self.model = model
+        self.blocking = blocking
+        self.rng = random.Random(seed)
+
+    async def wait(self):
+        delay = self.model.sample(self.rng)
+        if delay <= 0:
+            return
+        if self.blocking:
+            time.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+
+
+def fake_embedding(text: str) -> np.ndarray:
+    """Deterministic unit vector derived from the text (same text, same vector)"""
+    seed = hashlib.sha256(text.lower().encode("utf-8")).digest()
+    rng = np.random.default_rng(list(seed))
+    vector = rng.standard_normal(EMBEDDING_DIMENSION).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class FakeOpenAIService:
+    """OpenAIService stand-in with canned replies and hashed embeddings"""
+
+    def __init__(
+        self,
+        embedding_latency: LatencyInjector,
+        completion_latency: LatencyInjector,
+        fast_completion_latency: Optional[LatencyInjector] = None,
+    ):
+        self.embedding_latency = embedding_latency
+        self.completion_latency = completion_latency
+        self.fast_completion_latency = fast_completion_latency or completion_latency
+        self.embedding_model = "fake-embedding"
+        self.router = ModelRouter("fake-chat", "fake-chat-fast")
+        self.chat_model = self.router.full_model
+
+    @property
+    def embedding_version(self) -> str:
+        return self.embedding_model
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        await self.embedding_latency.wait()
+        return fake_embedding(text)
+
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        await self.embedding_latency.wait()
+        return [fake_embedding(text) for text in texts]
+
+    async def generate_response(
+        self,
+        messages: List[ChatTurn],
+        faq_context: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        route = self.router.route(messages, faq_context)
+        if route.reply is not None:
+            return route.reply
+
+        if route.tier == "fast":
+            await self.fast_completion_latency.wait()
+        else:
+            await self.completion_latency.wait()
+        if faq_context:
+            return faq_context[0]["answer"]
+        return "Thanks for reaching out! Could you share a few more details?"
+
+
+class FakeSupabaseDB:
+    """Storage backend wrapper injecting one sampled latency per call.
+
+    Wraps MemoryDB by default; any StorageBackend (e.g. SQLiteDB) can be used.
+    """
+
+    def __init__(
+        self, latency: LatencyInjector, backend: Optional[StorageBackend] = None
+    ):
+        self.latency = latency
+        self.backend = backend or MemoryDB()
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.backend, name)
+        if not inspect.iscoroutinefunction(attribute):
+            return attribute
+
+        async def call(*args, **kwargs):
+            await self.latency.wait()
+            return await attribute(*args, **kwargs)
+
+        return call
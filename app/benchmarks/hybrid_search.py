@@ -0,0 +1,275 @@
+"""Latency and top-1 agreement of the lexical first stage against vector search.
+
+Every labelled query is answered twice: by vector search alone (embedding
+plus search_similar_questions) and by the hybrid path of IssueService
+(lexical first stage, skipping the embedding on confident matches, reciprocal
+rank fusion otherwise). The report lists latency, embedding calls, top-1
+accuracy against the labels and top-1 agreement between the two.
+
+By default embeddings are character-trigram hashes with a simulated OpenAI
+latency, so it runs offline; they capture spelling, not meaning, so run with
+--embeddings openai (OPENAI_API_KEY) to judge agreement on paraphrases.
+
+Usage (from the app directory):
+
+    python -m benchmarks.hybrid_search
+    python -m benchmarks.hybrid_search --embeddings openai --threshold 0.7
+    python -m benchmarks.hybrid_search --faqs my_faq.csv --queries my_queries.csv
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import zlib
+import asyncio
+import argparse
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from database.memory_db import MemoryDB
+from services.issue_service import IssueService
+from services.lexical_search import LexicalFAQIndex
+from services.openai_service import OpenAIService
+from benchmarks.fakes import EMBEDDING_DIMENSION, LatencyInjector, LatencyModel
+from benchmarks.stats import percentile
+
+load_dotenv()
+
+APP_DIR = os.path.dirname(os.path.dirname(__file__))
+FAQ_CSV = os.path.join(APP_DIR, "gameshop_faq.csv")
+QUERY_CSV = os.path.join(os.path.dirname(__file__), "gameshop_queries.csv")
+
+
+def trigram_embedding(text: str) -> np.ndarray:
+    """Unit vector of hashed character trigrams, a cheap offline stand-in"""
+    vector = np.zeros(EMBEDDING_DIMENSION, dtype=np.float32)
+    padded = f"  {text.lower()} "
+    for i in range(len(padded) - 2):
+        bucket = zlib.crc32(padded[i : i + 3].encode("utf-8"))
+        vector[bucket % EMBEDDING_DIMENSION] += 1.0 if bucket & 1 << 31 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class TrigramEmbeddings:
+    """generate_embedding of OpenAIService with trigram vectors and fake latency"""
+
+    def __init__(self, latency: LatencyInjector):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        self.calls += 1
+        await self.latency.wait()
+        return trigram_embedding(text)
+
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        return [trigram_embedding(text) for text in texts]
+
+
+class CountingEmbeddings:
+    """OpenAIService wrapper counting embedding calls"""
+
+    def __init__(self, openai_service: OpenAIService):
+        self.openai_service = openai_service
+        self.calls = 0
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        self.calls += 1
+        return await self.openai_service.generate_embedding(text)
+
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        return await self.openai_service.generate_embeddings(texts)
+
+
+def read_csv(path: str) -> List[Dict[str, str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+class ThresholdDB(MemoryDB):
+    """MemoryDB whose vector search uses the benchmark's threshold"""
+
+    def __init__(self, threshold: float):
+        super().__init__()
+        self.threshold = threshold
+
+    async def search_similar_questions(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict]:
+        return await super().search_similar_questions(
+            query_embedding, self.threshold, limit
+        )
+
+
+async def answer_all(
+    service: IssueService, embeddings, queries: List[Dict[str, str]]
+) -> Dict[str, object]:
+    top, embedded, durations = [], [], []
+    for query in queries:
+        calls = embeddings.calls
+        start = time.perf_counter()
+        faqs = await service._find_faqs(query["Query"])
+        durations.append(time.perf_counter() - start)
+        top.append(faqs[0]["question"] if faqs else None)
+        embedded.append(embeddings.calls > calls)
+
+    durations.sort()
+    return {
+        "top": top,
+        "embedded": embedded,
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 3),
+    }
+
+
+def share(flags: List[bool]) -> float:
+    return round(sum(flags) / len(flags), 4) if flags else 0.0
+
+
+async def run(args) -> Dict:
+    if args.embeddings == "openai":
+        embeddings = CountingEmbeddings(
+            OpenAIService(
+                os.getenv("OPENAI_API_KEY"),
+                embedding_model=os.getenv(
+                    "OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"
+                ),
+            )
+        )
+    else:
+        embeddings = TrigramEmbeddings(
+            LatencyInjector(LatencyModel.parse(args.embedding_latency), False, 1)
+        )
+
+    faqs = read_csv(args.faqs)
+    queries = read_csv(args.queries)
+
+    db = ThresholdDB(args.threshold)
+    vectors = await embeddings.generate_embeddings([faq["Question"] for faq in faqs])
+    for faq, vector in zip(faqs, vectors):
+        await db.create_faq(faq["Question"], faq["Answer"], vector)
+
+    lexical_index = LexicalFAQIndex(
+        db, min_coverage=args.min_coverage, min_margin=args.min_margin
+    )
+    await lexical_index.refresh()
+
+    vector = await answer_all(IssueService(db, embeddings), embeddings, queries)
+    hybrid = await answer_all(
+        IssueService(db, embeddings, lexical_index=lexical_index), embeddings, queries
+    )
+
+    expected = [query["Question"] for query in queries]
+    lexical = [i for i, embedded in enumerate(hybrid["embedded"]) if not embedded]
+    modes = {}
+    for name, result in (("vector", vector), ("hybrid", hybrid)):
+        modes[name] = {
+            "embedding_calls": sum(result["embedded"]),
+            "accuracy": share([a == b for a, b in zip(result["top"], expected)]),
+            "p50_ms": result["p50_ms"],
+            "p95_ms": result["p95_ms"],
+            "mean_ms": result["mean_ms"],
+        }
+
+    return {
+        "meta": {
+            "timestamp": int(time.time()),
+            "embeddings": args.embeddings,
+            "faqs": len(faqs),
+            "queries": len(queries),
+            "threshold": args.threshold,
+            "min_coverage": args.min_coverage,
+            "min_margin": args.min_margin,
+        },
+        "modes": modes,
+        "agreement": share([a == b for a, b in zip(vector["top"], hybrid["top"])]),
+        "lexical_answers": len(lexical),
+        "lexical_accuracy": share([hybrid["top"][i] == expected[i] for i in lexical]),
+        "disagreements": [
+            {
+                "query": queries[i]["Query"],
+                "expected": expected[i],
+                "vector": vector["top"][i],
+                "hybrid": hybrid["top"][i],
+                "lexical": not hybrid["embedded"][i],
+            }
+            for i in range(len(queries))
+            if vector["top"][i] != hybrid["top"][i]
+        ],
+    }
+
+
+def print_report(results: Dict, verbose: bool):
+    meta = results["meta"]
+    print(
+        f"{meta['faqs']} FAQs, {meta['queries']} queries, "
+        f"{meta['embeddings']} embeddings"
+    )
+    print(
+        f"{'mode':<10}{'embeddings':>12}{'top-1 acc':>11}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}"
+    )
+    for name, mode in results["modes"].items():
+        print(
+            f"{name:<10}{mode['embedding_calls']:>12}{mode['accuracy']:>11.3f}"
+            f"{mode['p50_ms']:>10.2f}{mode['p95_ms']:>10.2f}{mode['mean_ms']:>10.2f}"
+        )
+    print(
+        f"\ntop-1 agreement: {results['agreement']:.3f}; "
+        f"answered lexically: {results['lexical_answers']}/{meta['queries']} "
+        f"(top-1 accuracy {results['lexical_accuracy']:.3f})"
+    )
+
+    if verbose:
+        for row in results["disagreements"]:
+            source = "lexical" if row["lexical"] else "fused"
+            print(
+                f"\n{row['query']!r}\n  expected: {row['expected']}\n"
+                f"  vector:   {row['vector']}\n  hybrid:   {row['hybrid']} ({source})"
+            )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--faqs", default=FAQ_CSV, help="Question,Answer CSV")
+    parser.add_argument(
+        "--queries", default=QUERY_CSV, help="Query,Question CSV of labelled queries"
+    )
+    parser.add_argument(
+        "--embeddings", choices=["trigram", "openai"], default="trigram"
+    )
+    parser.add_argument(
+        "--embedding-latency",
+        default="lognormal:120ms:300ms",
+        help="simulated latency of trigram embeddings",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.0, help="vector match threshold"
+    )
+    parser.add_argument("--min-coverage", type=float, default=0.8)
+    parser.add_argument("--min-margin", type=float, default=1.5)
+    parser.add_argument(
+        "--verbose", action="store_true", help="list queries where the modes disagree"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print_report(results, args.verbose)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,547 @@
+"""End-to-end load benchmark for the Customer Support API.
+
+The FastAPI app runs in-process (no sockets, no network) against
+FakeSupabaseDB and FakeOpenAIService, while virtual users drive a weighted
+mix of bot and admin traffic. Results are printed and can be written as JSON
+to compare two versions.
+
+Usage (from the app directory):
+
+    python -m benchmarks.load_test --duration 30 --users 50 --output new.json
+    python -m benchmarks.load_test --compare old.json new.json
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from main import app
+from api.dependencies import (
+    get_admin_service,
+    get_faq_service,
+    get_issue_service,
+    get_message_rate_limiter,
+)
+from database.memory_db import MemoryDB
+from database.sqlite_db import SQLiteDB
+from services.admin_service import AdminService
+from services.faq_service import FAQService
+from services.issue_service import IssueService
+from services.rate_limiter import ConcurrencyLimiter, MessageRateLimiter
+from benchmarks.stats import percentile
+from benchmarks.fakes import (
+    FakeOpenAIService,
+    FakeSupabaseDB,
+    LatencyInjector,
+    LatencyModel,
+    fake_embedding,
+)
+
+FAQ_CSV = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gameshop_faq.csv")
+
+# Relative weight of each virtual-user action
+DEFAULT_MIX = {
+    "chat_turn": 50,
+    "new_issue": 8,
+    "escalate": 5,
+    "admin_reply": 10,
+    "close": 5,
+    "faq_list": 10,
+    "faq_create": 4,
+    "faq_update": 4,
+    "faq_delete": 4,
+}
+
+SMALL_TALK = [
+    "hi",
+    "thanks!",
+    "I need help with my order",
+    "The download is stuck at 99%",
+    "Can someone call me back?",
+]
+
+
+class Recorder:
+    """Collects latencies and outcomes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.rejected: Dict[str, int] = defaultdict(int)
+
+    def record(
+        self, endpoint: str, seconds: float, status: int, expected: Tuple[int, ...]
+    ):
+        self.latencies[endpoint].append(seconds)
+        if status == 429:
+            self.rejected[endpoint] += 1
+        elif status not in expected:
+            self.errors[endpoint] += 1
+
+
+def summarize(values: List[float], elapsed: float, errors: int, rejected: int) -> Dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round(len(ordered) / elapsed, 3) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+class VirtualUser:
+    """One Telegram user plus a share of admin/FAQ maintenance traffic"""
+
+    def __init__(
+        self,
+        user_id: int,
+        client: httpx.AsyncClient,
+        recorder: Recorder,
+        rng: random.Random,
+        questions: List[str],
+        shared: Dict,
+    ):
+        self.chat_id = f"bench-{user_id}"
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.questions = questions
+        self.shared = shared
+        self.issue_id: Optional[str] = None
+        self.status: Optional[str] = None
+
+    async def request(
+        self,
+        endpoint: str,
+        method: str,
+        url: str,
+        expected: Tuple[int, ...] = (200, 201),
+        **kwargs,
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.record(
+            endpoint, time.perf_counter() - start, response.status_code, expected
+        )
+        return response
+
+    async def new_issue(self):
+        if self.issue_id:
+            return await self.chat_turn()
+
+        response = await self.request(
+            "POST /api/public/issues",
+            "POST",
+            "/api/public/issues",
+            json={"telegram_chat_id": self.chat_id, "username": f"@{self.chat_id}"},
+        )
+        if response.status_code in (200, 201):
+            self.issue_id = response.json()["issue_id"]
+            self.status = response.json()["status"]
+            if response.json()["created"]:
+                self.shared["issues"].append(self.issue_id)
+
+    async def chat_turn(self):
+        if not self.issue_id:
+            return await self.new_issue()
+
+        # The user bot looks the issue up before every message
+        await self.request(
+            "GET /api/public/issues/{telegram_chat_id}",
+            "GET",
+            f"/api/public/issues/{self.chat_id}",
+        )
+
+        if self.rng.random() < 0.6:
+            text = self.rng.choice(self.questions)
+        else:
+            text = self.rng.choice(SMALL_TALK)
+
+        await self.request(
+            "POST /api/public/issues/{issue_id}/messages",
+            "POST",
+            f"/api/public/issues/{self.issue_id}/messages",
+            json={"message": text},
+        )
+
+    async def escalate(self):
+        if not self.issue_id or self.status != "open":
+            return await self.chat_turn()
+
+        response = await self.request(
+            "PUT /api/public/issues/{issue_id}/manual",
+            "PUT",
+            f"/api/public/issues/{self.issue_id}/manual",
+            expected=(200, 400),
+        )
+        if response.status_code == 200:
+            self.status = "manual"
+
+    async def admin_reply(self):
+        if not self.shared["issues"]:
+            return await self.new_issue()
+
+        issue_id = self.rng.choice(self.shared["issues"])
+        await self.request(
+            "GET /api/private/issues/{issue_id}/messages",
+            "GET",
+            f"/api/private/issues/{issue_id}/messages",
+        )
+        await self.request(
+            "POST /api/private/issues/{issue_id}/messages",
+            "POST",
+            f"/api/private/issues/{issue_id}/messages",
+            json={"message": "Hi, an agent here. Let me check that for you."},
+        )
+
+    async def close(self):
+        if not self.issue_id:
+            return await self.new_issue()
+
+        await self.request(
+            "POST /api/public/issues/{issue_id}/close",
+            "POST",
+            f"/api/public/issues/{self.issue_id}/close",
+            expected=(200, 400),
+        )
+        if self.issue_id in self.shared["issues"]:
+            self.shared["issues"].remove(self.issue_id)
+        self.issue_id = None
+        self.status = None
+
+    async def faq_list(self):
+        await self.request("GET /api/private/faq", "GET", "/api/private/faq")
+
+    async def faq_create(self):
+        response = await self.request(
+            "POST /api/private/faq",
+            "POST",
+            "/api/private/faq",
+            json={
+                "question": f"Benchmark question {self.rng.random()}?",
+                "answer": "Benchmark answer.",
+            },
+        )
+        if response.status_code == 201:
+            self.shared["faqs"].append(response.json()["id"])
+
+    async def faq_update(self):
+        if not self.shared["faqs"]:
+            return await self.faq_create()
+
+        faq_id = self.rng.choice(self.shared["faqs"])
+        await self.request(
+            "PUT /api/private/faq/{faq_id}",
+            "PUT",
+            f"/api/private/faq/{faq_id}",
+            json={
+                "question": f"Updated question {self.rng.random()}?",
+                "answer": "Updated.",
+            },
+            expected=(200, 404),
+        )
+
+    async def faq_delete(self):
+        if not self.shared["faqs"]:
+            return await self.faq_create()
+
+        faq_id = self.shared["faqs"].pop(self.rng.randrange(len(self.shared["faqs"])))
+        await self.request(
+            "DELETE /api/private/faq/{faq_id}",
+            "DELETE",
+            f"/api/private/faq/{faq_id}",
+            expected=(200, 404),
+        )
+
+    async def run(self, mix: Dict[str, int], deadline: float, think_time: float):
+        actions = list(mix)
+        weights = [mix[action] for action in actions]
+
+        while time.perf_counter() < deadline:
+            action = self.rng.choices(actions, weights)[0]
+            await getattr(self, action)()
+            if think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / think_time))
+
+
+def load_faqs() -> List[Dict[str, str]]:
+    with open(FAQ_CSV, "r", encoding="utf-8") as file:
+        return [
+            {"question": row["Question"], "answer": row["Answer"]}
+            for row in csv.DictReader(file)
+        ]
+
+
+def build_fakes(args) -> Tuple[FakeSupabaseDB, FakeOpenAIService]:
+    blocking = args.io_mode == "blocking"
+    backend = SQLiteDB(args.sqlite_path) if args.backend == "sqlite" else MemoryDB()
+    db = FakeSupabaseDB(
+        LatencyInjector(LatencyModel.parse(args.db_latency), blocking, args.seed),
+        backend,
+    )
+    openai_service = FakeOpenAIService(
+        LatencyInjector(
+            LatencyModel.parse(args.embedding_latency), blocking, args.seed + 1
+        ),
+        LatencyInjector(
+            LatencyModel.parse(args.completion_latency), blocking, args.seed + 2
+        ),
+        LatencyInjector(
+            LatencyModel.parse(args.fast_completion_latency or args.completion_latency),
+            blocking,
+            args.seed + 3,
+        ),
+    )
+    return db, openai_service
+
+
+def install_fakes(db: FakeSupabaseDB, openai_service: FakeOpenAIService, args):
+    """Point the API dependencies at the in-memory stand-ins"""
+    llm_limiter = (
+        ConcurrencyLimiter(args.llm_concurrency) if args.llm_concurrency else None
+    )
+    issue_service = IssueService(db, openai_service, llm_limiter)
+    faq_service = FAQService(db, openai_service)
+    admin_service = AdminService(db)
+
+    if args.rate_limits:
+        rate_limiter = get_message_rate_limiter()
+    else:
+        unlimited = float("inf")
+        rate_limiter = MessageRateLimiter(unlimited, 0, unlimited, 0)
+
+    app.dependency_overrides[get_issue_service] = lambda: issue_service
+    app.dependency_overrides[get_faq_service] = lambda: faq_service
+    app.dependency_overrides[get_admin_service] = lambda: admin_service
+    app.dependency_overrides[get_message_rate_limiter] = lambda: rate_limiter
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args) -> Dict:
+    db, openai_service = build_fakes(args)
+    install_fakes(db, openai_service, args)
+
+    # Seed the FAQ table directly, without paying the injected latency
+    faqs = load_faqs()
+    for faq in faqs:
+        await db.backend.create_faq(
+            faq["question"], faq["answer"], fake_embedding(faq["question"])
+        )
+    questions = [faq["question"] for faq in faqs]
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = json.loads(args.mix)
+
+    recorder = Recorder()
+    shared = {"issues": [], "faqs": []}
+    rng = random.Random(args.seed)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        users = [
+            VirtualUser(
+                i, client, recorder, random.Random(rng.random()), questions, shared
+            )
+            for i in range(args.users)
+        ]
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(
+            *(user.run(mix, deadline, args.think_time) for user in users)
+        )
+        elapsed = time.perf_counter() - start
+
+    app.dependency_overrides.clear()
+
+    all_latencies = [
+        value for values in recorder.latencies.values() for value in values
+    ]
+    return {
+        "meta": {
+            "label": args.label,
+            "revision": git_revision(),
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "elapsed_s": round(elapsed, 3),
+            "config": {
+                "users": args.users,
+                "duration": args.duration,
+                "think_time": args.think_time,
+                "io_mode": args.io_mode,
+                "backend": args.backend,
+                "db_latency": args.db_latency,
+                "embedding_latency": args.embedding_latency,
+                "completion_latency": args.completion_latency,
+                "fast_completion_latency": args.fast_completion_latency,
+                "llm_concurrency": args.llm_concurrency,
+                "rate_limits": args.rate_limits,
+                "mix": mix,
+                "seed": args.seed,
+            },
+        },
+        "overall": summarize(
+            all_latencies,
+            elapsed,
+            sum(recorder.errors.values()),
+            sum(recorder.rejected.values()),
+        ),
+        "endpoints": {
+            endpoint: summarize(
+                values, elapsed, recorder.errors[endpoint], recorder.rejected[endpoint]
+            )
+            for endpoint, values in sorted(recorder.latencies.items())
+        },
+    }
+
+
+def print_report(results: Dict):
+    header = f"{'endpoint':<50} {'count':>7} {'err':>5} {'429':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for endpoint, stats in rows:
+        print(
+            f"{endpoint:<50} {stats['count']:>7} {stats['errors']:>5} {stats['rejected']:>5} "
+            f"{stats['throughput_rps']:>8.1f} {stats['p50_ms']:>7.1f}ms "
+            f"{stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms"
+        )
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """Print per-endpoint deltas; return 1 if any p95 regressed past the threshold"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    def delta(before: float, after: float) -> float:
+        return (after - before) / before * 100 if before else 0.0
+
+    regressions = 0
+    print(f"{'endpoint':<50} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>9}")
+    old_rows = dict(old["endpoints"], overall=old["overall"])
+    new_rows = dict(new["endpoints"], overall=new["overall"])
+    for endpoint in sorted(set(old_rows) & set(new_rows)):
+        before, after = old_rows[endpoint], new_rows[endpoint]
+        p95_delta = delta(before["p95_ms"], after["p95_ms"])
+        marker = " <-- regression" if p95_delta > threshold else ""
+        regressions += bool(marker)
+        print(
+            f"{endpoint:<50} "
+            f"{delta(before['p50_ms'], after['p50_ms']):>+8.1f}% "
+            f"{p95_delta:>+8.1f}% "
+            f"{delta(before['p99_ms'], after['p99_ms']):>+8.1f}% "
+            f"{delta(before['throughput_rps'], after['throughput_rps']):>+8.1f}%{marker}"
+        )
+
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument(
+        "--users", type=int, default=20, help="concurrent virtual users"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0.0, help="mean pause between actions (s)"
+    )
+    parser.add_argument(
+        "--io-mode",
+        choices=("blocking", "async"),
+        default="blocking",
+        help="blocking mimics the synchronous SDK clients used in production",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("memory", "sqlite"),
+        default="memory",
+        help="storage backend behind the injected DB latency",
+    )
+    parser.add_argument("--sqlite-path", default=":memory:")
+    parser.add_argument("--db-latency", default="lognormal:8ms:30ms")
+    parser.add_argument("--embedding-latency", default="lognormal:120ms:300ms")
+    parser.add_argument("--completion-latency", default="lognormal:1.2s:3s")
+    parser.add_argument(
+        "--fast-completion-latency",
+        help="latency of replies routed to the fast model (default: --completion-latency)",
+    )
+    parser.add_argument(
+        "--llm-concurrency",
+        type=int,
+        default=0,
+        help="cap on in-flight AI replies (0: no cap)",
+    )
+    parser.add_argument(
+        "--rate-limits",
+        action="store_true",
+        help="keep the per-chat rate limits from the environment",
+    )
+    parser.add_argument("--mix", help="JSON action weights, e.g. '{\"chat_turn\": 1}'")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--label", default="", help="free-form label stored in the results"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument(
+        "--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10.0,
+        help="p95 regression threshold in percent",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.compare:
+        return compare(args.compare[0], args.compare[1], args.threshold)
+
+    results = asyncio.run(run_benchmark(args))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
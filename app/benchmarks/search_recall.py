@@ -0,0 +1,241 @@
+"""Recall and latency of the compressed FAQ search tiers against exact search.
+
+For every tier and candidate count, each query is answered by FAQSearchIndex
+(compressed candidate pass, exact re-rank) and compared with the exact
+search_similar_questions results, i.e. match_faq_embeddings on the Supabase
+and PostgreSQL backends.
+
+By default a synthetic, clustered corpus is searched in memory. Synthetic
+vectors spread their information evenly over all dimensions, which is
+pessimistic for the reduced-dimension tiers; use --from-db to measure on the
+FAQs of the configured storage backend (STORAGE_BACKEND) instead. Queries are
+perturbed FAQ vectors either way, so no OpenAI calls are made.
+
+Usage (from the app directory):
+
+    python -m benchmarks.search_recall --faqs 10000 --queries 100
+    STORAGE_BACKEND=postgres python -m benchmarks.search_recall --from-db \\
+        --tiers int8 256 int8:256 --candidates 20 50 100 --output recall.json
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from database.memory_db import MemoryDB
+from database.storage import StorageBackend
+from services.faq_search import FAQSearchIndex, VectorCompressor
+from benchmarks.stats import percentile
+
+load_dotenv()
+
+
+def synthetic_corpus(
+    rng: np.random.Generator, faqs: int, dimensions: int, clusters: int
+) -> np.ndarray:
+    """Vectors grouped around random topics, like FAQs of one shop"""
+    centers = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    noise = rng.standard_normal((faqs, dimensions), dtype=np.float32)
+    return centers[rng.integers(clusters, size=faqs)] + 0.6 * noise
+
+
+def make_queries(
+    rng: np.random.Generator, vectors: np.ndarray, count: int, noise: float
+) -> List[np.ndarray]:
+    """Perturbed copies of random FAQ vectors"""
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    scale = (
+        noise
+        * np.linalg.norm(picked, axis=1, keepdims=True)
+        / np.sqrt(vectors.shape[1])
+    )
+    return list(picked + scale * rng.standard_normal(picked.shape, dtype=np.float32))
+
+
+def latency_stats(durations: List[float]) -> Dict[str, float]:
+    durations = sorted(durations)
+    return {
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+    }
+
+
+async def exact_results(
+    db: StorageBackend, queries: List[np.ndarray], threshold: float, limit: int
+):
+    results, durations = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(await db.search_similar_questions(query, threshold, limit))
+        durations.append(time.perf_counter() - start)
+    return results, latency_stats(durations)
+
+
+async def measure_tier(
+    db: StorageBackend,
+    compressor: VectorCompressor,
+    candidates: int,
+    queries: List[np.ndarray],
+    exact: List[List[Dict]],
+    threshold: float,
+    limit: int,
+) -> Dict[str, object]:
+    index = FAQSearchIndex(db, compressor, candidates, refresh_seconds=float("inf"))
+    start = time.perf_counter()
+    await index.refresh()
+    build_seconds = time.perf_counter() - start
+
+    recalls, durations = [], []
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        found = await index.search(query, threshold, limit)
+        durations.append(time.perf_counter() - start)
+
+        expected_ids = {item["id"] for item in expected}
+        if expected_ids:
+            found_ids = {item["id"] for item in found}
+            recalls.append(len(expected_ids & found_ids) / len(expected_ids))
+
+    return {
+        "tier": compressor.name,
+        "candidates": candidates,
+        "recall": round(float(np.mean(recalls)) if recalls else 1.0, 4),
+        "index_mb": round(index.nbytes / 2**20, 2),
+        "build_s": round(build_seconds, 3),
+        **latency_stats(durations),
+    }
+
+
+async def run(args) -> Dict:
+    rng = np.random.default_rng(args.seed)
+
+    if args.from_db:
+        from api.dependencies import get_db
+
+        db = get_db()
+        vectors = np.vstack(
+            [
+                faq.embedding
+                for faq in await db.get_all_faqs()
+                if faq.embedding is not None
+            ]
+        )
+    else:
+        db = MemoryDB()
+        vectors = synthetic_corpus(rng, args.faqs, args.dimensions, args.clusters)
+        for i, vector in enumerate(vectors):
+            await db.create_faq(f"Question {i}?", f"Answer {i}.", vector)
+
+    queries = make_queries(rng, vectors, args.queries, args.query_noise)
+    exact, exact_latency = await exact_results(db, queries, args.threshold, args.limit)
+
+    tiers = []
+    for spec in args.tiers:
+        for candidates in args.candidates:
+            tiers.append(
+                await measure_tier(
+                    db,
+                    VectorCompressor.parse(spec),
+                    candidates,
+                    queries,
+                    exact,
+                    args.threshold,
+                    args.limit,
+                )
+            )
+
+    if hasattr(db, "close"):
+        await db.close()
+
+    return {
+        "meta": {
+            "timestamp": int(time.time()),
+            "source": "database" if args.from_db else "synthetic",
+            "faqs": len(vectors),
+            "dimensions": vectors.shape[1],
+            "queries": args.queries,
+            "limit": args.limit,
+            "threshold": args.threshold,
+            "full_mb": round(vectors.astype(np.float32).nbytes / 2**20, 2),
+        },
+        "exact": exact_latency,
+        "tiers": tiers,
+    }
+
+
+def print_report(results: Dict):
+    meta, exact = results["meta"], results["exact"]
+    print(
+        f"{meta['faqs']} FAQs x {meta['dimensions']} dims ({meta['source']}), "
+        f"{meta['queries']} queries, recall@{meta['limit']}"
+    )
+    print(
+        f"{'tier':<14}{'candidates':>11}{'recall':>9}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'index MB':>10}"
+    )
+    print(
+        f"{'exact':<14}{'-':>11}{1.0:>9.4f}{exact['p50_ms']:>10.2f}"
+        f"{exact['p95_ms']:>10.2f}{meta['full_mb']:>10.2f}"
+    )
+    for tier in results["tiers"]:
+        print(
+            f"{tier['tier']:<14}{tier['candidates']:>11}{tier['recall']:>9.4f}"
+            f"{tier['p50_ms']:>10.2f}{tier['p95_ms']:>10.2f}{tier['index_mb']:>10.2f}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--tiers",
+        nargs="+",
+        default=["float32", "int8", "512", "256", "int8:256"],
+        help="FAQ_SEARCH_TIER values to compare",
+    )
+    parser.add_argument(
+        "--candidates",
+        nargs="+",
+        type=int,
+        default=[20, 50, 100],
+        help="FAQ_SEARCH_CANDIDATES values to compare",
+    )
+    parser.add_argument(
+        "--from-db",
+        action="store_true",
+        help="search the FAQs of the configured storage backend",
+    )
+    parser.add_argument("--faqs", type=int, default=10000, help="synthetic corpus size")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument(
+        "--query-noise",
+        type=float,
+        default=0.5,
+        help="query perturbation relative to the vector norm",
+    )
+    parser.add_argument("--limit", type=int, default=5, help="results per search")
+    parser.add_argument("--threshold", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run(args))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Cost of turning storage rows into JSON responses: validated vs trusted path.
+
+Two payloads are measured: the issue list (100k issues by default) and one
+long conversation (5k messages). Both paths start from the storage rows and
+build the models the storage layer returns. The validated path is what the
+endpoints did before: response models built from those, FastAPI's
+re-validation against response_model, and the standard json encoder. The
+trusted path encodes the storage models (or plain dicts) once with
+FastJSONResponse (pydantic-core). Both outputs are checked to decode to the
+same JSON.
+
+The report also lists the cost of building the storage models with and
+without validation (model_construct is not faster with pydantic v2, so the
+storage layer keeps validating), and the memory of the conversation held as
+Message models and as the ChatTurns of the history cache.
+
+Usage (from the app directory):
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --issues 20000 --messages 1000 --repeat 5
+"""
+
+import sys
+import json
+import time
+import uuid
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List
+
+from pydantic import TypeAdapter
+
+from api.responses import FastJSONResponse
+from models.issue import ChatTurn, Issue, IssueResponse, IssueWithMessages, Message
+
+
+def issue_rows(count: int) -> List[Dict]:
+    statuses = ("open", "manual", "closed")
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "telegram_chat_id": str(100000 + i),
+            "username": f"user{i}",
+            "status": statuses[i % 3],
+            "last_seq": i % 50,
+            "last_activity_at": 1700000000 + i,
+            "closed_at": 1700000000 + i if i % 3 == 2 else None,
+            "archived_seq": 0,
+            "created_at": "2024-01-01T00:00:00+00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def message_rows(issue_id: str, count: int) -> List[Dict]:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "issue_id": issue_id,
+            "from_user": "GPT" if i % 2 else "user",
+            "text": f"Message number {i} about my order, which has not arrived yet.",
+            "timestamp": 1700000000 + i,
+            "seq": i + 1,
+        }
+        for i in range(count)
+    ]
+
+
+def standard_json(content) -> bytes:
+    """Starlette's JSONResponse encoding"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def validated_issues(rows: List[Dict]) -> bytes:
+    issues = [Issue(**row) for row in rows]
+    response = [
+        IssueResponse(issue_id=issue.id, status=issue.status) for issue in issues
+    ]
+    # FastAPI validates the result against response_model, then dumps it
+    adapter = TypeAdapter(List[IssueResponse])
+    return standard_json(
+        adapter.dump_python(adapter.validate_python(response), mode="json")
+    )
+
+
+def trusted_issues(rows: List[Dict]) -> bytes:
+    issues = [Issue(**row) for row in rows]
+    return FastJSONResponse(
+        [{"issue_id": issue.id, "status": issue.status.value} for issue in issues]
+    ).body
+
+
+def validated_messages(issue_id: str, rows: List[Dict]) -> bytes:
+    page = IssueWithMessages(
+        issue_id=issue_id, messages=[Message(**row) for row in rows]
+    )
+    adapter = TypeAdapter(IssueWithMessages)
+    return standard_json(
+        adapter.dump_python(adapter.validate_python(page), mode="json")
+    )
+
+
+def trusted_messages(issue_id: str, rows: List[Dict]) -> bytes:
+    page = IssueWithMessages(
+        issue_id=issue_id, messages=[Message(**row) for row in rows]
+    )
+    return FastJSONResponse(page).body
+
+
+def best_of(func: Callable[[], bytes], repeat: int) -> Dict:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = func()
+        durations.append(time.perf_counter() - start)
+    return {
+        "best_ms": round(min(durations) * 1000, 2),
+        "bytes": len(body),
+        "body": body,
+    }
+
+
+def build_ms(build: Callable[[], object], repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build()
+        durations.append(time.perf_counter() - start)
+    return round(min(durations) * 1000, 2)
+
+
+def allocated(build: Callable[[], object]) -> int:
+    """Bytes still allocated by what build returns"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def compare(name: str, validated: Callable, trusted: Callable, repeat: int) -> Dict:
+    slow = best_of(validated, repeat)
+    fast = best_of(trusted, repeat)
+    if json.loads(slow.pop("body")) != json.loads(fast.pop("body")):
+        raise AssertionError(f"{name}: the two paths returned different JSON")
+    return {
+        "validated": slow,
+        "trusted": fast,
+        "speedup": round(slow["best_ms"] / fast["best_ms"], 2),
+    }
+
+
+def run(args) -> Dict:
+    issues = issue_rows(args.issues)
+    issue_id = str(uuid.uuid4())
+    messages = message_rows(issue_id, args.messages)
+
+    return {
+        "meta": {
+            "timestamp": int(time.time()),
+            "issues": args.issues,
+            "messages": args.messages,
+            "repeat": args.repeat,
+        },
+        "payloads": {
+            "issue_list": compare(
+                "issue_list",
+                lambda: validated_issues(issues),
+                lambda: trusted_issues(issues),
+                args.repeat,
+            ),
+            "conversation": compare(
+                "conversation",
+                lambda: validated_messages(issue_id, messages),
+                lambda: trusted_messages(issue_id, messages),
+                args.repeat,
+            ),
+        },
+        "issue_models_ms": {
+            "validated": build_ms(
+                lambda: [Issue(**row) for row in issues], args.repeat
+            ),
+            "model_construct": build_ms(
+                lambda: [Issue.model_construct(**row) for row in issues], args.repeat
+            ),
+        },
+        "history_bytes": {
+            "message_models": allocated(lambda: [Message(**row) for row in messages]),
+            "chat_turns": allocated(
+                lambda: [
+                    ChatTurn(row["seq"], row["from_user"], row["text"])
+                    for row in messages
+                ]
+            ),
+        },
+    }
+
+
+def print_report(results: Dict):
+    meta = results["meta"]
+    print(
+        f"{meta['issues']} issues, {meta['messages']}-message conversation, "
+        f"best of {meta['repeat']}"
+    )
+    print(
+        f"{'payload':<14}{'validated ms':>14}{'trusted ms':>12}{'speedup':>9}{'KB':>9}"
+    )
+    for name, result in results["payloads"].items():
+        print(
+            f"{name:<14}{result['validated']['best_ms']:>14.1f}"
+            f"{result['trusted']['best_ms']:>12.1f}{result['speedup']:>8.1f}x"
+            f"{result['trusted']['bytes'] / 1024:>9.0f}"
+        )
+
+    models = results["issue_models_ms"]
+    print(
+        f"\nissue models from rows: {models['validated']:.1f} ms validated, "
+        f"{models['model_construct']:.1f} ms with model_construct"
+    )
+
+    history = results["history_bytes"]
+    print(
+        f"conversation history: {history['message_models'] / 1024:.0f} KB as "
+        f"Message models, {history['chat_turns'] / 1024:.0f} KB as ChatTurns"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--issues", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Cold-start time of the API: imports, warm-up steps and time to ready.
+
+Each run starts a fresh interpreter that imports main and runs the FastAPI
+lifespan (the same warm-up the server does before serving), then prints the
+startup report served by /readyz. The wall time includes interpreter start.
+With --max-seconds the exit status is 1 when the median time to ready goes
+over the budget, so CI can catch cold-start regressions.
+
+The in-memory storage backend is used by default so no services are needed;
+no OpenAI requests are made. --importtime lists the slowest imports.
+
+Usage (from the app directory):
+
+    python -m benchmarks.startup_time --runs 5
+    python -m benchmarks.startup_time --max-seconds 2.5 --importtime 15
+    STORAGE_BACKEND=postgres python -m benchmarks.startup_time --backend ""
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from typing import Dict, List
+
+from benchmarks.stats import percentile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, asyncio
+import main
+
+async def start():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+
+asyncio.run(start())
+print(json.dumps(main.startup.as_dict()))
+"""
+
+
+def child_env(backend: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    if backend:
+        env["STORAGE_BACKEND"] = backend
+    # The OpenAI client only needs a key to be constructed
+    env.setdefault("OPENAI_API_KEY", "startup-benchmark")
+    return env
+
+
+def run_once(backend: str) -> Dict:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=APP_DIR,
+        env=child_env(backend),
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"startup failed:\n{result.stderr}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if report["status"] != "ready":
+        raise RuntimeError(f"warm-up failed: {report['error']}")
+    return {"wall": wall, **report["steps"]}
+
+
+def slowest_imports(backend: str, count: int) -> List[Dict]:
+    """Top-level packages by cumulative import time"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR,
+        env=child_env(backend),
+        capture_output=True,
+        text=True,
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nesting is shown by indentation; keep modules imported by the app
+        if name.startswith("  ") and not name.startswith("   "):
+            totals[name.strip()] = int(cumulative) / 1e6
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [{"module": name, "seconds": round(s, 4)} for name, s in ranked[:count]]
+
+
+def summarize(runs: List[Dict]) -> Dict[str, Dict[str, float]]:
+    steps = {}
+    for name in runs[0]:
+        values = sorted(run[name] for run in runs)
+        steps[name] = {
+            "p50_s": round(percentile(values, 50), 4),
+            "max_s": round(values[-1], 4),
+        }
+    return steps
+
+
+def print_report(results: Dict):
+    meta = results["meta"]
+    print(f"{meta['runs']} cold starts, {meta['backend'] or 'env'} storage backend")
+    print(f"{'step':<14}{'p50 s':>10}{'max s':>10}")
+    for name, step in results["steps"].items():
+        print(f"{name:<14}{step['p50_s']:>10.3f}{step['max_s']:>10.3f}")
+
+    if results["imports"]:
+        print("\nslowest imports (cumulative):")
+        for item in results["imports"]:
+            print(f"  {item['module']:<40}{item['seconds']:>8.3f} s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--backend",
+        default="memory",
+        help='STORAGE_BACKEND for the runs ("" keeps the environment\'s)',
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        help="fail when the median wall time to ready exceeds this",
+    )
+    parser.add_argument(
+        "--importtime", type=int, default=0, help="list the N slowest imports"
+    )
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.backend) for _ in range(args.runs)]
+    results = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "runs": args.runs,
+            "backend": args.backend,
+            "python": sys.version.split()[0],
+        },
+        "steps": summarize(runs),
+        "imports": (
+            slowest_imports(args.backend, args.importtime) if args.importtime else []
+        ),
+    }
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    wall = results["steps"]["wall"]["p50_s"]
+    if args.max_seconds is not None and wall > args.max_seconds:
+        print(f"\nFAIL: median time to ready {wall:.3f} s > {args.max_seconds} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,9 +13,15 @@ CREATE TABLE public.faq_embeddings (
   question text NOT NULL,
   answer text NOT NULL,
   embedding vector(1536) NULL,  -- Ensure vector type is defined
+  content_hash text NULL,  -- sha256 of the question that was embedded
+  embedding_version text NULL,
+  embedding_next vector(1536) NULL,  -- written by the re-embedding job
+  embedding_next_version text NULL,
   CONSTRAINT faq_embeddings_pkey PRIMARY KEY (id)
 ) TABLESPACE pg_default;
 
+-- ivfflat lists are trained on the rows present at build time: rebuild the
+-- index once FAQs are imported with `python -m maintenance.vector_index rebuild`
 CREATE INDEX IF NOT EXISTS idx_faq_embeddings_vector ON public.faq_embeddings USING ivfflat (embedding vector_cosine_ops) TABLESPACE pg_default;
 
 CREATE TABLE public.issues (
@@ -23,27 +29,78 @@ CREATE TABLE public.issues (
   telegram_chat_id text NOT NULL,
   username text NOT NULL,
   status text NOT NULL,
+  last_seq bigint NOT NULL DEFAULT 0,
+  last_activity_at bigint NOT NULL DEFAULT (extract(epoch FROM now()))::bigint,
+  closed_at bigint NULL,
+  archived_seq bigint NOT NULL DEFAULT 0,  -- messages up to here are in message_archives
   CONSTRAINT issues_pkey PRIMARY KEY (id),
   CONSTRAINT issues_status_check CHECK (
     status = ANY (ARRAY['open'::text, 'manual'::text, 'closed'::text])
   )
 ) TABLESPACE pg_default;
 
+-- Realtime UPDATE events carry the old row, so status changes can be told
+-- apart from the updates made for every new message
+ALTER TABLE public.issues REPLICA IDENTITY FULL;
+
 CREATE INDEX IF NOT EXISTS idx_issues_telegram_chat_id ON public.issues USING btree (telegram_chat_id) TABLESPACE pg_default;
 
 CREATE INDEX IF NOT EXISTS idx_issues_status ON public.issues USING btree (status) TABLESPACE pg_default;
 
+-- At most one active issue per chat (see get_or_create_open_issue)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_issues_active_chat_id ON public.issues USING btree (telegram_chat_id) TABLESPACE pg_default
+WHERE status <> 'closed';
+
+-- Keep the sweeper's scans proportional to the issues it has to touch
+CREATE INDEX IF NOT EXISTS idx_issues_active_last_activity ON public.issues USING btree (last_activity_at) TABLESPACE pg_default
+WHERE status <> 'closed';
+
+CREATE INDEX IF NOT EXISTS idx_issues_to_archive ON public.issues USING btree (closed_at) TABLESPACE pg_default
+WHERE status = 'closed' AND last_seq > archived_seq;
+
 CREATE TABLE public.messages (
   id uuid NOT NULL DEFAULT gen_random_uuid(),
   issue_id uuid NOT NULL,
   from_user text NOT NULL,
   text text NOT NULL,
   timestamp bigint NOT NULL,
+  seq bigint NOT NULL,
   CONSTRAINT messages_pkey PRIMARY KEY (id),
   CONSTRAINT messages_issue_id_fkey FOREIGN KEY (issue_id) REFERENCES issues (id) ON DELETE CASCADE
 ) TABLESPACE pg_default;
 
-CREATE INDEX IF NOT EXISTS idx_messages_issue_id ON public.messages USING btree (issue_id) TABLESPACE pg_default;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_issue_id_seq ON public.messages USING btree (issue_id, seq) TABLESPACE pg_default;
+
+-- Messages of long-closed issues, one zlib-compressed JSON blob per issue
+-- (see database/message_archive.py)
+CREATE TABLE public.message_archives (
+  issue_id uuid NOT NULL,
+  data bytea NOT NULL,
+  archived_at bigint NOT NULL,
+  CONSTRAINT message_archives_pkey PRIMARY KEY (issue_id),
+  CONSTRAINT message_archives_issue_id_fkey FOREIGN KEY (issue_id) REFERENCES issues (id) ON DELETE CASCADE
+) TABLESPACE pg_default;
+
+-- Already compressed: store out of line without trying pglz again
+ALTER TABLE public.message_archives ALTER COLUMN data SET STORAGE EXTERNAL;
+
+-- Assigns messages.seq from a per-issue counter. The counter update locks the
+-- issue row, so concurrent inserts into one issue get consecutive numbers.
+CREATE OR REPLACE FUNCTION assign_message_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE issues SET last_seq = last_seq + 1, last_activity_at = NEW.timestamp
+    WHERE id = NEW.issue_id
+    RETURNING last_seq INTO NEW.seq;
+    RETURN NEW;
+END;
+$$;
+
+CREATE TRIGGER messages_assign_seq
+BEFORE INSERT ON public.messages
+FOR EACH ROW EXECUTE FUNCTION assign_message_seq();
 
 CREATE OR REPLACE FUNCTION match_faq_embeddings(
     query_embedding vector(1536),
@@ -73,4 +130,171 @@ BEGIN
         fe.embedding <=> query_embedding
     LIMIT match_count;
 END;
-$$;
\ No newline at end of file
+$$;
+
+-- Re-embedding support (see maintenance/reembed_faqs.py). New vectors are
+-- written to embedding_next and only replace embedding, for all FAQs at once,
+-- when every FAQ has one for the target version.
+CREATE OR REPLACE FUNCTION faqs_needing_embedding(target_version text, max_rows int)
+RETURNS TABLE (
+    id UUID,
+    question TEXT,
+    answer TEXT,
+    content_hash TEXT,
+    embedding_version TEXT
+)
+LANGUAGE sql
+AS $$
+    SELECT fe.id, fe.question, fe.answer, fe.content_hash, fe.embedding_version
+    FROM faq_embeddings fe
+    WHERE fe.embedding_version IS DISTINCT FROM target_version
+      AND fe.embedding_next_version IS DISTINCT FROM target_version
+    ORDER BY fe.id
+    LIMIT max_rows;
+$$;
+
+-- updates: [{"id": ..., "content_hash": ..., "embedding": "[...]"}]. Rows whose
+-- question changed since they were read are skipped.
+CREATE OR REPLACE FUNCTION store_next_faq_embeddings(target_version text, updates jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    stored int;
+BEGIN
+    UPDATE faq_embeddings fe
+    SET embedding_next = (u->>'embedding')::vector,
+        embedding_next_version = target_version
+    FROM jsonb_array_elements(updates) u
+    WHERE fe.id = (u->>'id')::uuid
+      AND fe.content_hash IS NOT DISTINCT FROM u->>'content_hash';
+    GET DIAGNOSTICS stored = ROW_COUNT;
+    RETURN stored;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION swap_faq_embeddings(target_version text)
+RETURNS TABLE (swapped int, remaining int)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Block FAQ writes so no row can become outdated during the swap
+    LOCK TABLE faq_embeddings IN SHARE ROW EXCLUSIVE MODE;
+
+    SELECT count(*) INTO remaining
+    FROM faq_embeddings fe
+    WHERE fe.embedding_version IS DISTINCT FROM target_version
+      AND fe.embedding_next_version IS DISTINCT FROM target_version;
+
+    swapped := 0;
+    IF remaining = 0 THEN
+        UPDATE faq_embeddings fe
+        SET embedding = fe.embedding_next,
+            content_hash = encode(sha256(convert_to(fe.question, 'UTF8')), 'hex'),
+            embedding_version = target_version,
+            embedding_next = NULL,
+            embedding_next_version = NULL
+        WHERE fe.embedding_next_version = target_version;
+        GET DIAGNOSTICS swapped = ROW_COUNT;
+    END IF;
+
+    RETURN NEXT;
+END;
+$$;
+
+-- Idle issue sweeping and message archiving (see services/issue_sweeper.py).
+-- Rows locked by another sweeper or a message insert are skipped, so every
+-- closed issue is returned to exactly one caller.
+CREATE OR REPLACE FUNCTION close_idle_issues(idle_before bigint, max_rows int)
+RETURNS SETOF issues
+LANGUAGE sql
+AS $$
+    UPDATE issues i
+    SET status = 'closed', closed_at = (extract(epoch FROM now()))::bigint
+    FROM (
+        SELECT id FROM issues
+        WHERE status <> 'closed' AND last_activity_at < idle_before
+        ORDER BY last_activity_at
+        LIMIT max_rows
+        FOR UPDATE SKIP LOCKED
+    ) idle
+    WHERE i.id = idle.id
+    RETURNING i.*;
+$$;
+
+CREATE OR REPLACE FUNCTION issues_to_archive(closed_before bigint, max_rows int)
+RETURNS SETOF issues
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT * FROM issues
+    WHERE status = 'closed' AND last_seq > archived_seq AND closed_at < closed_before
+    ORDER BY closed_at
+    LIMIT max_rows;
+$$;
+
+-- Replaces the archive of an issue and deletes the archived messages in one
+-- transaction; messages added after through_seq stay in the messages table.
+CREATE OR REPLACE FUNCTION archive_issue_messages(target uuid, archive bytea, through_seq bigint)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted int;
+BEGIN
+    INSERT INTO message_archives (issue_id, data, archived_at)
+    VALUES (target, archive, (extract(epoch FROM now()))::bigint)
+    ON CONFLICT (issue_id)
+    DO UPDATE SET data = EXCLUDED.data, archived_at = EXCLUDED.archived_at;
+
+    DELETE FROM messages WHERE issue_id = target AND seq <= through_seq;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+
+    UPDATE issues SET archived_seq = through_seq WHERE id = target;
+    RETURN deleted;
+END;
+$$;
+
+-- Returns the chat's active issue, creating it if there is none, in one round
+-- trip. The partial unique index makes concurrent calls for one chat agree on
+-- a single issue; the caller knows it was created when the id is new_id.
+CREATE OR REPLACE FUNCTION get_or_create_open_issue(new_id uuid, chat_id text, user_name text)
+RETURNS SETOF issues
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOOP
+        RETURN QUERY
+        INSERT INTO issues (id, telegram_chat_id, username, status)
+        VALUES (new_id, chat_id, user_name, 'open')
+        ON CONFLICT (telegram_chat_id) WHERE status <> 'closed' DO NOTHING
+        RETURNING *;
+        IF FOUND THEN
+            RETURN;
+        END IF;
+
+        -- A new statement, so it sees the row a concurrent call committed
+        RETURN QUERY
+        SELECT * FROM issues WHERE telegram_chat_id = chat_id AND status <> 'closed';
+        IF FOUND THEN
+            RETURN;
+        END IF;
+        -- That issue was closed in between: try the insert again
+    END LOOP;
+END;
+$$;
+
+-- One admin message for many issues (bulk replies). Closed issues are skipped;
+-- locking the issue rows in id order re-checks any closed meanwhile and keeps
+-- overlapping batches from deadlocking.
+CREATE OR REPLACE FUNCTION add_message_to_issues(target_ids uuid[], sender text, body text, sent_at bigint)
+RETURNS SETOF messages
+LANGUAGE sql
+AS $$
+    INSERT INTO messages (issue_id, from_user, text, timestamp)
+    SELECT id, sender, body, sent_at FROM issues
+    WHERE id = ANY(target_ids) AND status <> 'closed'
+    ORDER BY id
+    FOR UPDATE
+    RETURNING *;
+$$;
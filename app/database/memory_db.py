@@ -0,0 +1,357 @@
+import time
+import uuid
+import numpy as np
+from typing import List, Optional, Dict, Any, Tuple
+from models.issue import Issue, IssueStatus, IssueWithMessages, Message
+from models.admin import Admin
+from models.faq import FAQ, FAQSummary
+from database.similarity import brute_force_search
+from database.message_archive import with_archived
+from models.embedding import content_hash, to_embedding
+from monitoring.metrics import DB_OPERATION_SECONDS, instrument_async_methods
+
+
+@instrument_async_methods(DB_OPERATION_SECONDS, "memory", span="db")
+class MemoryDB:
+    """Storage backend keeping everything in process memory.
+
+    Nothing is persisted; meant for tests, benchmarks and demos.
+    """
+
+    def __init__(self):
+        self.issues: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.admins: Dict[str, Dict[str, Any]] = {}
+        self.faqs: Dict[str, Dict[str, Any]] = {}
+        self.archives: Dict[str, bytes] = {}
+
+    # Issue methods
+    async def get_open_issue_by_chat_id(self, telegram_chat_id: str) -> Optional[Issue]:
+        for issue in self.issues.values():
+            if (
+                issue["telegram_chat_id"] == telegram_chat_id
+                and issue["status"] != IssueStatus.CLOSED
+            ):
+                return Issue(**issue)
+
+        return None
+
+    async def create_issue(self, telegram_chat_id: str, username: str) -> Issue:
+        issue_data = {
+            "id": str(uuid.uuid4()),
+            "telegram_chat_id": telegram_chat_id,
+            "username": username,
+            "status": IssueStatus.OPEN,
+            "last_seq": 0,
+            "last_activity_at": int(time.time()),
+            "closed_at": None,
+            "archived_seq": 0,
+        }
+        self.issues[issue_data["id"]] = issue_data
+        self.messages[issue_data["id"]] = []
+
+        return Issue(**issue_data)
+
+    async def get_or_create_open_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        # MemoryDB methods never suspend, so no other call can interleave
+        issue = await self.get_open_issue_by_chat_id(telegram_chat_id)
+        if issue:
+            return issue, False
+        return await self.create_issue(telegram_chat_id, username), True
+
+    async def get_issue_by_id(self, issue_id: str) -> Optional[Issue]:
+        issue_data = self.issues.get(issue_id)
+        return Issue(**issue_data) if issue_data else None
+
+    async def add_message_to_issue(
+        self, issue_id: str, from_user: str, text: str
+    ) -> Optional[Message]:
+        issue_data = self.issues.get(issue_id)
+        if not issue_data:
+            return None
+
+        issue_data["last_seq"] += 1
+        message_data = {
+            "id": str(uuid.uuid4()),
+            "issue_id": issue_id,
+            "from_user": from_user,
+            "text": text,
+            "timestamp": int(time.time()),
+            "seq": issue_data["last_seq"],
+        }
+        issue_data["last_activity_at"] = message_data["timestamp"]
+        self.messages[issue_id].append(message_data)
+
+        return Message(**message_data)
+
+    async def update_issue_status(
+        self, issue_id: str, status: IssueStatus
+    ) -> Optional[Issue]:
+        issue_data = self.issues.get(issue_id)
+        if not issue_data:
+            return None
+
+        issue_data["status"] = status
+        issue_data["closed_at"] = (
+            int(time.time()) if status == IssueStatus.CLOSED else None
+        )
+        return Issue(**issue_data)
+
+    async def get_all_issues(self) -> List[Issue]:
+        return [Issue(**item) for item in self.issues.values()]
+
+    async def get_issues_by_ids(self, issue_ids: List[str]) -> List[Issue]:
+        return [
+            Issue(**self.issues[issue_id])
+            for issue_id in issue_ids
+            if issue_id in self.issues
+        ]
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> List[Issue]:
+        closed_at = int(time.time()) if status == IssueStatus.CLOSED else None
+        updated = []
+        for issue_id in issue_ids:
+            issue_data = self.issues.get(issue_id)
+            if issue_data and issue_data["status"] != IssueStatus.CLOSED:
+                issue_data.update(status=status, closed_at=closed_at)
+                updated.append(Issue(**issue_data))
+        return updated
+
+    async def add_message_to_issues(
+        self, issue_ids: List[str], from_user: str, text: str
+    ) -> List[Message]:
+        timestamp = int(time.time())
+        messages = []
+        for issue_id in issue_ids:
+            issue_data = self.issues.get(issue_id)
+            if not issue_data or issue_data["status"] == IssueStatus.CLOSED:
+                continue
+
+            issue_data["last_seq"] += 1
+            issue_data["last_activity_at"] = timestamp
+            message_data = {
+                "id": str(uuid.uuid4()),
+                "issue_id": issue_id,
+                "from_user": from_user,
+                "text": text,
+                "timestamp": timestamp,
+                "seq": issue_data["last_seq"],
+            }
+            self.messages[issue_id].append(message_data)
+            messages.append(Message(**message_data))
+        return messages
+
+    async def get_issue_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        issue_data = self.issues.get(issue_id)
+        if not issue_data:
+            return None
+
+        # Messages are appended in seq order and the live ones follow the
+        # archived ones, so the message with seq n sits at index
+        # n - archived_seq - 1
+        archived_seq = issue_data["archived_seq"]
+        rows = self.messages[issue_id][max(after_seq - archived_seq, 0) :]
+        if limit is not None:
+            rows = rows[:limit]
+
+        messages = [Message(**msg) for msg in rows]
+        archive = None
+        if archived_seq > after_seq:
+            archive = self.archives.get(issue_id)
+        return with_archived(issue_id, archive, messages, after_seq, limit)
+
+    async def close_idle_issues(self, idle_before: int, limit: int) -> List[Issue]:
+        idle = [
+            issue_data
+            for issue_data in self.issues.values()
+            if issue_data["status"] != IssueStatus.CLOSED
+            and issue_data["last_activity_at"] < idle_before
+        ]
+        idle.sort(key=lambda issue_data: issue_data["last_activity_at"])
+
+        now = int(time.time())
+        for issue_data in idle[:limit]:
+            issue_data.update(status=IssueStatus.CLOSED, closed_at=now)
+        return [Issue(**issue_data) for issue_data in idle[:limit]]
+
+    async def get_issues_to_archive(
+        self, closed_before: int, limit: int
+    ) -> List[Issue]:
+        closed = (
+            issue_data
+            for issue_data in self.issues.values()
+            if issue_data["status"] == IssueStatus.CLOSED
+            and issue_data["closed_at"] is not None
+            and issue_data["closed_at"] < closed_before
+            and issue_data["last_seq"] > issue_data["archived_seq"]
+        )
+        return [Issue(**issue_data) for _, issue_data in zip(range(limit), closed)]
+
+    async def archive_issue_messages(
+        self, issue_id: str, archive: bytes, through_seq: int
+    ) -> int:
+        issue_data = self.issues.get(issue_id)
+        if not issue_data:
+            return 0
+
+        live = self.messages[issue_id]
+        self.messages[issue_id] = [msg for msg in live if msg["seq"] > through_seq]
+        self.archives[issue_id] = archive
+        issue_data["archived_seq"] = through_seq
+        return len(live) - len(self.messages[issue_id])
+
+    # Admin methods
+    async def get_admin_by_chat_id(self, telegram_chat_id: str) -> Optional[Admin]:
+        admin_data = self.admins.get(telegram_chat_id)
+        return Admin(**admin_data) if admin_data else None
+
+    async def get_all_admins(self) -> List[Admin]:
+        return [Admin(**item) for item in self.admins.values()]
+
+    async def create_admin(self, telegram_chat_id: str, username: str) -> Admin:
+        admin_data = {
+            "id": str(uuid.uuid4()),
+            "telegram_chat_id": telegram_chat_id,
+            "username": username,
+        }
+        self.admins[telegram_chat_id] = admin_data
+
+        return Admin(**admin_data)
+
+    # FAQ methods
+    async def get_all_faqs(self) -> List[FAQ]:
+        return [FAQ(**item) for item in self.faqs.values()]
+
+    async def get_faq_summaries(self) -> List[FAQSummary]:
+        return [FAQSummary(**item) for item in self.faqs.values()]
+
+    async def create_faq(
+        self,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> FAQSummary:
+        faq_data = {
+            "id": str(uuid.uuid4()),
+            "question": question,
+            "answer": answer,
+            "embedding": None,
+            "content_hash": None,
+            "embedding_version": None,
+            "embedding_next": None,
+            "embedding_next_version": None,
+        }
+        if embedding is not None:
+            self._set_embedding(faq_data, embedding, embedding_version)
+        self.faqs[faq_data["id"]] = faq_data
+
+        return FAQSummary(**faq_data)
+
+    async def get_faq_by_id(self, faq_id: str) -> Optional[FAQ]:
+        faq_data = self.faqs.get(faq_id)
+        return FAQ(**faq_data) if faq_data else None
+
+    async def get_faqs_by_ids(self, faq_ids: List[str]) -> List[FAQ]:
+        return [FAQ(**self.faqs[faq_id]) for faq_id in faq_ids if faq_id in self.faqs]
+
+    async def get_faq_summary(self, faq_id: str) -> Optional[FAQSummary]:
+        faq_data = self.faqs.get(faq_id)
+        return FAQSummary(**faq_data) if faq_data else None
+
+    async def update_faq(
+        self,
+        faq_id: str,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
+        faq_data = self.faqs.get(faq_id)
+        if not faq_data:
+            return None
+
+        faq_data.update(question=question, answer=answer)
+        if embedding is not None:
+            self._set_embedding(faq_data, embedding, embedding_version)
+
+        return FAQSummary(**faq_data)
+
+    @staticmethod
+    def _set_embedding(faq_data: Dict[str, Any], embedding, embedding_version):
+        faq_data.update(
+            embedding=to_embedding(embedding),
+            content_hash=content_hash(faq_data["question"]),
+            embedding_version=embedding_version,
+            embedding_next=None,
+            embedding_next_version=None,
+        )
+
+    async def delete_faq(self, faq_id: str) -> bool:
+        return self.faqs.pop(faq_id, None) is not None
+
+    def _needs_embedding(self, faq_data: Dict[str, Any], embedding_version: str):
+        return (
+            faq_data["embedding_version"] != embedding_version
+            and faq_data["embedding_next_version"] != embedding_version
+        )
+
+    async def get_faqs_needing_embedding(
+        self, embedding_version: str, limit: int
+    ) -> List[FAQSummary]:
+        outdated = (
+            faq_data
+            for faq_data in self.faqs.values()
+            if self._needs_embedding(faq_data, embedding_version)
+        )
+        return [FAQSummary(**faq_data) for _, faq_data in zip(range(limit), outdated)]
+
+    async def store_next_embeddings(
+        self, embedding_version: str, embeddings: List[Tuple[FAQSummary, np.ndarray]]
+    ) -> int:
+        stored = 0
+        for faq, embedding in embeddings:
+            faq_data = self.faqs.get(faq.id)
+            if faq_data and faq_data["content_hash"] == faq.content_hash:
+                faq_data["embedding_next"] = to_embedding(embedding)
+                faq_data["embedding_next_version"] = embedding_version
+                stored += 1
+        return stored
+
+    async def swap_next_embeddings(self, embedding_version: str) -> Tuple[int, int]:
+        remaining = sum(
+            self._needs_embedding(faq_data, embedding_version)
+            for faq_data in self.faqs.values()
+        )
+        if remaining:
+            return 0, remaining
+
+        swapped = 0
+        for faq_data in self.faqs.values():
+            if faq_data["embedding_next_version"] == embedding_version:
+                faq_data.update(
+                    embedding=faq_data["embedding_next"],
+                    content_hash=content_hash(faq_data["question"]),
+                    embedding_version=embedding_version,
+                    embedding_next=None,
+                    embedding_next_version=None,
+                )
+                swapped += 1
+        return swapped, 0
+
+    async def search_similar_questions(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Search for similar questions by brute-force cosine similarity"""
+        return brute_force_search(
+            query_embedding,
+            ((faq, faq["embedding"]) for faq in self.faqs.values()),
+            match_threshold,
+            limit,
+        )
@@ -0,0 +1,43 @@
+import json
+import zlib
+from typing import List, Optional
+from models.issue import IssueWithMessages, Message
+
+# Closed issues keep their messages in one compressed blob per issue; the
+# columns are stored positionally to leave out the repeated keys and issue id
+ARCHIVE_FIELDS = ("id", "from_user", "text", "timestamp", "seq")
+
+
+def pack_messages(messages: List[Message]) -> bytes:
+    rows = [
+        [getattr(message, field) for field in ARCHIVE_FIELDS] for message in messages
+    ]
+    return zlib.compress(
+        json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9
+    )
+
+
+def unpack_messages(issue_id: str, data: bytes) -> List[Message]:
+    rows = json.loads(zlib.decompress(data))
+    return [
+        Message(issue_id=issue_id, **dict(zip(ARCHIVE_FIELDS, row))) for row in rows
+    ]
+
+
+def with_archived(
+    issue_id: str,
+    archive: Optional[bytes],
+    messages: List[Message],
+    after_seq: int,
+    limit: Optional[int],
+) -> IssueWithMessages:
+    """Put the archived messages after after_seq in front of the live ones"""
+    if archive:
+        archived = [m for m in unpack_messages(issue_id, archive) if m.seq > after_seq]
+        # Messages added after archiving follow the archived ones
+        first_live = archived[-1].seq if archived else after_seq
+        messages = archived + [m for m in messages if m.seq > first_live]
+        if limit is not None:
+            messages = messages[:limit]
+
+    return IssueWithMessages(issue_id=issue_id, messages=messages)
@@ -0,0 +1,497 @@
+import json
+import time
+import uuid
+import struct
+import asyncpg
+import numpy as np
+from typing import List, Optional, Dict, Any, Sequence, Tuple
+from models.issue import Issue, IssueStatus, IssueWithMessages, Message
+from models.admin import Admin
+from models.faq import FAQ, FAQSummary
+from models.embedding import content_hash, to_pgvector_text
+from database.message_archive import with_archived
+from monitoring.metrics import DB_OPERATION_SECONDS, instrument_async_methods
+
+# Hot queries, kept as constants so asyncpg's per-connection statement cache
+# reuses their prepared statements
+GET_OPEN_ISSUE_BY_CHAT_ID = (
+    "SELECT * FROM issues WHERE telegram_chat_id = $1 AND status <> 'closed' LIMIT 1"
+)
+GET_ISSUE_BY_ID = "SELECT * FROM issues WHERE id = $1"
+ADD_MESSAGE_TO_ISSUE = """
+INSERT INTO messages (issue_id, from_user, text, timestamp)
+SELECT $1, $2, $3, $4
+WHERE EXISTS (SELECT 1 FROM issues WHERE id = $1)
+RETURNING *
+"""
+# seq is assigned by the messages_assign_seq trigger; a NULL limit means ALL
+GET_ISSUE_MESSAGES = (
+    "SELECT * FROM messages WHERE issue_id = $1 AND seq > $2 ORDER BY seq LIMIT $3"
+)
+MATCH_FAQ_EMBEDDINGS = "SELECT * FROM match_faq_embeddings($1, $2, $3)"
+
+# Bulk admin actions. Rows are locked in id order, so concurrent batches over
+# overlapping issues wait for each other instead of deadlocking.
+UPDATE_ISSUES_STATUS = """
+UPDATE issues i SET status = $2, closed_at = $3
+FROM (
+    SELECT id FROM issues
+    WHERE id = ANY($1) AND status <> 'closed'
+    ORDER BY id
+    FOR UPDATE
+) target
+WHERE i.id = target.id
+RETURNING i.*
+"""
+# Locking the issues first re-checks the status of any closed meanwhile
+ADD_MESSAGE_TO_ISSUES = """
+INSERT INTO messages (issue_id, from_user, text, timestamp)
+SELECT id, $2, $3, $4 FROM issues
+WHERE id = ANY($1) AND status <> 'closed'
+ORDER BY id
+FOR UPDATE
+RETURNING *
+"""
+
+# pgvector lives in "extensions" on Supabase, in "public" by default elsewhere
+VECTOR_TYPE_SCHEMA = """
+SELECT n.nspname FROM pg_type t JOIN pg_namespace n ON n.oid = t.typnamespace
+WHERE t.typname = 'vector'
+"""
+
+FAQ_SUMMARY_COLUMNS = "id, question, answer, content_hash, embedding_version"
+FAQ_COLUMNS = f"{FAQ_SUMMARY_COLUMNS}, embedding"
+
+# Re-ranking fetch of the compressed search tier (services/faq_search.py)
+GET_FAQS_BY_IDS = f"SELECT {FAQ_COLUMNS} FROM faq_embeddings WHERE id = ANY($1)"
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    """pgvector binary format: uint16 dimension, uint16 unused, float4 values"""
+    values = np.asarray(vector, dtype=">f4")
+    return struct.pack(">HH", len(values), 0) + values.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    dimension, _ = struct.unpack_from(">HH", data)
+    values = np.frombuffer(data, dtype=">f4", count=dimension, offset=4)
+    return values.astype(np.float32)
+
+
+def _as_uuid(value: str) -> Optional[uuid.UUID]:
+    """Parse an id from the API; malformed ids simply match nothing"""
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _row(record: asyncpg.Record) -> Dict[str, Any]:
+    """Convert a record to a dict with UUIDs as strings"""
+    data = dict(record)
+    for key in ("id", "issue_id"):
+        if isinstance(data.get(key), uuid.UUID):
+            data[key] = str(data[key])
+    return data
+
+
+@instrument_async_methods(DB_OPERATION_SECONDS, "postgres", span="db")
+class PostgresDB:
+    """Storage backend talking to PostgreSQL directly through an asyncpg pool.
+
+    Skips the PostgREST HTTP hop and JSON round trip of SupabaseDB: queries
+    use the binary protocol, each connection prepares a query the first time it
+    runs it and reuses the statement from then on (asyncpg's statement cache),
+    and pgvector values are sent and received in binary.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 2,
+        max_size: int = 10,
+        statement_cache_size: int = 100,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        # Set to 0 behind PgBouncer in transaction pooling mode
+        self.statement_cache_size = statement_cache_size
+        self.pool: Optional[asyncpg.Pool] = None
+        # Schema of the pgvector type, looked up by the first connection
+        self.vector_schema: Optional[str] = None
+
+    async def _init_connection(self, connection: asyncpg.Connection):
+        if self.vector_schema is None:
+            self.vector_schema = await connection.fetchval(VECTOR_TYPE_SCHEMA)
+            if self.vector_schema is None:
+                raise RuntimeError("The pgvector extension is not installed")
+
+        await connection.set_type_codec(
+            "vector",
+            schema=self.vector_schema,
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary",
+        )
+
+    async def connect(self) -> asyncpg.Pool:
+        """Open the connection pool (done lazily on first use otherwise)"""
+        if self.pool is None:
+            self.pool = await asyncpg.create_pool(
+                self.dsn,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                statement_cache_size=self.statement_cache_size,
+                init=self._init_connection,
+            )
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def _fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+        pool = self.pool or await self.connect()
+        return [_row(record) for record in await pool.fetch(query, *args)]
+
+    async def _fetchrow(self, query: str, *args) -> Optional[Dict[str, Any]]:
+        pool = self.pool or await self.connect()
+        record = await pool.fetchrow(query, *args)
+        return _row(record) if record else None
+
+    # Issue methods
+    async def get_open_issue_by_chat_id(self, telegram_chat_id: str) -> Optional[Issue]:
+        issue_data = await self._fetchrow(GET_OPEN_ISSUE_BY_CHAT_ID, telegram_chat_id)
+        return Issue(**issue_data) if issue_data else None
+
+    async def create_issue(self, telegram_chat_id: str, username: str) -> Issue:
+        issue_data = await self._fetchrow(
+            "INSERT INTO issues "
+            "(id, telegram_chat_id, username, status, last_activity_at) "
+            "VALUES ($1, $2, $3, $4, $5) RETURNING *",
+            uuid.uuid4(),
+            telegram_chat_id,
+            username,
+            IssueStatus.OPEN.value,
+            int(time.time()),
+        )
+        return Issue(**issue_data)
+
+    async def get_or_create_open_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        new_id = uuid.uuid4()
+        issue_data = await self._fetchrow(
+            "SELECT * FROM get_or_create_open_issue($1, $2, $3)",
+            new_id,
+            telegram_chat_id,
+            username,
+        )
+        return Issue(**issue_data), issue_data["id"] == str(new_id)
+
+    async def get_issue_by_id(self, issue_id: str) -> Optional[Issue]:
+        issue_uuid = _as_uuid(issue_id)
+        if issue_uuid is None:
+            return None
+
+        issue_data = await self._fetchrow(GET_ISSUE_BY_ID, issue_uuid)
+        return Issue(**issue_data) if issue_data else None
+
+    async def add_message_to_issue(
+        self, issue_id: str, from_user: str, text: str
+    ) -> Optional[Message]:
+        issue_uuid = _as_uuid(issue_id)
+        if issue_uuid is None:
+            return None
+
+        # Existence check and insert in a single round trip
+        message_data = await self._fetchrow(
+            ADD_MESSAGE_TO_ISSUE,
+            issue_uuid,
+            from_user,
+            text,
+            int(time.time()),
+        )
+        return Message(**message_data) if message_data else None
+
+    async def update_issue_status(
+        self, issue_id: str, status: IssueStatus
+    ) -> Optional[Issue]:
+        issue_uuid = _as_uuid(issue_id)
+        if issue_uuid is None:
+            return None
+
+        status = IssueStatus(status)
+        issue_data = await self._fetchrow(
+            "UPDATE issues SET status = $2, closed_at = $3 WHERE id = $1 RETURNING *",
+            issue_uuid,
+            status.value,
+            int(time.time()) if status == IssueStatus.CLOSED else None,
+        )
+        return Issue(**issue_data) if issue_data else None
+
+    async def get_all_issues(self) -> List[Issue]:
+        return [Issue(**item) for item in await self._fetch("SELECT * FROM issues")]
+
+    async def get_issues_by_ids(self, issue_ids: List[str]) -> List[Issue]:
+        issue_uuids = [
+            issue_uuid for issue_uuid in map(_as_uuid, issue_ids) if issue_uuid
+        ]
+        if not issue_uuids:
+            return []
+
+        rows = await self._fetch("SELECT * FROM issues WHERE id = ANY($1)", issue_uuids)
+        return [Issue(**row) for row in rows]
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> List[Issue]:
+        issue_uuids = [
+            issue_uuid for issue_uuid in map(_as_uuid, issue_ids) if issue_uuid
+        ]
+        if not issue_uuids:
+            return []
+
+        status = IssueStatus(status)
+        rows = await self._fetch(
+            UPDATE_ISSUES_STATUS,
+            issue_uuids,
+            status.value,
+            int(time.time()) if status == IssueStatus.CLOSED else None,
+        )
+        return [Issue(**row) for row in rows]
+
+    async def add_message_to_issues(
+        self, issue_ids: List[str], from_user: str, text: str
+    ) -> List[Message]:
+        issue_uuids = [
+            issue_uuid for issue_uuid in map(_as_uuid, issue_ids) if issue_uuid
+        ]
+        if not issue_uuids:
+            return []
+
+        rows = await self._fetch(
+            ADD_MESSAGE_TO_ISSUES, issue_uuids, from_user, text, int(time.time())
+        )
+        return [Message(**row) for row in rows]
+
+    async def get_issue_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        issue_uuid = _as_uuid(issue_id)
+        if issue_uuid is None:
+            return None
+
+        rows = await self._fetch(GET_ISSUE_MESSAGES, issue_uuid, after_seq, limit)
+        messages = [Message(**msg) for msg in rows]
+
+        # Seqs are consecutive, so only an empty result or a gap before the
+        # first row needs the issue: to check it exists or read the archive
+        if messages and messages[0].seq == after_seq + 1:
+            return IssueWithMessages(issue_id=issue_id, messages=messages)
+
+        issue = await self.get_issue_by_id(issue_id)
+        if not issue:
+            return None
+
+        archive = None
+        if issue.archived_seq > after_seq:
+            row = await self._fetchrow(
+                "SELECT data FROM message_archives WHERE issue_id = $1", issue_uuid
+            )
+            archive = row["data"] if row else None
+        return with_archived(issue_id, archive, messages, after_seq, limit)
+
+    async def close_idle_issues(self, idle_before: int, limit: int) -> List[Issue]:
+        rows = await self._fetch(
+            "SELECT * FROM close_idle_issues($1, $2)", idle_before, limit
+        )
+        return [Issue(**item) for item in rows]
+
+    async def get_issues_to_archive(
+        self, closed_before: int, limit: int
+    ) -> List[Issue]:
+        rows = await self._fetch(
+            "SELECT * FROM issues_to_archive($1, $2)", closed_before, limit
+        )
+        return [Issue(**item) for item in rows]
+
+    async def archive_issue_messages(
+        self, issue_id: str, archive: bytes, through_seq: int
+    ) -> int:
+        issue_uuid = _as_uuid(issue_id)
+        if issue_uuid is None:
+            return 0
+
+        row = await self._fetchrow(
+            "SELECT archive_issue_messages($1, $2, $3) AS deleted",
+            issue_uuid,
+            archive,
+            through_seq,
+        )
+        return row["deleted"]
+
+    # Admin methods
+    async def get_admin_by_chat_id(self, telegram_chat_id: str) -> Optional[Admin]:
+        admin_data = await self._fetchrow(
+            "SELECT * FROM admins WHERE telegram_chat_id = $1", telegram_chat_id
+        )
+        return Admin(**admin_data) if admin_data else None
+
+    async def get_all_admins(self) -> List[Admin]:
+        return [Admin(**item) for item in await self._fetch("SELECT * FROM admins")]
+
+    async def create_admin(self, telegram_chat_id: str, username: str) -> Admin:
+        admin_data = await self._fetchrow(
+            "INSERT INTO admins (id, telegram_chat_id, username) "
+            "VALUES ($1, $2, $3) RETURNING *",
+            uuid.uuid4(),
+            telegram_chat_id,
+            username,
+        )
+        return Admin(**admin_data)
+
+    # FAQ methods
+    async def get_all_faqs(self) -> List[FAQ]:
+        rows = await self._fetch(f"SELECT {FAQ_COLUMNS} FROM faq_embeddings")
+        return [FAQ(**item) for item in rows]
+
+    async def get_faq_summaries(self) -> List[FAQSummary]:
+        rows = await self._fetch(f"SELECT {FAQ_SUMMARY_COLUMNS} FROM faq_embeddings")
+        return [FAQSummary(**item) for item in rows]
+
+    async def create_faq(
+        self,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> FAQSummary:
+        faq_data = await self._fetchrow(
+            "INSERT INTO faq_embeddings "
+            "(question, answer, embedding, content_hash, embedding_version) "
+            f"VALUES ($1, $2, $3, $4, $5) RETURNING {FAQ_SUMMARY_COLUMNS}",
+            question,
+            answer,
+            embedding,
+            content_hash(question) if embedding is not None else None,
+            embedding_version if embedding is not None else None,
+        )
+        return FAQSummary(**faq_data)
+
+    async def get_faq_by_id(self, faq_id: str) -> Optional[FAQ]:
+        faq_uuid = _as_uuid(faq_id)
+        if faq_uuid is None:
+            return None
+
+        faq_data = await self._fetchrow(
+            f"SELECT {FAQ_COLUMNS} FROM faq_embeddings WHERE id = $1", faq_uuid
+        )
+        return FAQ(**faq_data) if faq_data else None
+
+    async def get_faqs_by_ids(self, faq_ids: List[str]) -> List[FAQ]:
+        faq_uuids = [faq_uuid for faq_uuid in map(_as_uuid, faq_ids) if faq_uuid]
+        if not faq_uuids:
+            return []
+
+        rows = await self._fetch(GET_FAQS_BY_IDS, faq_uuids)
+        return [FAQ(**row) for row in rows]
+
+    async def get_faq_summary(self, faq_id: str) -> Optional[FAQSummary]:
+        faq_uuid = _as_uuid(faq_id)
+        if faq_uuid is None:
+            return None
+
+        faq_data = await self._fetchrow(
+            f"SELECT {FAQ_SUMMARY_COLUMNS} FROM faq_embeddings WHERE id = $1",
+            faq_uuid,
+        )
+        return FAQSummary(**faq_data) if faq_data else None
+
+    async def update_faq(
+        self,
+        faq_id: str,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
+        faq_uuid = _as_uuid(faq_id)
+        if faq_uuid is None:
+            return None
+
+        if embedding is None:
+            faq_data = await self._fetchrow(
+                "UPDATE faq_embeddings SET question = $2, answer = $3 "
+                f"WHERE id = $1 RETURNING {FAQ_SUMMARY_COLUMNS}",
+                faq_uuid,
+                question,
+                answer,
+            )
+        else:
+            # A fresh embedding also supersedes any pending re-embedding
+            faq_data = await self._fetchrow(
+                "UPDATE faq_embeddings SET question = $2, answer = $3, "
+                "embedding = $4, content_hash = $5, embedding_version = $6, "
+                "embedding_next = NULL, embedding_next_version = NULL "
+                f"WHERE id = $1 RETURNING {FAQ_SUMMARY_COLUMNS}",
+                faq_uuid,
+                question,
+                answer,
+                embedding,
+                content_hash(question),
+                embedding_version,
+            )
+        return FAQSummary(**faq_data) if faq_data else None
+
+    async def delete_faq(self, faq_id: str) -> bool:
+        faq_uuid = _as_uuid(faq_id)
+        if faq_uuid is None:
+            return False
+
+        deleted = await self._fetchrow(
+            "DELETE FROM faq_embeddings WHERE id = $1 RETURNING id", faq_uuid
+        )
+        return deleted is not None
+
+    async def get_faqs_needing_embedding(
+        self, embedding_version: str, limit: int
+    ) -> List[FAQSummary]:
+        rows = await self._fetch(
+            "SELECT * FROM faqs_needing_embedding($1, $2)", embedding_version, limit
+        )
+        return [FAQSummary(**item) for item in rows]
+
+    async def store_next_embeddings(
+        self, embedding_version: str, embeddings: List[Tuple[FAQSummary, np.ndarray]]
+    ) -> int:
+        updates = [
+            {
+                "id": faq.id,
+                "content_hash": faq.content_hash,
+                "embedding": to_pgvector_text(embedding),
+            }
+            for faq, embedding in embeddings
+        ]
+        row = await self._fetchrow(
+            "SELECT store_next_faq_embeddings($1, $2::jsonb) AS stored",
+            embedding_version,
+            json.dumps(updates),
+        )
+        return row["stored"]
+
+    async def swap_next_embeddings(self, embedding_version: str) -> Tuple[int, int]:
+        row = await self._fetchrow(
+            "SELECT * FROM swap_faq_embeddings($1)", embedding_version
+        )
+        return row["swapped"], row["remaining"]
+
+    async def search_similar_questions(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Search for similar questions using vector similarity"""
+        return await self._fetch(
+            MATCH_FAQ_EMBEDDINGS, query_embedding, match_threshold, limit
+        )
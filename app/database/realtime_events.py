@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from monitoring.metrics import REALTIME_DELIVERY_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Decoded realtime events, as delivered to the bots
+MANUAL_MODE = "manual_mode"
+NEW_MESSAGE = "new_message"
+ADMIN_MESSAGE = "admin_message"
+# Every status change and every new message, for the API's live feed
+STATUS_CHANGED = "status_changed"
+MESSAGE_CREATED = "message_created"
+EVENT_KINDS = (MANUAL_MODE, NEW_MESSAGE, ADMIN_MESSAGE, STATUS_CHANGED, MESSAGE_CREATED)
+
+Callback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# (index, count) of a user bot worker when chats are sharded across several
+Shard = Tuple[int, int]
+
+
+def shard_for(chat_id: Any, shards: int) -> int:
+    """Worker owning a Telegram chat, stable across processes and restarts"""
+    return zlib.crc32(str(chat_id).encode("utf-8")) % shards
+
+
+def owns_chat(shard: Optional[Shard], data: Dict[str, Any]) -> bool:
+    """Whether the worker delivers an event; events for no chat go to every one"""
+    chat_id = data.get("telegram_chat_id")
+    if shard is None or chat_id is None:
+        return True
+    index, count = shard
+    return shard_for(chat_id, count) == index
+
+
+class OrderedLanes:
+    """Runs coroutines one at a time per key, in the order they were submitted.
+
+    Events of one issue are handled in order while different issues proceed
+    concurrently; a lane's task ends once its queue is empty.
+    """
+
+    def __init__(self):
+        self.lanes: Dict[str, Deque[Awaitable[None]]] = {}
+
+    def submit(self, key: str, coro: Awaitable[None]):
+        lane = self.lanes.get(key)
+        if lane is None:
+            lane = self.lanes[key] = deque()
+            asyncio.create_task(self._drain(key, lane))
+        lane.append(coro)
+
+    async def _drain(self, key: str, lane: Deque[Awaitable[None]]):
+        while lane:
+            try:
+                await lane.popleft()
+            except Exception:
+                logger.exception(f"Error handling event for {key}")
+        del self.lanes[key]
+
+
+class RealtimeEvents:
+    """Callback registry shared by the realtime handler and its subscribers"""
+
+    def __init__(self):
+        self.callbacks: Dict[str, List[Callback]] = {kind: [] for kind in EVENT_KINDS}
+        self.shard: Optional[Shard] = None
+
+    def register_manual_mode_callback(self, callback: Callback):
+        """Register a callback for manual mode events"""
+        self.callbacks[MANUAL_MODE].append(callback)
+
+    def register_new_message_callback(self, callback: Callback):
+        """Register a callback for new message events"""
+        self.callbacks[NEW_MESSAGE].append(callback)
+
+    def register_admin_message_callback(self, callback: Callback):
+        """Register a callback for admin message events"""
+        self.callbacks[ADMIN_MESSAGE].append(callback)
+
+    def register_status_changed_callback(self, callback: Callback):
+        """Register a callback for every issue status change"""
+        self.callbacks[STATUS_CHANGED].append(callback)
+
+    def register_message_created_callback(self, callback: Callback):
+        """Register a callback for every new message"""
+        self.callbacks[MESSAGE_CREATED].append(callback)
+
+    def wants(self, kind: str) -> bool:
+        """Whether anyone receives events of this kind"""
+        return bool(self.callbacks[kind])
+
+    async def emit(
+        self, kind: str, data: Dict[str, Any], committed_at: Optional[float] = None
+    ):
+        """Hand a decoded event to the registered callbacks"""
+        if not owns_chat(self.shard, data):
+            return
+        for callback in self.callbacks[kind]:
+            await callback(data)
+
+
+def issue_key(kind: str, data: Dict[str, Any]) -> str:
+    """Issue an event belongs to, which decides its ordering lane"""
+    if kind == MANUAL_MODE:
+        return str(data.get("id", ""))
+    return str(data.get("issue_id", ""))
+
+
+def encode_event(kind: str, data: Dict[str, Any], committed_at: Optional[float]):
+    """One newline-terminated JSON line of the ingress protocol"""
+    event = {
+        "kind": kind,
+        "data": data,
+        "committed_at": committed_at,
+        "sent_at": time.time(),
+    }
+    return json.dumps(event, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class RealtimeSubscriber(RealtimeEvents):
+    """Receives decoded realtime events from the ingress process over a Unix socket.
+
+    Only the kinds with a registered callback are requested. Events are
+    handled in order per issue; if the ingress goes away the subscriber
+    reconnects, and events published in between are not replayed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        worker: str,
+        shard: Optional[Shard] = None,
+        retry_seconds: float = 1.0,
+    ):
+        super().__init__()
+        self.shard = shard
+        self.path = path
+        self.worker = worker
+        self.retry_seconds = retry_seconds
+        self.lanes = OrderedLanes()
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start receiving events in the background"""
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    async def _run(self):
+        delay = self.retry_seconds
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning(f"Realtime ingress at {self.path} unavailable: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+
+            delay = self.retry_seconds
+            kinds = [kind for kind, callbacks in self.callbacks.items() if callbacks]
+            hello = {"worker": self.worker, "kinds": kinds, "shard": self.shard}
+            writer.write(json.dumps(hello).encode("utf-8") + b"\n")
+            logger.info(f"Subscribed to realtime ingress for {', '.join(kinds)}")
+
+            try:
+                while line := await reader.readline():
+                    self._dispatch(json.loads(line))
+            except (OSError, ValueError) as e:
+                logger.error(f"Realtime ingress connection failed: {e}")
+            finally:
+                writer.close()
+
+            logger.warning("Realtime ingress closed the connection, reconnecting")
+            await asyncio.sleep(self.retry_seconds)
+
+    def _dispatch(self, event: Dict[str, Any]):
+        kind, data = event["kind"], event["data"]
+        # Commit time when the event carries one, else when the ingress sent it
+        origin = event.get("committed_at") or event["sent_at"]
+        REALTIME_DELIVERY_LAG_SECONDS.observe(
+            max(0.0, time.time() - origin), self.worker, kind
+        )
+        self.lanes.submit(
+            issue_key(kind, data), self.emit(kind, data, event.get("committed_at"))
+        )
+
+
+def get_realtime_source(worker: str, shard: Optional[Shard] = None) -> RealtimeEvents:
+    """Event source for a bot process.
+
+    With REALTIME_INGRESS_SOCKET set (run_bots.py sets it) events come from the
+    shared ingress process; otherwise the bot holds its own subscriptions. A
+    sharded worker only receives the events of the chats it owns.
+    """
+    path = os.getenv("REALTIME_INGRESS_SOCKET")
+    if path:
+        return RealtimeSubscriber(path, worker, shard)
+
+    from database.realtime_handler import realtime_handler
+
+    realtime_handler.shard = shard
+    return realtime_handler
@@ -1,10 +1,25 @@
 import os
+import time
 import logging
-import asyncio
 import aiohttp
-from typing import Dict, Any, Callable, List, Optional
+from datetime import datetime
+from typing import Dict, Any, Optional
 from supabase.client import AsyncClient, create_async_client
 from dotenv import load_dotenv
+from database.realtime_events import (
+    ADMIN_MESSAGE,
+    MANUAL_MODE,
+    MESSAGE_CREATED,
+    NEW_MESSAGE,
+    STATUS_CHANGED,
+    OrderedLanes,
+    RealtimeEvents,
+)
+from monitoring.metrics import (
+    REALTIME_EVENT_LAG_SECONDS,
+    REALTIME_EVENT_HANDLING_SECONDS,
+    timed,
+)
 
 # Load environment variables
 load_dotenv()
@@ -16,12 +31,13 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class RealtimeHandler:
+class RealtimeHandler(RealtimeEvents):
     def __init__(self):
-        # Event callbacks
-        self.manual_mode_callbacks: List[Callable[[Dict[str, Any]], None]] = []
-        self.new_message_callbacks: List[Callable[[Dict[str, Any]], None]] = []
-        self.admin_message_callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        super().__init__()
+        # Events of one issue are handled in the order they arrive
+        self.lanes = OrderedLanes()
+        # Logged once when issue updates lack the old row (migration 001)
+        self._warned_replica_identity = False
 
         # Initialize async Supabase client
         self.supabase_url = os.getenv("SUPABASE_URL")
@@ -59,32 +75,85 @@ class RealtimeHandler:
 
         logger.info("Realtime event handler started")
 
-    def _handle_issue_update_wrapper(self, payload: Dict[str, Any]):
-        """Wrapper for handling issue updates that creates a task"""
-        asyncio.create_task(self._handle_issue_update(payload))
+    @staticmethod
+    def _observe_lag(
+        payload: Dict[str, Any], table: str, event: str
+    ) -> Optional[float]:
+        """Record the delay between the database commit and receiving the event"""
+        commit_timestamp = payload.get("data", {}).get("commit_timestamp")
+        if not commit_timestamp:
+            return None
+
+        try:
+            committed_at = datetime.fromisoformat(commit_timestamp).timestamp()
+        except ValueError:
+            return None
+
+        REALTIME_EVENT_LAG_SECONDS.observe(
+            max(0.0, time.time() - committed_at), table, event
+        )
+        return committed_at
 
-    async def _handle_issue_update(self, payload: Dict[str, Any]):
+    def _handle_issue_update_wrapper(self, payload: Dict[str, Any]):
+        """Wrapper for handling issue updates that queues them per issue"""
+        committed_at = self._observe_lag(payload, "issues", "UPDATE")
+        issue_id = payload.get("data", {}).get("record", {}).get("id")
+        self.lanes.submit(
+            str(issue_id), self._handle_issue_update(payload, committed_at)
+        )
+
+    @timed(REALTIME_EVENT_HANDLING_SECONDS, "issues", "UPDATE")
+    async def _handle_issue_update(
+        self, payload: Dict[str, Any], committed_at: Optional[float] = None
+    ):
         """Handle issue updates"""
         logger.info(f"Received issue update: {payload}")
 
-        # Check if status changed to manual
         new_record = payload.get("data", {}).get("record", {})
         old_record = payload.get("data", {}).get("old_record", {})
 
-        if (
-            new_record.get("status") == "manual"
-            and old_record.get("status") != "manual"
-        ):
+        # Message inserts also update the issue (last_seq); only status changes
+        # are events. The old status needs REPLICA IDENTITY FULL on issues
+        # (migration 001), without it old_record only holds the id.
+        if "status" not in old_record:
+            if not self._warned_replica_identity:
+                logger.warning(
+                    "Issue updates carry no old status, ignoring them; "
+                    "run migrations/001_message_seq.sql"
+                )
+                self._warned_replica_identity = True
+            return
+
+        old_status = old_record["status"]
+        if new_record.get("status") != old_status:
+            await self.emit(
+                STATUS_CHANGED,
+                {
+                    "issue_id": new_record.get("id"),
+                    "old_status": old_status,
+                    "issue": new_record,
+                },
+                committed_at,
+            )
+
+        # Check if status changed to manual
+        if new_record.get("status") == "manual" and old_status != "manual":
             logger.info(f"Issue {new_record.get('id')} switched to manual mode")
             # Notify all registered callbacks
-            for callback in self.manual_mode_callbacks:
-                await callback(new_record)
+            await self.emit(MANUAL_MODE, new_record, committed_at)
 
     def _handle_message_update_wrapper(self, payload: Dict[str, Any]):
-        """Wrapper for handling message updates that creates a task"""
-        asyncio.create_task(self._handle_message_update(payload))
-
-    async def _handle_message_update(self, payload: Dict[str, Any]):
+        """Wrapper for handling message updates that queues them per issue"""
+        committed_at = self._observe_lag(payload, "messages", "INSERT")
+        issue_id = payload.get("data", {}).get("record", {}).get("issue_id")
+        self.lanes.submit(
+            str(issue_id), self._handle_message_update(payload, committed_at)
+        )
+
+    @timed(REALTIME_EVENT_HANDLING_SECONDS, "messages", "INSERT")
+    async def _handle_message_update(
+        self, payload: Dict[str, Any], committed_at: Optional[float] = None
+    ):
         """Handle message updates"""
         logger.info(f"Received message update: {payload}")
 
@@ -99,6 +168,22 @@ class RealtimeHandler:
             logger.error(f"Message update missing issue_id: {payload}")
             return
 
+        message = {
+            "id": new_record.get("id"),
+            "issue_id": issue_id,
+            "from_user": new_record.get("from_user"),
+            "text": new_record.get("text"),
+            "timestamp": new_record.get("timestamp"),
+            "seq": new_record.get("seq"),
+        }
+        await self.emit(
+            MESSAGE_CREATED, {"issue_id": issue_id, "message": message}, committed_at
+        )
+
+        # The events below only concern manual issues, which takes a lookup
+        if not (self.wants(NEW_MESSAGE) or self.wants(ADMIN_MESSAGE)):
+            return
+
         # Get the issue to check if it's in manual mode
         async with aiohttp.ClientSession() as session:
             response = await session.get(
@@ -116,46 +201,25 @@ class RealtimeHandler:
                 logger.info(f"Ignoring message for non-manual issue {issue_id}")
                 return
 
-        # Process the message
-        message = {
-            "id": new_record.get("id"),
-            "issue_id": issue_id,
-            "from_user": new_record.get("from_user"),
-            "text": new_record.get("text"),
-            "timestamp": new_record.get("timestamp"),
-        }
-
         # Check if it's from admin or user
         if message["from_user"] == "Admin":
             logger.info(f"New admin message in issue {issue_id}")
             # Notify admin message callbacks
-            for callback in self.admin_message_callbacks:
-                await callback(
-                    {
-                        "issue_id": issue_id,
-                        "telegram_chat_id": issue_data.get("telegram_chat_id"),
-                        "message": message,
-                    }
-                )
+            await self.emit(
+                ADMIN_MESSAGE,
+                {
+                    "issue_id": issue_id,
+                    "telegram_chat_id": issue_data.get("telegram_chat_id"),
+                    "message": message,
+                },
+                committed_at,
+            )
         elif message["from_user"] != "GPT":
             logger.info(f"New user message in issue {issue_id}")
             # Notify new message callbacks
-            for callback in self.new_message_callbacks:
-                await callback({"issue_id": issue_id, "message": message})
-
-    def register_manual_mode_callback(self, callback: Callable[[Dict[str, Any]], None]):
-        """Register a callback for manual mode events"""
-        self.manual_mode_callbacks.append(callback)
-
-    def register_new_message_callback(self, callback: Callable[[Dict[str, Any]], None]):
-        """Register a callback for new message events"""
-        self.new_message_callbacks.append(callback)
-
-    def register_admin_message_callback(
-        self, callback: Callable[[Dict[str, Any]], None]
-    ):
-        """Register a callback for admin message events"""
-        self.admin_message_callbacks.append(callback)
+            await self.emit(
+                NEW_MESSAGE, {"issue_id": issue_id, "message": message}, committed_at
+            )
 
     async def stop(self):
         """Stop listening for realtime events"""
@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+from dotenv import load_dotenv
+from database.realtime_events import Shard, encode_event, owns_chat
+from database.realtime_handler import RealtimeHandler
+from monitoring.metrics import REALTIME_INGRESS_BACKLOG
+from monitoring.metrics_server import start_metrics_server
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv("REALTIME_INGRESS_METRICS_PORT", "9103"))
+
+
+class WorkerConnection:
+    """A connected bot worker and the events queued for it"""
+
+    def __init__(
+        self,
+        worker: str,
+        kinds: Set[str],
+        shard: Optional[Shard],
+        writer: asyncio.StreamWriter,
+    ):
+        self.worker = worker
+        self.kinds = kinds
+        self.shard = shard
+        self.writer = writer
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def wants(self, kind: str, data: Dict[str, Any]) -> bool:
+        return kind in self.kinds and owns_chat(self.shard, data)
+
+    def send(self, line: bytes):
+        self.queue.put_nowait(line)
+        REALTIME_INGRESS_BACKLOG.set(self.queue.qsize(), self.worker)
+
+    async def run(self):
+        """Write queued events in order until the worker disconnects"""
+        while True:
+            line = await self.queue.get()
+            self.writer.write(line)
+            try:
+                await self.writer.drain()
+            except OSError:
+                return
+            REALTIME_INGRESS_BACKLOG.set(self.queue.qsize(), self.worker)
+
+
+class RealtimeIngress(RealtimeHandler):
+    """Holds the only Supabase realtime subscriptions of the bots.
+
+    Events are decoded once (including the issue lookup for new messages) and
+    written as JSON lines to every worker connected to the Unix socket at
+    `path` that asked for that kind of event; sharded user bot workers only get
+    the events of the chats they own. Each issue's events are decoded
+    in order and each connection is written in order, so workers see the
+    events of an issue in commit order.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.workers: Set[WorkerConnection] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        # A socket left behind by a previous run would make bind fail
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._serve, path=self.path)
+        os.chmod(self.path, 0o600)
+        logger.info(f"Realtime ingress listening on {self.path}")
+
+        await super().start()
+
+    def wants(self, kind: str) -> bool:
+        return any(kind in worker.kinds for worker in self.workers)
+
+    async def emit(self, kind, data, committed_at=None):
+        receivers = [worker for worker in self.workers if worker.wants(kind, data)]
+        if receivers:
+            line = encode_event(kind, data, committed_at)
+            for worker in receivers:
+                worker.send(line)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = json.loads(await reader.readline())
+        except ValueError:
+            writer.close()
+            return
+
+        shard = tuple(hello["shard"]) if hello.get("shard") else None
+        worker = WorkerConnection(hello["worker"], set(hello["kinds"]), shard, writer)
+        self.workers.add(worker)
+        logger.info(f"Worker {worker.worker} subscribed to {sorted(worker.kinds)}")
+        sender = asyncio.create_task(worker.run())
+        try:
+            # Workers send nothing after the hello; EOF means they went away
+            await reader.read()
+        except OSError as e:
+            logger.info(f"Worker {worker.worker} connection failed: {e}")
+        finally:
+            sender.cancel()
+            self.workers.discard(worker)
+            REALTIME_INGRESS_BACKLOG.set(0, worker.worker)
+            writer.close()
+            logger.info(f"Worker {worker.worker} disconnected")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+        for worker in list(self.workers):
+            worker.writer.close()
+        await super().stop()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+async def serve(path: str):
+    ingress = RealtimeIngress(path)
+
+    # Expose metrics on a local port (0 disables it)
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_PORT)
+
+    await ingress.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await ingress.stop()
+
+
+def main():
+    """Run the realtime ingress on REALTIME_INGRESS_SOCKET"""
+    asyncio.run(serve(os.environ["REALTIME_INGRESS_SOCKET"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from typing import Iterable, List, Dict, Any, Tuple
+
+import numpy as np
+
+from models.embedding import to_embedding
+
+
+def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    norm = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / norm) if norm else 0.0
+
+
+def brute_force_search(
+    query_embedding: np.ndarray,
+    rows: Iterable[Tuple[Dict[str, Any], Any]],
+    match_threshold: float,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Exact equivalent of the match_faq_embeddings SQL function.
+
+    `rows` yields (faq fields, embedding) pairs; results carry id, question,
+    answer and similarity, best match first.
+    """
+    query = to_embedding(query_embedding)
+
+    faqs, vectors = [], []
+    for faq, embedding in rows:
+        embedding = to_embedding(embedding)
+        if embedding is None or embedding.shape != query.shape:
+            continue
+        faqs.append(faq)
+        vectors.append(embedding)
+
+    if not faqs:
+        return []
+
+    # One matrix-vector product instead of a Python loop per FAQ
+    matrix = np.vstack(vectors)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    similarities = np.divide(
+        matrix @ query,
+        norms,
+        out=np.zeros(len(faqs), dtype=np.float32),
+        where=norms > 0,
+    )
+
+    matches = np.flatnonzero(similarities > match_threshold)
+    best = matches[np.argsort(-similarities[matches], kind="stable")][:limit]
+    return [
+        {
+            "id": faqs[i]["id"],
+            "question": faqs[i]["question"],
+            "answer": faqs[i]["answer"],
+            "similarity": float(similarities[i]),
+        }
+        for i in best
+    ]
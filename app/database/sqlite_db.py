@@ -0,0 +1,587 @@
+import time
+import uuid
+import sqlite3
+import numpy as np
+from typing import List, Optional, Dict, Any, Tuple
+from models.issue import Issue, IssueStatus, IssueWithMessages, Message
+from models.admin import Admin
+from models.faq import FAQ, FAQSummary
+from database.similarity import brute_force_search
+from database.message_archive import with_archived
+from models.embedding import content_hash, to_bytes
+from monitoring.metrics import DB_OPERATION_SECONDS, instrument_async_methods
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS admins (
+  id TEXT PRIMARY KEY,
+  telegram_chat_id TEXT NOT NULL UNIQUE,
+  username TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS faq_embeddings (
+  id TEXT PRIMARY KEY,
+  question TEXT NOT NULL,
+  answer TEXT NOT NULL,
+  embedding BLOB NULL,
+  content_hash TEXT NULL,
+  embedding_version TEXT NULL,
+  embedding_next BLOB NULL,
+  embedding_next_version TEXT NULL
+);
+
+CREATE TABLE IF NOT EXISTS issues (
+  id TEXT PRIMARY KEY,
+  telegram_chat_id TEXT NOT NULL,
+  username TEXT NOT NULL,
+  status TEXT NOT NULL CHECK (status IN ('open', 'manual', 'closed')),
+  last_seq INTEGER NOT NULL DEFAULT 0,
+  last_activity_at INTEGER NOT NULL DEFAULT 0,
+  closed_at INTEGER NULL,
+  archived_seq INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_issues_telegram_chat_id ON issues (telegram_chat_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_issues_active_chat_id
+  ON issues (telegram_chat_id) WHERE status != 'closed';
+CREATE INDEX IF NOT EXISTS idx_issues_status ON issues (status);
+CREATE INDEX IF NOT EXISTS idx_issues_active_last_activity
+  ON issues (last_activity_at) WHERE status != 'closed';
+CREATE INDEX IF NOT EXISTS idx_issues_closed_at
+  ON issues (closed_at) WHERE status = 'closed' AND last_seq > archived_seq;
+
+CREATE TABLE IF NOT EXISTS messages (
+  id TEXT PRIMARY KEY,
+  issue_id TEXT NOT NULL REFERENCES issues (id) ON DELETE CASCADE,
+  from_user TEXT NOT NULL,
+  text TEXT NOT NULL,
+  timestamp INTEGER NOT NULL,
+  seq INTEGER NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_issue_id_seq ON messages (issue_id, seq);
+
+CREATE TABLE IF NOT EXISTS message_archives (
+  issue_id TEXT PRIMARY KEY REFERENCES issues (id) ON DELETE CASCADE,
+  data BLOB NOT NULL,
+  archived_at INTEGER NOT NULL
+);
+"""
+
+# Brings database files created before message sequence numbers up to date
+MIGRATE_MESSAGE_SEQ = """
+ALTER TABLE issues ADD COLUMN last_seq INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE messages ADD COLUMN seq INTEGER NOT NULL DEFAULT 0;
+
+UPDATE messages SET seq = (
+  SELECT COUNT(*) FROM messages earlier
+  WHERE earlier.issue_id = messages.issue_id AND earlier.rowid <= messages.rowid
+);
+UPDATE issues SET last_seq = (
+  SELECT COALESCE(MAX(seq), 0) FROM messages WHERE messages.issue_id = issues.id
+);
+
+DROP INDEX IF EXISTS idx_messages_issue_id;
+"""
+
+MIGRATE_FAQ_EMBEDDING_VERSIONS = """
+ALTER TABLE faq_embeddings ADD COLUMN content_hash TEXT NULL;
+ALTER TABLE faq_embeddings ADD COLUMN embedding_version TEXT NULL;
+ALTER TABLE faq_embeddings ADD COLUMN embedding_next BLOB NULL;
+ALTER TABLE faq_embeddings ADD COLUMN embedding_next_version TEXT NULL;
+
+UPDATE faq_embeddings
+SET content_hash = content_hash(question),
+    embedding_version = 'text-embedding-ada-002'
+WHERE embedding IS NOT NULL;
+"""
+
+MIGRATE_ISSUE_ACTIVITY = """
+ALTER TABLE issues ADD COLUMN last_activity_at INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE issues ADD COLUMN closed_at INTEGER NULL;
+ALTER TABLE issues ADD COLUMN archived_seq INTEGER NOT NULL DEFAULT 0;
+
+UPDATE issues SET last_activity_at = COALESCE(
+  (SELECT MAX(timestamp) FROM messages WHERE messages.issue_id = issues.id),
+  CAST(strftime('%s', 'now') AS INTEGER)
+);
+UPDATE issues SET closed_at = last_activity_at WHERE status = 'closed';
+"""
+
+# Run before the unique index on active issues is created: keeps the most
+# recently active issue of each chat open and closes the others
+CLOSE_DUPLICATE_ACTIVE_ISSUES = """
+UPDATE issues SET status = 'closed', closed_at = CAST(strftime('%s', 'now') AS INTEGER)
+WHERE status != 'closed' AND EXISTS (
+  SELECT 1 FROM issues newer
+  WHERE newer.telegram_chat_id = issues.telegram_chat_id
+    AND newer.status != 'closed'
+    AND (newer.last_activity_at, newer.rowid) > (issues.last_activity_at, issues.rowid)
+);
+"""
+
+# (table, column, script adding the column to files created without it)
+MIGRATIONS = (
+    ("messages", "seq", MIGRATE_MESSAGE_SEQ),
+    ("faq_embeddings", "content_hash", MIGRATE_FAQ_EMBEDDING_VERSIONS),
+    ("issues", "last_activity_at", MIGRATE_ISSUE_ACTIVITY),
+)
+
+FAQ_SUMMARY_COLUMNS = "id, question, answer, content_hash, embedding_version"
+
+NEEDS_EMBEDDING = (
+    "embedding_version IS NOT :version AND embedding_next_version IS NOT :version"
+)
+
+
+@instrument_async_methods(DB_OPERATION_SECONDS, "sqlite", span="db")
+class SQLiteDB:
+    """Storage backend on a local SQLite file, for single-node deployments.
+
+    Vector search is a brute-force scan over the stored FAQ embeddings, which
+    is fast enough for a few thousand FAQs.
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.create_function(
+            "content_hash", 1, content_hash, deterministic=True
+        )
+        self._migrate()
+        self.connection.executescript(SCHEMA)
+
+    def _migrate(self):
+        for table, column, script in MIGRATIONS:
+            columns = {
+                row["name"]
+                for row in self.connection.execute(f"PRAGMA table_info({table})")
+            }
+            if columns and column not in columns:
+                self.connection.executescript(script)
+
+        indexes = {
+            row["name"]
+            for row in self.connection.execute(
+                "SELECT name FROM sqlite_master WHERE tbl_name = 'issues'"
+            )
+        }
+        if indexes and "idx_issues_active_chat_id" not in indexes:
+            self.connection.executescript(CLOSE_DUPLICATE_ACTIVE_ISSUES)
+
+    def _fetch_one(self, query: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(query, params).fetchone()
+        return dict(row) if row else None
+
+    def _fetch_all(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        with self.connection:
+            return self.connection.execute(query, params).rowcount
+
+    # Issue methods
+    async def get_open_issue_by_chat_id(self, telegram_chat_id: str) -> Optional[Issue]:
+        issue_data = self._fetch_one(
+            "SELECT * FROM issues WHERE telegram_chat_id = ? AND status != 'closed'",
+            (telegram_chat_id,),
+        )
+        return Issue(**issue_data) if issue_data else None
+
+    async def create_issue(self, telegram_chat_id: str, username: str) -> Issue:
+        issue_data = {
+            "id": str(uuid.uuid4()),
+            "telegram_chat_id": telegram_chat_id,
+            "username": username,
+            "status": IssueStatus.OPEN.value,
+            "last_activity_at": int(time.time()),
+        }
+        self._execute(
+            "INSERT INTO issues (id, telegram_chat_id, username, status, "
+            "last_activity_at) "
+            "VALUES (:id, :telegram_chat_id, :username, :status, :last_activity_at)",
+            issue_data,
+        )
+        return Issue(**issue_data)
+
+    async def get_or_create_open_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        with self.connection:
+            row = self.connection.execute(
+                "INSERT INTO issues (id, telegram_chat_id, username, status, "
+                "last_activity_at) VALUES (?, ?, ?, 'open', ?) "
+                "ON CONFLICT (telegram_chat_id) WHERE status != 'closed' DO NOTHING "
+                "RETURNING *",
+                (str(uuid.uuid4()), telegram_chat_id, username, int(time.time())),
+            ).fetchone()
+            if row:
+                return Issue(**dict(row)), True
+
+            row = self.connection.execute(
+                "SELECT * FROM issues WHERE telegram_chat_id = ? AND status != 'closed'",
+                (telegram_chat_id,),
+            ).fetchone()
+        return Issue(**dict(row)), False
+
+    async def get_issue_by_id(self, issue_id: str) -> Optional[Issue]:
+        issue_data = self._fetch_one("SELECT * FROM issues WHERE id = ?", (issue_id,))
+        return Issue(**issue_data) if issue_data else None
+
+    async def add_message_to_issue(
+        self, issue_id: str, from_user: str, text: str
+    ) -> Optional[Message]:
+        timestamp = int(time.time())
+        with self.connection:
+            # Bumping the counter doubles as the existence check
+            row = self.connection.execute(
+                "UPDATE issues SET last_seq = last_seq + 1, last_activity_at = ? "
+                "WHERE id = ? RETURNING last_seq",
+                (timestamp, issue_id),
+            ).fetchone()
+            if not row:
+                return None
+
+            message_data = {
+                "id": str(uuid.uuid4()),
+                "issue_id": issue_id,
+                "from_user": from_user,
+                "text": text,
+                "timestamp": timestamp,
+                "seq": row["last_seq"],
+            }
+            self.connection.execute(
+                "INSERT INTO messages (id, issue_id, from_user, text, timestamp, seq) "
+                "VALUES (:id, :issue_id, :from_user, :text, :timestamp, :seq)",
+                message_data,
+            )
+        return Message(**message_data)
+
+    async def update_issue_status(
+        self, issue_id: str, status: IssueStatus
+    ) -> Optional[Issue]:
+        status = IssueStatus(status)
+        closed_at = int(time.time()) if status == IssueStatus.CLOSED else None
+        updated = self._execute(
+            "UPDATE issues SET status = ?, closed_at = ? WHERE id = ?",
+            (status.value, closed_at, issue_id),
+        )
+        if not updated:
+            return None
+
+        return await self.get_issue_by_id(issue_id)
+
+    async def get_all_issues(self) -> List[Issue]:
+        return [Issue(**item) for item in self._fetch_all("SELECT * FROM issues")]
+
+    async def get_issues_by_ids(self, issue_ids: List[str]) -> List[Issue]:
+        if not issue_ids:
+            return []
+
+        placeholders = ", ".join("?" * len(issue_ids))
+        rows = self._fetch_all(
+            f"SELECT * FROM issues WHERE id IN ({placeholders})", tuple(issue_ids)
+        )
+        return [Issue(**row) for row in rows]
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> List[Issue]:
+        if not issue_ids:
+            return []
+
+        status = IssueStatus(status)
+        closed_at = int(time.time()) if status == IssueStatus.CLOSED else None
+        placeholders = ", ".join("?" * len(issue_ids))
+        with self.connection:
+            rows = self.connection.execute(
+                f"UPDATE issues SET status = ?, closed_at = ? "
+                f"WHERE id IN ({placeholders}) AND status != 'closed' RETURNING *",
+                (status.value, closed_at, *issue_ids),
+            ).fetchall()
+        return [Issue(**dict(row)) for row in rows]
+
+    async def add_message_to_issues(
+        self, issue_ids: List[str], from_user: str, text: str
+    ) -> List[Message]:
+        if not issue_ids:
+            return []
+
+        timestamp = int(time.time())
+        placeholders = ", ".join("?" * len(issue_ids))
+        with self.connection:
+            # Bumping the counters doubles as the existence and status check
+            counters = self.connection.execute(
+                f"UPDATE issues SET last_seq = last_seq + 1, last_activity_at = ? "
+                f"WHERE id IN ({placeholders}) AND status != 'closed' "
+                f"RETURNING id, last_seq",
+                (timestamp, *issue_ids),
+            ).fetchall()
+
+            messages = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "issue_id": row["id"],
+                    "from_user": from_user,
+                    "text": text,
+                    "timestamp": timestamp,
+                    "seq": row["last_seq"],
+                }
+                for row in counters
+            ]
+            self.connection.executemany(
+                "INSERT INTO messages (id, issue_id, from_user, text, timestamp, seq) "
+                "VALUES (:id, :issue_id, :from_user, :text, :timestamp, :seq)",
+                messages,
+            )
+        return [Message(**message_data) for message_data in messages]
+
+    async def get_issue_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        issue = await self.get_issue_by_id(issue_id)
+        if not issue:
+            return None
+
+        # A negative LIMIT means no limit in SQLite
+        rows = self._fetch_all(
+            "SELECT * FROM messages WHERE issue_id = ? AND seq > ? "
+            "ORDER BY seq LIMIT ?",
+            (issue_id, after_seq, -1 if limit is None else limit),
+        )
+
+        archive = None
+        if issue.archived_seq > after_seq:
+            row = self._fetch_one(
+                "SELECT data FROM message_archives WHERE issue_id = ?", (issue_id,)
+            )
+            archive = row["data"] if row else None
+        return with_archived(
+            issue_id, archive, [Message(**msg) for msg in rows], after_seq, limit
+        )
+
+    async def close_idle_issues(self, idle_before: int, limit: int) -> List[Issue]:
+        with self.connection:
+            rows = self.connection.execute(
+                "UPDATE issues SET status = 'closed', closed_at = :now "
+                "WHERE id IN ("
+                "  SELECT id FROM issues"
+                "  WHERE status != 'closed' AND last_activity_at < :idle_before"
+                "  ORDER BY last_activity_at LIMIT :limit"
+                ") RETURNING *",
+                {"now": int(time.time()), "idle_before": idle_before, "limit": limit},
+            ).fetchall()
+        return [Issue(**dict(row)) for row in rows]
+
+    async def get_issues_to_archive(
+        self, closed_before: int, limit: int
+    ) -> List[Issue]:
+        rows = self._fetch_all(
+            "SELECT * FROM issues WHERE status = 'closed' AND last_seq > archived_seq "
+            "AND closed_at < ? ORDER BY closed_at LIMIT ?",
+            (closed_before, limit),
+        )
+        return [Issue(**item) for item in rows]
+
+    async def archive_issue_messages(
+        self, issue_id: str, archive: bytes, through_seq: int
+    ) -> int:
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO message_archives (issue_id, data, archived_at) "
+                "VALUES (?, ?, ?) ON CONFLICT (issue_id) "
+                "DO UPDATE SET data = excluded.data, archived_at = excluded.archived_at",
+                (issue_id, archive, int(time.time())),
+            )
+            deleted = self.connection.execute(
+                "DELETE FROM messages WHERE issue_id = ? AND seq <= ?",
+                (issue_id, through_seq),
+            ).rowcount
+            self.connection.execute(
+                "UPDATE issues SET archived_seq = ? WHERE id = ?",
+                (through_seq, issue_id),
+            )
+        return deleted
+
+    # Admin methods
+    async def get_admin_by_chat_id(self, telegram_chat_id: str) -> Optional[Admin]:
+        admin_data = self._fetch_one(
+            "SELECT * FROM admins WHERE telegram_chat_id = ?", (telegram_chat_id,)
+        )
+        return Admin(**admin_data) if admin_data else None
+
+    async def get_all_admins(self) -> List[Admin]:
+        return [Admin(**item) for item in self._fetch_all("SELECT * FROM admins")]
+
+    async def create_admin(self, telegram_chat_id: str, username: str) -> Admin:
+        admin_data = {
+            "id": str(uuid.uuid4()),
+            "telegram_chat_id": telegram_chat_id,
+            "username": username,
+        }
+        self._execute(
+            "INSERT INTO admins (id, telegram_chat_id, username) "
+            "VALUES (:id, :telegram_chat_id, :username)",
+            admin_data,
+        )
+        return Admin(**admin_data)
+
+    # FAQ methods
+    async def get_all_faqs(self) -> List[FAQ]:
+        return [FAQ(**item) for item in self._fetch_all("SELECT * FROM faq_embeddings")]
+
+    async def get_faq_summaries(self) -> List[FAQSummary]:
+        rows = self._fetch_all(f"SELECT {FAQ_SUMMARY_COLUMNS} FROM faq_embeddings")
+        return [FAQSummary(**item) for item in rows]
+
+    async def create_faq(
+        self,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> FAQSummary:
+        faq_data = {
+            "id": str(uuid.uuid4()),
+            "question": question,
+            "answer": answer,
+            "embedding": None,
+            "content_hash": None,
+            "embedding_version": None,
+        }
+        if embedding is not None:
+            faq_data.update(
+                embedding=to_bytes(embedding),
+                content_hash=content_hash(question),
+                embedding_version=embedding_version,
+            )
+
+        self._execute(
+            "INSERT INTO faq_embeddings "
+            "(id, question, answer, embedding, content_hash, embedding_version) "
+            "VALUES (:id, :question, :answer, :embedding, :content_hash, "
+            ":embedding_version)",
+            faq_data,
+        )
+        return FAQSummary(**faq_data)
+
+    async def get_faq_by_id(self, faq_id: str) -> Optional[FAQ]:
+        faq_data = self._fetch_one(
+            "SELECT * FROM faq_embeddings WHERE id = ?", (faq_id,)
+        )
+        return FAQ(**faq_data) if faq_data else None
+
+    async def get_faqs_by_ids(self, faq_ids: List[str]) -> List[FAQ]:
+        if not faq_ids:
+            return []
+
+        placeholders = ", ".join("?" * len(faq_ids))
+        rows = self._fetch_all(
+            f"SELECT {FAQ_SUMMARY_COLUMNS}, embedding FROM faq_embeddings "
+            f"WHERE id IN ({placeholders})",
+            tuple(faq_ids),
+        )
+        return [FAQ(**row) for row in rows]
+
+    async def get_faq_summary(self, faq_id: str) -> Optional[FAQSummary]:
+        faq_data = self._fetch_one(
+            f"SELECT {FAQ_SUMMARY_COLUMNS} FROM faq_embeddings WHERE id = ?",
+            (faq_id,),
+        )
+        return FAQSummary(**faq_data) if faq_data else None
+
+    async def update_faq(
+        self,
+        faq_id: str,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
+        if embedding is not None:
+            # A fresh embedding also supersedes any pending re-embedding
+            updated = self._execute(
+                "UPDATE faq_embeddings SET question = ?, answer = ?, embedding = ?, "
+                "content_hash = ?, embedding_version = ?, "
+                "embedding_next = NULL, embedding_next_version = NULL "
+                "WHERE id = ?",
+                (
+                    question,
+                    answer,
+                    to_bytes(embedding),
+                    content_hash(question),
+                    embedding_version,
+                    faq_id,
+                ),
+            )
+        else:
+            updated = self._execute(
+                "UPDATE faq_embeddings SET question = ?, answer = ? WHERE id = ?",
+                (question, answer, faq_id),
+            )
+        if not updated:
+            return None
+
+        return await self.get_faq_summary(faq_id)
+
+    async def delete_faq(self, faq_id: str) -> bool:
+        return self._execute("DELETE FROM faq_embeddings WHERE id = ?", (faq_id,)) > 0
+
+    async def get_faqs_needing_embedding(
+        self, embedding_version: str, limit: int
+    ) -> List[FAQSummary]:
+        rows = self._fetch_all(
+            f"SELECT {FAQ_SUMMARY_COLUMNS} FROM faq_embeddings "
+            f"WHERE {NEEDS_EMBEDDING} ORDER BY id LIMIT :limit",
+            {"version": embedding_version, "limit": limit},
+        )
+        return [FAQSummary(**item) for item in rows]
+
+    async def store_next_embeddings(
+        self, embedding_version: str, embeddings: List[Tuple[FAQSummary, np.ndarray]]
+    ) -> int:
+        with self.connection:
+            cursor = self.connection.executemany(
+                "UPDATE faq_embeddings "
+                "SET embedding_next = ?, embedding_next_version = ? "
+                "WHERE id = ? AND content_hash IS ?",
+                [
+                    (to_bytes(embedding), embedding_version, faq.id, faq.content_hash)
+                    for faq, embedding in embeddings
+                ],
+            )
+            return cursor.rowcount
+
+    async def swap_next_embeddings(self, embedding_version: str) -> Tuple[int, int]:
+        # One write transaction, so no FAQ can change in between
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            remaining = self.connection.execute(
+                f"SELECT COUNT(*) FROM faq_embeddings WHERE {NEEDS_EMBEDDING}",
+                {"version": embedding_version},
+            ).fetchone()[0]
+            if remaining:
+                return 0, remaining
+
+            swapped = self.connection.execute(
+                "UPDATE faq_embeddings SET embedding = embedding_next, "
+                "content_hash = content_hash(question), embedding_version = :version, "
+                "embedding_next = NULL, embedding_next_version = NULL "
+                "WHERE embedding_next_version = :version",
+                {"version": embedding_version},
+            ).rowcount
+            return swapped, 0
+
+    async def search_similar_questions(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Search for similar questions by brute-force cosine similarity"""
+        # Embeddings are float32 blobs (or JSON text in older files)
+        rows = self._fetch_all("SELECT * FROM faq_embeddings")
+        return brute_force_search(
+            query_embedding,
+            ((row, row["embedding"]) for row in rows),
+            match_threshold,
+            limit,
+        )
@@ -0,0 +1,159 @@
+import numpy as np
+from typing import List, Optional, Dict, Any, Protocol, Tuple
+from models.issue import Issue, IssueStatus, IssueWithMessages, Message
+from models.admin import Admin
+from models.faq import FAQ, FAQSummary
+
+
+class StorageBackend(Protocol):
+    """Persistence interface used by the services.
+
+    Implemented by SupabaseDB (PostgREST), PostgresDB (asyncpg), SQLiteDB and
+    MemoryDB; the backend is chosen with the STORAGE_BACKEND setting (see
+    api/dependencies.py).
+    """
+
+    # Issue methods
+    async def get_open_issue_by_chat_id(
+        self, telegram_chat_id: str
+    ) -> Optional[Issue]: ...
+
+    async def create_issue(self, telegram_chat_id: str, username: str) -> Issue: ...
+
+    async def get_or_create_open_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        """The chat's active issue, creating it if there is none; (issue, created).
+
+        Atomic: a unique index allows one active issue per chat, so concurrent
+        calls for the same chat all get the same issue.
+        """
+        ...
+
+    async def get_issue_by_id(self, issue_id: str) -> Optional[Issue]: ...
+
+    async def add_message_to_issue(
+        self, issue_id: str, from_user: str, text: str
+    ) -> Optional[Message]: ...
+
+    async def update_issue_status(
+        self, issue_id: str, status: IssueStatus
+    ) -> Optional[Issue]: ...
+
+    async def get_all_issues(self) -> List[Issue]: ...
+
+    # Bulk admin actions (see IssueService.update_issues_status)
+    async def get_issues_by_ids(self, issue_ids: List[str]) -> List[Issue]:
+        """Issues in any order; unknown ids are skipped"""
+        ...
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> List[Issue]:
+        """Set the status of those issues that are not closed, in one statement.
+
+        Returns the updated issues; closed and unknown ones are left out.
+        """
+        ...
+
+    async def add_message_to_issues(
+        self, issue_ids: List[str], from_user: str, text: str
+    ) -> List[Message]:
+        """Add the same message to every issue in one statement.
+
+        Returns the new messages; unknown and closed issues are skipped.
+        """
+        ...
+
+    async def get_issue_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        """Messages with seq > after_seq in seq order, at most limit of them.
+
+        Archived messages are read back from the archive transparently.
+        """
+        ...
+
+    # Sweeping (see services/issue_sweeper.py)
+    async def close_idle_issues(self, idle_before: int, limit: int) -> List[Issue]:
+        """Close up to limit active issues with no activity since idle_before.
+
+        Each issue is returned to exactly one caller, so concurrent sweepers
+        never notify a user twice.
+        """
+        ...
+
+    async def get_issues_to_archive(
+        self, closed_before: int, limit: int
+    ) -> List[Issue]:
+        """Issues closed before closed_before with messages not archived yet"""
+        ...
+
+    async def archive_issue_messages(
+        self, issue_id: str, archive: bytes, through_seq: int
+    ) -> int:
+        """Store an issue's archive and delete its live messages up to through_seq.
+
+        Both happen in one transaction; returns the number of messages deleted.
+        """
+        ...
+
+    # Admin methods
+    async def get_admin_by_chat_id(self, telegram_chat_id: str) -> Optional[Admin]: ...
+
+    async def get_all_admins(self) -> List[Admin]: ...
+
+    async def create_admin(self, telegram_chat_id: str, username: str) -> Admin: ...
+
+    # FAQ methods; only get_all_faqs and get_faq_by_id load embeddings
+    async def get_all_faqs(self) -> List[FAQ]: ...
+
+    async def get_faq_summaries(self) -> List[FAQSummary]: ...
+
+    async def create_faq(
+        self,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]: ...
+
+    async def get_faq_by_id(self, faq_id: str) -> Optional[FAQ]: ...
+
+    async def get_faqs_by_ids(self, faq_ids: List[str]) -> List[FAQ]:
+        """FAQs with embeddings, in any order; unknown ids are skipped"""
+        ...
+
+    async def get_faq_summary(self, faq_id: str) -> Optional[FAQSummary]: ...
+
+    async def update_faq(
+        self,
+        faq_id: str,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
+        """Storing an embedding also records the question's content hash"""
+        ...
+
+    async def delete_faq(self, faq_id: str) -> bool: ...
+
+    # Re-embedding: new vectors go to a shadow column until swap_next_embeddings
+    async def get_faqs_needing_embedding(
+        self, embedding_version: str, limit: int
+    ) -> List[FAQSummary]: ...
+
+    async def store_next_embeddings(
+        self, embedding_version: str, embeddings: List[Tuple[FAQSummary, np.ndarray]]
+    ) -> int:
+        """Skips FAQs whose question changed since they were read"""
+        ...
+
+    async def swap_next_embeddings(self, embedding_version: str) -> Tuple[int, int]:
+        """(swapped, remaining); nothing is swapped while any FAQ is outdated"""
+        ...
+
+    async def search_similar_questions(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict[str, Any]]: ...
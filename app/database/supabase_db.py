@@ -1,12 +1,29 @@
 import time
 import uuid
-from typing import List, Optional, Dict, Any
+import numpy as np
+from typing import List, Optional, Dict, Any, Tuple
 from supabase import create_client
+from postgrest.types import CountMethod, ReturnMethod
 from models.issue import Issue, IssueStatus, IssueWithMessages, Message
 from models.admin import Admin
-from models.faq import FAQ
+from models.faq import FAQ, FAQSummary
+from models.embedding import content_hash, to_pgvector_text
+from database.message_archive import with_archived
+from monitoring.metrics import DB_OPERATION_SECONDS, instrument_async_methods
 
 
+def _uuids(ids: List[str]) -> List[str]:
+    """The well-formed ids; one malformed uuid would fail a whole in_ filter"""
+    valid = []
+    for value in ids:
+        try:
+            valid.append(str(uuid.UUID(value)))
+        except (TypeError, ValueError):
+            pass
+    return valid
+
+
+@instrument_async_methods(DB_OPERATION_SECONDS, "supabase", span="db")
 class SupabaseDB:
     def __init__(self, url: str, key: str):
         self.client = create_client(url, key)
@@ -16,6 +33,17 @@ class SupabaseDB:
         self.messages_table = "messages"
         self.admins_table = "admins"
         self.faq_embeddings_table = "faq_embeddings"
+        self.message_archives_table = "message_archives"
+
+        # Columns of FAQSummary, leaving out the embedding
+        self.faq_summary_columns = (
+            "id",
+            "question",
+            "answer",
+            "content_hash",
+            "embedding_version",
+        )
+        self.faq_columns = (*self.faq_summary_columns, "embedding")
 
     # Issue methods
     async def get_open_issue_by_chat_id(self, telegram_chat_id: str) -> Optional[Issue]:
@@ -43,6 +71,7 @@ class SupabaseDB:
             "telegram_chat_id": telegram_chat_id,
             "username": username,
             "status": IssueStatus.OPEN,
+            "last_activity_at": current_time,
         }
 
         response = self.client.table(
@@ -54,6 +83,19 @@ class SupabaseDB:
         # Fallback to the data we tried to insert
         return Issue(**issue_data)
 
+    async def get_or_create_open_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        # Insert or fetch in one request, see create_tables.sql
+        new_id = str(uuid.uuid4())
+        result = self.client.rpc(
+            "get_or_create_open_issue",
+            {"new_id": new_id, "chat_id": telegram_chat_id, "user_name": username},
+        ).execute()
+
+        issue_data = result.data[0]
+        return Issue(**issue_data), issue_data["id"] == new_id
+
     async def get_issue_by_id(self, issue_id: str) -> Optional[Issue]:
         response = (
             self.client.table(self.issues_table)
@@ -100,6 +142,9 @@ class SupabaseDB:
             .update(
                 {
                     "status": status,
+                    "closed_at": (
+                        int(time.time()) if status == IssueStatus.CLOSED else None
+                    ),
                 }
             )
             .eq("id", issue_id)
@@ -119,6 +164,63 @@ class SupabaseDB:
 
         return []
 
+    async def get_issues_by_ids(self, issue_ids: List[str]) -> List[Issue]:
+        issue_ids = _uuids(issue_ids)
+        if not issue_ids:
+            return []
+
+        response = (
+            self.client.table(self.issues_table)
+            .select("*")
+            .in_("id", issue_ids)
+            .execute()
+        )
+        return [Issue(**item) for item in response.data]
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> List[Issue]:
+        issue_ids = _uuids(issue_ids)
+        if not issue_ids:
+            return []
+
+        status = IssueStatus(status)
+        response = (
+            self.client.table(self.issues_table)
+            .update(
+                {
+                    "status": status.value,
+                    "closed_at": (
+                        int(time.time()) if status == IssueStatus.CLOSED else None
+                    ),
+                }
+            )
+            .in_("id", issue_ids)
+            .neq("status", "closed")
+            .execute()
+        )
+        return [Issue(**item) for item in response.data]
+
+    async def add_message_to_issues(
+        self, issue_ids: List[str], from_user: str, text: str
+    ) -> List[Message]:
+        issue_uuids = _uuids(issue_ids)
+        if not issue_uuids:
+            return []
+
+        # The status check and the inserts happen in one statement, so an
+        # issue closed meanwhile gets no message
+        result = self.client.rpc(
+            "add_message_to_issues",
+            {
+                "target_ids": issue_uuids,
+                "sender": from_user,
+                "body": text,
+                "sent_at": int(time.time()),
+            },
+        ).execute()
+        return [Message(**item) for item in result.data or []]
+
     # Admin methods
     async def get_admin_by_chat_id(self, telegram_chat_id: str) -> Optional[Admin]:
         response = (
@@ -163,22 +265,41 @@ class SupabaseDB:
     # FAQ methods
     async def get_all_faqs(self) -> List[FAQ]:
         response = self.client.table(
-            self.faq_embeddings_table).select("*").execute()
+            self.faq_embeddings_table).select(*self.faq_columns).execute()
 
         if response.data:
             return [FAQ(**item) for item in response.data]
 
         return []
 
+    async def get_faq_summaries(self) -> List[FAQSummary]:
+        response = (
+            self.client.table(self.faq_embeddings_table)
+            .select(*self.faq_summary_columns)
+            .execute()
+        )
+
+        if response.data:
+            return [FAQSummary(**item) for item in response.data]
+
+        return []
+
     async def create_faq(
-        self, question: str, answer: str, embedding: Optional[list] = None
-    ) -> FAQ:
+        self,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
         # Store in the embeddings table
         embedding_data = {
             "question": question,
             "answer": answer,
-            "embedding": embedding or [],  # Use empty list if no embedding provided
+            "embedding": to_pgvector_text(embedding),
         }
+        if embedding is not None:
+            embedding_data["content_hash"] = content_hash(question)
+            embedding_data["embedding_version"] = embedding_version
 
         response = (
             self.client.table(self.faq_embeddings_table)
@@ -186,16 +307,17 @@ class SupabaseDB:
             .execute()
         )
 
+        # postgrest-py can't select columns after a write; FAQSummary leaves
+        # the returned embedding text unparsed
         if response.data and len(response.data) > 0:
-            return FAQ(**response.data[0])
+            return FAQSummary(**response.data[0])
 
-        # Fallback to the data we tried to insert
-        return FAQ(**embedding_data)
+        return None
 
     async def get_faq_by_id(self, faq_id: str) -> Optional[FAQ]:
         response = (
             self.client.table(self.faq_embeddings_table)
-            .select("*")
+            .select(*self.faq_columns)
             .eq("id", faq_id)
             .execute()
         )
@@ -205,15 +327,52 @@ class SupabaseDB:
 
         return None
 
+    async def get_faqs_by_ids(self, faq_ids: List[str]) -> List[FAQ]:
+        if not faq_ids:
+            return []
+
+        response = (
+            self.client.table(self.faq_embeddings_table)
+            .select(*self.faq_columns)
+            .in_("id", faq_ids)
+            .execute()
+        )
+        return [FAQ(**item) for item in response.data]
+
+    async def get_faq_summary(self, faq_id: str) -> Optional[FAQSummary]:
+        response = (
+            self.client.table(self.faq_embeddings_table)
+            .select(*self.faq_summary_columns)
+            .eq("id", faq_id)
+            .execute()
+        )
+
+        if response.data and len(response.data) > 0:
+            return FAQSummary(**response.data[0])
+
+        return None
+
     async def update_faq(
-        self, faq_id: str, question: str, answer: str, embedding: Optional[list] = None
-    ) -> Optional[FAQ]:
+        self,
+        faq_id: str,
+        question: str,
+        answer: str,
+        embedding: Optional[np.ndarray] = None,
+        embedding_version: Optional[str] = None,
+    ) -> Optional[FAQSummary]:
         # Update FAQ in the embeddings table
         update_data = {"question": question, "answer": answer}
 
-        # Add embedding to update if provided
-        if embedding:
-            update_data["embedding"] = embedding
+        # Add embedding to update if provided; it supersedes any pending
+        # re-embedding of the FAQ
+        if embedding is not None:
+            update_data.update(
+                embedding=to_pgvector_text(embedding),
+                content_hash=content_hash(question),
+                embedding_version=embedding_version,
+                embedding_next=None,
+                embedding_next_version=None,
+            )
 
         response = (
             self.client.table(self.faq_embeddings_table)
@@ -223,30 +382,69 @@ class SupabaseDB:
         )
 
         if response.data and len(response.data) > 0:
-            return FAQ(**response.data[0])
+            return FAQSummary(**response.data[0])
 
         return None
 
     async def delete_faq(self, faq_id: str) -> bool:
-        # Delete from embeddings table
+        # Delete from embeddings table, only asking for the number of rows
         response = (
             self.client.table(self.faq_embeddings_table)
-            .delete()
+            .delete(count=CountMethod.exact, returning=ReturnMethod.minimal)
             .eq("id", faq_id)
             .execute()
         )
 
-        return response.data is not None and len(response.data) > 0
+        return bool(response.count)
+
+    async def get_faqs_needing_embedding(
+        self, embedding_version: str, limit: int
+    ) -> List[FAQSummary]:
+        result = self.client.rpc(
+            "faqs_needing_embedding",
+            {"target_version": embedding_version, "max_rows": limit},
+        ).execute()
+
+        return [FAQSummary(**item) for item in result.data or []]
+
+    async def store_next_embeddings(
+        self, embedding_version: str, embeddings: List[Tuple[FAQSummary, np.ndarray]]
+    ) -> int:
+        # One request per batch instead of one update per FAQ
+        result = self.client.rpc(
+            "store_next_faq_embeddings",
+            {
+                "target_version": embedding_version,
+                "updates": [
+                    {
+                        "id": faq.id,
+                        "content_hash": faq.content_hash,
+                        "embedding": to_pgvector_text(embedding),
+                    }
+                    for faq, embedding in embeddings
+                ],
+            },
+        ).execute()
+
+        return result.data or 0
+
+    async def swap_next_embeddings(self, embedding_version: str) -> Tuple[int, int]:
+        result = self.client.rpc(
+            "swap_faq_embeddings", {"target_version": embedding_version}
+        ).execute()
+
+        row = result.data[0]
+        return row["swapped"], row["remaining"]
 
     async def search_similar_questions(
-        self, query_embedding: List[float], match_threshold: float = 0.7, limit: int = 5
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
     ) -> List[Dict[str, Any]]:
         """Search for similar questions using vector similarity"""
         # Using cosine distance to find similar embeddings
         result = self.client.rpc(
             "match_faq_embeddings",
             {
-                "query_embedding": query_embedding,
+                "query_embedding": to_pgvector_text(query_embedding),
                 "match_threshold": match_threshold,
                 "match_count": limit,
             },
@@ -254,23 +452,73 @@ class SupabaseDB:
 
         return result.data if result.data else []
 
-    async def get_issue_messages(self, issue_id: str) -> IssueWithMessages:
+    async def get_issue_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
         # First check if issue exists
         issue = await self.get_issue_by_id(issue_id)
         if not issue:
             return None
 
-        # Get messages for this issue
-        response = (
+        # Get messages for this issue, served by the (issue_id, seq) index
+        query = (
             self.client.table(self.messages_table)
             .select("*")
             .eq("issue_id", issue_id)
-            .order("timestamp")
-            .execute()
+            .gt("seq", after_seq)
+            .order("seq")
         )
+        if limit is not None:
+            query = query.limit(limit)
+
+        response = query.execute()
 
         messages = []
         if response.data:
             messages = [Message(**msg) for msg in response.data]
 
-        return IssueWithMessages(issue_id=issue_id, messages=messages)
+        archive = None
+        if issue.archived_seq > after_seq:
+            archived = (
+                self.client.table(self.message_archives_table)
+                .select("data")
+                .eq("issue_id", issue_id)
+                .execute()
+            )
+            if archived.data:
+                # bytea comes back hex-encoded, e.g. "\\x789c..."
+                archive = bytes.fromhex(archived.data[0]["data"][2:])
+
+        return with_archived(issue_id, archive, messages, after_seq, limit)
+
+    async def close_idle_issues(self, idle_before: int, limit: int) -> List[Issue]:
+        result = self.client.rpc(
+            "close_idle_issues", {"idle_before": idle_before, "max_rows": limit}
+        ).execute()
+
+        return [Issue(**item) for item in result.data or []]
+
+    async def get_issues_to_archive(
+        self, closed_before: int, limit: int
+    ) -> List[Issue]:
+        # PostgREST filters can't compare two columns (last_seq > archived_seq)
+        result = self.client.rpc(
+            "issues_to_archive", {"closed_before": closed_before, "max_rows": limit}
+        ).execute()
+
+        return [Issue(**item) for item in result.data or []]
+
+    async def archive_issue_messages(
+        self, issue_id: str, archive: bytes, through_seq: int
+    ) -> int:
+        # Insert and delete in one transaction inside the function
+        result = self.client.rpc(
+            "archive_issue_messages",
+            {
+                "target": issue_id,
+                "archive": "\\x" + archive.hex(),
+                "through_seq": through_seq,
+            },
+        ).execute()
+
+        return result.data or 0
@@ -1,10 +1,73 @@
+import time
+
+# Start of the cold-start clock, before any application import
+STARTED = time.perf_counter()
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from api.public import router as public_router
 from api.private import router as private_router
+from monitoring.metrics import REGISTRY, CONTENT_TYPE
+from monitoring.middleware import (
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    ServerTimingMiddleware,
+)
+from monitoring.startup import StartupReport
+from api.dependencies import get_profile_store, shut_down, warm_up
+from api.responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_RETRY_SECONDS = float(os.getenv("WARM_UP_RETRY_SECONDS", "5"))
+
+startup = StartupReport(STARTED)
+startup.record("imports", time.perf_counter() - STARTED)
+
+
+async def try_warm_up() -> bool:
+    startup.attempts += 1
+    try:
+        await warm_up(startup)
+    except Exception as e:
+        startup.error = f"{type(e).__name__}: {e}"
+        logger.exception("API warm-up failed")
+        return False
+
+    startup.mark_ready()
+    logger.info(f"API ready: {startup.steps}")
+    return True
+
+
+async def retry_warm_up():
+    while True:
+        await asyncio.sleep(WARM_UP_RETRY_SECONDS)
+        if await try_warm_up():
+            return
+
 
-app = FastAPI(title="Customer Support API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve once the first attempt is over; if it failed, /readyz reports the
+    # error while the warm-up is retried in the background
+    retries = None if await try_warm_up() else asyncio.create_task(retry_warm_up())
+    yield
+    if retries:
+        retries.cancel()
+    await shut_down()
+
+
+app = FastAPI(
+    title="Customer Support API",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +76,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(
+    ProfilingMiddleware,
+    token=os.getenv("PROFILING_TOKEN"),
+    store=get_profile_store(),
+)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(public_router, prefix="/api/public", tags=["public"])
 app.include_router(private_router, prefix="/api/private", tags=["private"])
@@ -23,5 +93,27 @@ async def root():
     return {"message": "Customer Support API is running"}
 
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: clients, pools and FAQ indexes are built"""
+    return JSONResponse(startup.as_dict(), status_code=200 if startup.ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics in text exposition format"""
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    # Auto-reload only works with a single worker process
+    workers = int(os.getenv("API_WORKERS", "1"))
+    uvicorn.run(
+        "main:app", host="0.0.0.0", port=8000, reload=workers == 1, workers=workers
+    )
@@ -0,0 +1,146 @@
+"""Re-embed FAQs whose vectors are missing or come from another embedding model.
+
+New vectors are written next to the current ones (embedding_next) and swapped
+in for all FAQs at once when every FAQ has one, so searches keep using the old
+vectors until then. Progress is kept in the database: an interrupted run
+continues where it stopped when started again.
+
+Usage (from the app directory, with the storage settings of the API):
+
+    python -m maintenance.reembed_faqs --model text-embedding-3-small \\
+        --dimensions 1536 --batch-size 256 --concurrency 4
+
+Afterwards set OPENAI_EMBEDDING_MODEL (and OPENAI_EMBEDDING_DIMENSIONS) to
+the same values and restart the API, so queries are embedded the same way.
+"""
+
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from api.dependencies import get_db
+from database.storage import StorageBackend
+from models.faq import FAQSummary
+from services.openai_service import OpenAIService
+
+load_dotenv()
+
+logging.basicConfig(
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+
+async def reembed(
+    db: StorageBackend,
+    openai_service: OpenAIService,
+    batch_size: int = 256,
+    concurrency: int = 4,
+    swap: bool = True,
+) -> Dict[str, int]:
+    """Embed every outdated FAQ, then swap the new vectors in"""
+    version = openai_service.embedding_version
+    totals = {"embedded": 0, "changed": 0, "swapped": 0, "remaining": 0}
+
+    async def embed_batch(batch: List[FAQSummary]):
+        embeddings = await openai_service.generate_embeddings(
+            [faq.question for faq in batch]
+        )
+        stored = await db.store_next_embeddings(version, list(zip(batch, embeddings)))
+        totals["embedded"] += stored
+        # Edited while in flight; picked up again by the next round
+        totals["changed"] += len(batch) - stored
+
+    while True:
+        # Up to `concurrency` embedding requests of `batch_size` FAQs each
+        pending = await db.get_faqs_needing_embedding(version, batch_size * concurrency)
+        if not pending:
+            break
+
+        embedded_before = totals["embedded"]
+        await asyncio.gather(
+            *(
+                embed_batch(pending[i : i + batch_size])
+                for i in range(0, len(pending), batch_size)
+            )
+        )
+        logger.info(f"Embedded {totals['embedded']} FAQs with {version}")
+
+        if totals["embedded"] == embedded_before:
+            logger.warning("No progress in the last round, FAQs keep changing")
+            break
+
+    if swap:
+        totals["swapped"], totals["remaining"] = await db.swap_next_embeddings(version)
+        if totals["remaining"]:
+            logger.warning(
+                f"Not swapped: {totals['remaining']} FAQs still need embedding"
+            )
+        else:
+            logger.info(f"Swapped {totals['swapped']} FAQs to {version}")
+
+    return totals
+
+
+async def run(args) -> Dict[str, int]:
+    db = get_db()
+    openai_service = OpenAIService(
+        os.getenv("OPENAI_API_KEY"),
+        embedding_model=args.model,
+        embedding_dimensions=args.dimensions,
+    )
+    try:
+        return await reembed(
+            db,
+            openai_service,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            swap=not args.no_swap,
+        )
+    finally:
+        if hasattr(db, "close"):
+            await db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--model",
+        default=os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002"),
+        help="target embedding model",
+    )
+    dimensions = os.getenv("OPENAI_EMBEDDING_DIMENSIONS")
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=int(dimensions) if dimensions else None,
+        help="reduced dimension count (text-embedding-3 models only)",
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=256, help="FAQs per embedding request"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="embedding requests in flight"
+    )
+    parser.add_argument(
+        "--no-swap",
+        action="store_true",
+        help="only fill in the new vectors, leave the current ones in use",
+    )
+    args = parser.parse_args(argv)
+
+    totals = asyncio.run(run(args))
+    print(
+        f"embedded={totals['embedded']} changed={totals['changed']} "
+        f"swapped={totals['swapped']} remaining={totals['remaining']}"
+    )
+    return 1 if totals["remaining"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
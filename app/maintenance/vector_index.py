@@ -0,0 +1,433 @@
+"""Inspect, rebuild and tune the pgvector index on faq_embeddings.
+
+An ivfflat index learns its lists from the rows present when it is built, so
+the one created by create_tables.sql on an empty table has to be rebuilt
+once the FAQs are imported (and again when the corpus grows a lot). HNSW
+needs no training and can be built at any time, at the cost of a slower
+build and a larger index.
+
+The search parameter (ivfflat.probes or hnsw.ef_search) is stored on the
+match_faq_embeddings function itself, so it applies to every caller:
+PostgREST, the asyncpg backend and the SQL editor alike. Re-running
+create_tables.sql replaces the function and drops it; run `tune` again then.
+
+Usage (from the app directory, with DATABASE_URL set):
+
+    python -m maintenance.vector_index status
+    python -m maintenance.vector_index rebuild               # ivfflat sized for the table
+    python -m maintenance.vector_index rebuild --method hnsw --ef-search 40
+    python -m maintenance.vector_index tune --probes 10
+    python -m maintenance.vector_index benchmark --queries 100 -k 5 --apply
+"""
+
+import os
+import sys
+import math
+import time
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+import numpy as np
+from dotenv import load_dotenv
+
+from database.postgres_db import PostgresDB
+from benchmarks.stats import percentile
+
+load_dotenv()
+
+INDEX_NAME = "idx_faq_embeddings_vector"
+MATCH_FUNCTION = "match_faq_embeddings(vector, float, int)"
+
+# Search parameter of each index method, stored on MATCH_FUNCTION
+SEARCH_PARAMETERS = {"ivfflat": "ivfflat.probes", "hnsw": "hnsw.ef_search"}
+
+INDEX_STATUS = """
+SELECT c.relname AS name, am.amname AS method, c.reloptions AS options,
+       pg_relation_size(c.oid) AS bytes, i.indisvalid AS valid
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_am am ON am.oid = c.relam
+WHERE i.indrelid = 'public.faq_embeddings'::regclass
+  AND am.amname IN ('ivfflat', 'hnsw')
+ORDER BY c.relname
+"""
+
+FUNCTION_CONFIG = (
+    f"SELECT proconfig FROM pg_proc WHERE oid = '{MATCH_FUNCTION}'::regprocedure"
+)
+
+# Same ordering as match_faq_embeddings, without the threshold, so that the
+# session's search parameter (not the function's) is in effect
+NEAREST_FAQS = "SELECT id FROM faq_embeddings ORDER BY embedding <=> $1 LIMIT $2"
+
+
+def recommend(rows: int) -> Dict[str, int]:
+    """pgvector's starting points for the index parameters"""
+    # lists = rows / 1000 up to 1M rows, sqrt(rows) beyond; probes = sqrt(lists)
+    lists = max(rows // 1000, 1) if rows <= 1_000_000 else int(math.sqrt(rows))
+    return {
+        "lists": lists,
+        "probes": max(int(math.sqrt(lists)), 1),
+        "m": 16,
+        "ef_construction": 64,
+        "ef_search": 40,
+    }
+
+
+async def table_stats(connection: asyncpg.Connection) -> Dict[str, Any]:
+    row = await connection.fetchrow(
+        "SELECT count(*) AS rows, count(embedding) AS embedded, "
+        "max(vector_dims(embedding)) AS dimensions FROM faq_embeddings"
+    )
+    return dict(row)
+
+
+async def index_status(connection: asyncpg.Connection) -> List[Dict[str, Any]]:
+    return [dict(row) for row in await connection.fetch(INDEX_STATUS)]
+
+
+async def search_settings(connection: asyncpg.Connection) -> Dict[str, str]:
+    """Settings stored on match_faq_embeddings"""
+    config = await connection.fetchval(FUNCTION_CONFIG) or []
+    return dict(setting.split("=", 1) for setting in config)
+
+
+async def set_search_parameter(
+    connection: asyncpg.Connection, method: str, value: Optional[int]
+):
+    """Store the search parameter of method on the function, clearing others"""
+    await connection.execute(f"ALTER FUNCTION {MATCH_FUNCTION} RESET ALL")
+    if method in SEARCH_PARAMETERS and value:
+        await connection.execute(
+            f"ALTER FUNCTION {MATCH_FUNCTION} "
+            f"SET {SEARCH_PARAMETERS[method]} = {int(value)}"
+        )
+
+
+async def rebuild(
+    connection: asyncpg.Connection,
+    method: str,
+    lists: int,
+    m: int,
+    ef_construction: int,
+    maintenance_work_mem: Optional[str] = None,
+):
+    """Build the new index next to the old one, then swap the names"""
+    if maintenance_work_mem:
+        await connection.execute(
+            "SELECT set_config('maintenance_work_mem', $1, false)",
+            maintenance_work_mem,
+        )
+
+    # CONCURRENTLY can't run in a transaction, so one statement at a time
+    new_name = f"{INDEX_NAME}_new"
+    await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {new_name}")
+    if method == "ivfflat":
+        await connection.execute(
+            f"CREATE INDEX CONCURRENTLY {new_name} ON public.faq_embeddings "
+            f"USING ivfflat (embedding vector_cosine_ops) WITH (lists = {int(lists)})"
+        )
+    elif method == "hnsw":
+        await connection.execute(
+            f"CREATE INDEX CONCURRENTLY {new_name} ON public.faq_embeddings "
+            f"USING hnsw (embedding vector_cosine_ops) "
+            f"WITH (m = {int(m)}, ef_construction = {int(ef_construction)})"
+        )
+
+    await connection.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
+    if method != "none":
+        await connection.execute(f"ALTER INDEX {new_name} RENAME TO {INDEX_NAME}")
+    await connection.execute("ANALYZE faq_embeddings")
+
+
+async def timed_search(
+    connection: asyncpg.Connection, settings: List[str], query: np.ndarray, k: int
+):
+    async with connection.transaction():
+        for setting in settings:
+            await connection.execute(f"SET LOCAL {setting}")
+        start = time.perf_counter()
+        rows = await connection.fetch(NEAREST_FAQS, query, k)
+        return [row["id"] for row in rows], time.perf_counter() - start
+
+
+async def benchmark(
+    connection: asyncpg.Connection,
+    method: str,
+    values: List[int],
+    queries: int,
+    k: int,
+) -> Dict[str, Any]:
+    """recall@k and latency of each search parameter value against exact search"""
+    # Held-out queries: sampled FAQ vectors, each excluded from its own results
+    sample = await connection.fetch(
+        "SELECT id, embedding FROM faq_embeddings WHERE embedding IS NOT NULL "
+        "ORDER BY random() LIMIT $1",
+        queries,
+    )
+
+    # Without index scans the planner falls back to an exact sequential scan
+    exact_settings = ["enable_indexscan = off", "enable_bitmapscan = off"]
+    expected, exact_durations = [], []
+    for row in sample:
+        ids, duration = await timed_search(
+            connection, exact_settings, row["embedding"], k + 1
+        )
+        expected.append([faq_id for faq_id in ids if faq_id != row["id"]][:k])
+        exact_durations.append(duration)
+
+    results = {"exact": latency(exact_durations), "settings": []}
+    if method not in SEARCH_PARAMETERS:
+        return results
+
+    parameter = SEARCH_PARAMETERS[method]
+    for value in values:
+        recalls, durations = [], []
+        for row, expected_ids in zip(sample, expected):
+            ids, duration = await timed_search(
+                connection, [f"{parameter} = {int(value)}"], row["embedding"], k + 1
+            )
+            found = set([faq_id for faq_id in ids if faq_id != row["id"]][:k])
+            if expected_ids:
+                recalls.append(len(found & set(expected_ids)) / len(expected_ids))
+            durations.append(duration)
+
+        results["settings"].append(
+            {
+                "parameter": parameter,
+                "value": value,
+                "recall": round(float(np.mean(recalls)) if recalls else 1.0, 4),
+                **latency(durations),
+            }
+        )
+
+    return results
+
+
+def latency(durations: List[float]) -> Dict[str, float]:
+    durations = sorted(durations)
+    return {
+        "p50_ms": round(percentile(durations, 50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 95) * 1000, 3),
+    }
+
+
+def current_method(indexes: List[Dict[str, Any]]) -> str:
+    valid = [index for index in indexes if index["name"] == INDEX_NAME]
+    return valid[0]["method"] if valid else "none"
+
+
+async def cmd_status(connection: asyncpg.Connection, args) -> int:
+    stats = await table_stats(connection)
+    indexes = await index_status(connection)
+    settings = await search_settings(connection)
+    advice = recommend(stats["embedded"])
+
+    print(
+        f"faq_embeddings: {stats['rows']} rows, {stats['embedded']} with embeddings "
+        f"({stats['dimensions'] or '-'} dimensions)"
+    )
+    if not indexes:
+        print("vector index: none (exact search)")
+    for index in indexes:
+        options = ", ".join(index["options"] or []) or "defaults"
+        state = "" if index["valid"] else " INVALID (interrupted build)"
+        print(
+            f"vector index: {index['name']} {index['method']} ({options}), "
+            f"{index['bytes'] / 2**20:.1f} MB{state}"
+        )
+    print(
+        "match_faq_embeddings settings: "
+        + (", ".join(f"{k}={v}" for k, v in settings.items()) or "defaults")
+    )
+    print(
+        f"recommended: ivfflat lists={advice['lists']} probes={advice['probes']}, "
+        f"or hnsw m={advice['m']} ef_construction={advice['ef_construction']} "
+        f"ef_search={advice['ef_search']}"
+    )
+    return 0
+
+
+async def cmd_rebuild(connection: asyncpg.Connection, args) -> int:
+    stats = await table_stats(connection)
+    advice = recommend(stats["embedded"])
+    if args.method == "ivfflat" and not stats["embedded"]:
+        print("faq_embeddings has no embeddings to train ivfflat lists on")
+        return 1
+
+    lists = args.lists or advice["lists"]
+    start = time.perf_counter()
+    await rebuild(
+        connection,
+        args.method,
+        lists,
+        args.m,
+        args.ef_construction,
+        args.maintenance_work_mem,
+    )
+
+    value = {
+        "ivfflat": args.probes or advice["probes"],
+        "hnsw": args.ef_search or advice["ef_search"],
+    }.get(args.method)
+    await set_search_parameter(connection, args.method, value)
+
+    if args.method == "none":
+        print("Dropped the vector index, searches are exact")
+        return 0
+
+    params = f"lists={lists}" if args.method == "ivfflat" else f"m={args.m}"
+    print(
+        f"Rebuilt {args.method} {params} over {stats['embedded']} rows "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    if value:
+        print(f"match_faq_embeddings: {SEARCH_PARAMETERS[args.method]}={value}")
+    return 0
+
+
+async def cmd_tune(connection: asyncpg.Connection, args) -> int:
+    method = current_method(await index_status(connection))
+    if method not in SEARCH_PARAMETERS:
+        await set_search_parameter(connection, method, None)
+        print("No vector index, match_faq_embeddings settings cleared")
+        return 0
+
+    value = args.probes if method == "ivfflat" else args.ef_search
+    if not value:
+        option = "--probes" if method == "ivfflat" else "--ef-search"
+        print(f"The index is {method}; pass {option}")
+        return 1
+
+    await set_search_parameter(connection, method, value)
+    print(f"match_faq_embeddings: {SEARCH_PARAMETERS[method]}={value}")
+    return 0
+
+
+async def cmd_benchmark(connection: asyncpg.Connection, args) -> int:
+    method = current_method(await index_status(connection))
+    stats = await table_stats(connection)
+    advice = recommend(stats["embedded"])
+
+    if method == "ivfflat":
+        lists = advice["lists"]
+        values = args.probes or sorted(
+            {1, advice["probes"], 2 * advice["probes"], 4 * advice["probes"]}
+        )
+        values = [value for value in values if value <= max(lists, 1)] or [1]
+    else:
+        values = args.ef_search or [max(args.k, 20), 40, 80, 160]
+
+    results = await benchmark(connection, method, values, args.queries, args.k)
+
+    print(
+        f"{stats['embedded']} FAQs, {method} index, {args.queries} held-out "
+        f"queries, recall@{args.k}"
+    )
+    print(f"{'search parameter':<24}{'recall':>9}{'p50 ms':>10}{'p95 ms':>10}")
+    exact = results["exact"]
+    print(f"{'exact':<24}{1.0:>9.4f}{exact['p50_ms']:>10.2f}{exact['p95_ms']:>10.2f}")
+    for row in results["settings"]:
+        label = f"{row['parameter']}={row['value']}"
+        print(
+            f"{label:<24}{row['recall']:>9.4f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+        )
+
+    if not results["settings"]:
+        return 0
+
+    good = [row for row in results["settings"] if row["recall"] >= args.target_recall]
+    if not good:
+        print(f"\nNo setting reaches recall {args.target_recall}")
+        return 1
+
+    best = good[0]
+    print(
+        f"\nSmallest setting with recall >= {args.target_recall}: "
+        f"{best['parameter']}={best['value']}"
+    )
+    if args.apply:
+        await set_search_parameter(connection, method, best["value"])
+        print("Applied to match_faq_embeddings")
+    return 0
+
+
+COMMANDS = {
+    "status": cmd_status,
+    "rebuild": cmd_rebuild,
+    "tune": cmd_tune,
+    "benchmark": cmd_benchmark,
+}
+
+
+async def run(args) -> int:
+    # PostgresDB registers the binary vector codec on its connections
+    db = PostgresDB(os.getenv("DATABASE_URL"), min_size=1, max_size=1)
+    pool = await db.connect()
+    try:
+        async with pool.acquire() as connection:
+            return await COMMANDS[args.command](connection, args)
+    finally:
+        await db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="row count, index and search settings")
+
+    rebuild_parser = commands.add_parser(
+        "rebuild", help="rebuild the index with parameters sized for the table"
+    )
+    rebuild_parser.add_argument(
+        "--method",
+        choices=["ivfflat", "hnsw", "none"],
+        default="ivfflat",
+        help="none drops the index (exact search)",
+    )
+    rebuild_parser.add_argument("--lists", type=int, help="ivfflat lists")
+    rebuild_parser.add_argument("--probes", type=int, help="ivfflat.probes")
+    rebuild_parser.add_argument("--m", type=int, default=16, help="hnsw m")
+    rebuild_parser.add_argument("--ef-construction", type=int, default=64)
+    rebuild_parser.add_argument("--ef-search", type=int, help="hnsw.ef_search")
+    rebuild_parser.add_argument(
+        "--maintenance-work-mem", help="e.g. 1GB, speeds up large builds"
+    )
+
+    tune_parser = commands.add_parser(
+        "tune", help="set the search parameter of match_faq_embeddings"
+    )
+    tune_parser.add_argument("--probes", type=int, help="ivfflat.probes")
+    tune_parser.add_argument("--ef-search", type=int, help="hnsw.ef_search")
+
+    benchmark_parser = commands.add_parser(
+        "benchmark", help="recall@k and latency against exact search"
+    )
+    benchmark_parser.add_argument("--queries", type=int, default=100)
+    benchmark_parser.add_argument("-k", type=int, default=5)
+    benchmark_parser.add_argument(
+        "--probes", type=int, nargs="+", help="ivfflat.probes values to compare"
+    )
+    benchmark_parser.add_argument(
+        "--ef-search", type=int, nargs="+", help="hnsw.ef_search values to compare"
+    )
+    benchmark_parser.add_argument("--target-recall", type=float, default=0.95)
+    benchmark_parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="store the smallest setting reaching --target-recall",
+    )
+
+    args = parser.parse_args(argv)
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL must point at the PostgreSQL database")
+
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
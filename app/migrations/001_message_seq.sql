@@ -0,0 +1,44 @@
+-- Adds per-issue message sequence numbers to a database created from an
+-- earlier create_tables.sql. Safe to run once on a live database.
+
+ALTER TABLE public.issues ADD COLUMN IF NOT EXISTS last_seq bigint NOT NULL DEFAULT 0;
+ALTER TABLE public.messages ADD COLUMN IF NOT EXISTS seq bigint;
+
+-- Number existing messages in their previous (timestamp) order
+UPDATE public.messages m
+SET seq = numbered.seq
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY issue_id ORDER BY timestamp, id) AS seq
+    FROM public.messages
+) numbered
+WHERE m.id = numbered.id;
+
+UPDATE public.issues i
+SET last_seq = COALESCE((SELECT max(seq) FROM public.messages WHERE issue_id = i.id), 0);
+
+ALTER TABLE public.messages ALTER COLUMN seq SET NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_issue_id_seq ON public.messages USING btree (issue_id, seq) TABLESPACE pg_default;
+DROP INDEX IF EXISTS idx_messages_issue_id;
+
+CREATE OR REPLACE FUNCTION assign_message_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE issues SET last_seq = last_seq + 1
+    WHERE id = NEW.issue_id
+    RETURNING last_seq INTO NEW.seq;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS messages_assign_seq ON public.messages;
+CREATE TRIGGER messages_assign_seq
+BEFORE INSERT ON public.messages
+FOR EACH ROW EXECUTE FUNCTION assign_message_seq();
+
+-- The trigger above updates the issue on every new message. Realtime UPDATE
+-- events must carry the old row so status changes can be told apart from
+-- these (see database/realtime_handler.py).
+ALTER TABLE public.issues REPLICA IDENTITY FULL;
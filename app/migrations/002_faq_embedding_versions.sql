@@ -0,0 +1,83 @@
+-- Tracks which question text and embedding model each FAQ vector came from,
+-- and adds the shadow columns and functions used by the re-embedding job.
+
+ALTER TABLE public.faq_embeddings ADD COLUMN IF NOT EXISTS content_hash text;
+ALTER TABLE public.faq_embeddings ADD COLUMN IF NOT EXISTS embedding_version text;
+ALTER TABLE public.faq_embeddings ADD COLUMN IF NOT EXISTS embedding_next vector(1536);
+ALTER TABLE public.faq_embeddings ADD COLUMN IF NOT EXISTS embedding_next_version text;
+
+-- Existing vectors were all generated by the previously hard-coded model
+UPDATE public.faq_embeddings
+SET content_hash = encode(sha256(convert_to(question, 'UTF8')), 'hex'),
+    embedding_version = 'text-embedding-ada-002'
+WHERE embedding IS NOT NULL AND embedding_version IS NULL;
+
+-- Re-embedding support (see maintenance/reembed_faqs.py). New vectors are
+-- written to embedding_next and only replace embedding, for all FAQs at once,
+-- when every FAQ has one for the target version.
+CREATE OR REPLACE FUNCTION faqs_needing_embedding(target_version text, max_rows int)
+RETURNS TABLE (
+    id UUID,
+    question TEXT,
+    answer TEXT,
+    content_hash TEXT,
+    embedding_version TEXT
+)
+LANGUAGE sql
+AS $$
+    SELECT fe.id, fe.question, fe.answer, fe.content_hash, fe.embedding_version
+    FROM faq_embeddings fe
+    WHERE fe.embedding_version IS DISTINCT FROM target_version
+      AND fe.embedding_next_version IS DISTINCT FROM target_version
+    ORDER BY fe.id
+    LIMIT max_rows;
+$$;
+
+-- updates: [{"id": ..., "content_hash": ..., "embedding": "[...]"}]. Rows whose
+-- question changed since they were read are skipped.
+CREATE OR REPLACE FUNCTION store_next_faq_embeddings(target_version text, updates jsonb)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    stored int;
+BEGIN
+    UPDATE faq_embeddings fe
+    SET embedding_next = (u->>'embedding')::vector,
+        embedding_next_version = target_version
+    FROM jsonb_array_elements(updates) u
+    WHERE fe.id = (u->>'id')::uuid
+      AND fe.content_hash IS NOT DISTINCT FROM u->>'content_hash';
+    GET DIAGNOSTICS stored = ROW_COUNT;
+    RETURN stored;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION swap_faq_embeddings(target_version text)
+RETURNS TABLE (swapped int, remaining int)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Block FAQ writes so no row can become outdated during the swap
+    LOCK TABLE faq_embeddings IN SHARE ROW EXCLUSIVE MODE;
+
+    SELECT count(*) INTO remaining
+    FROM faq_embeddings fe
+    WHERE fe.embedding_version IS DISTINCT FROM target_version
+      AND fe.embedding_next_version IS DISTINCT FROM target_version;
+
+    swapped := 0;
+    IF remaining = 0 THEN
+        UPDATE faq_embeddings fe
+        SET embedding = fe.embedding_next,
+            content_hash = encode(sha256(convert_to(fe.question, 'UTF8')), 'hex'),
+            embedding_version = target_version,
+            embedding_next = NULL,
+            embedding_next_version = NULL
+        WHERE fe.embedding_next_version = target_version;
+        GET DIAGNOSTICS swapped = ROW_COUNT;
+    END IF;
+
+    RETURN NEXT;
+END;
+$$;
@@ -0,0 +1,96 @@
+-- Adds issue activity tracking for the idle-issue sweeper and the compressed
+-- message archive to a database created from an earlier create_tables.sql.
+
+ALTER TABLE public.issues ADD COLUMN IF NOT EXISTS last_activity_at bigint NOT NULL DEFAULT (extract(epoch FROM now()))::bigint;
+ALTER TABLE public.issues ADD COLUMN IF NOT EXISTS closed_at bigint;
+ALTER TABLE public.issues ADD COLUMN IF NOT EXISTS archived_seq bigint NOT NULL DEFAULT 0;
+
+-- Last activity is the latest message; closed issues count as closed then
+UPDATE public.issues i
+SET last_activity_at = m.latest
+FROM (SELECT issue_id, max(timestamp) AS latest FROM public.messages GROUP BY issue_id) m
+WHERE i.id = m.issue_id;
+
+UPDATE public.issues SET closed_at = last_activity_at
+WHERE status = 'closed' AND closed_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_issues_active_last_activity ON public.issues USING btree (last_activity_at) TABLESPACE pg_default
+WHERE status <> 'closed';
+
+CREATE INDEX IF NOT EXISTS idx_issues_to_archive ON public.issues USING btree (closed_at) TABLESPACE pg_default
+WHERE status = 'closed' AND last_seq > archived_seq;
+
+CREATE TABLE IF NOT EXISTS public.message_archives (
+  issue_id uuid NOT NULL,
+  data bytea NOT NULL,
+  archived_at bigint NOT NULL,
+  CONSTRAINT message_archives_pkey PRIMARY KEY (issue_id),
+  CONSTRAINT message_archives_issue_id_fkey FOREIGN KEY (issue_id) REFERENCES issues (id) ON DELETE CASCADE
+) TABLESPACE pg_default;
+
+ALTER TABLE public.message_archives ALTER COLUMN data SET STORAGE EXTERNAL;
+
+CREATE OR REPLACE FUNCTION assign_message_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE issues SET last_seq = last_seq + 1, last_activity_at = NEW.timestamp
+    WHERE id = NEW.issue_id
+    RETURNING last_seq INTO NEW.seq;
+    RETURN NEW;
+END;
+$$;
+
+-- Idle issue sweeping and message archiving (see services/issue_sweeper.py).
+-- Rows locked by another sweeper or a message insert are skipped, so every
+-- closed issue is returned to exactly one caller.
+CREATE OR REPLACE FUNCTION close_idle_issues(idle_before bigint, max_rows int)
+RETURNS SETOF issues
+LANGUAGE sql
+AS $$
+    UPDATE issues i
+    SET status = 'closed', closed_at = (extract(epoch FROM now()))::bigint
+    FROM (
+        SELECT id FROM issues
+        WHERE status <> 'closed' AND last_activity_at < idle_before
+        ORDER BY last_activity_at
+        LIMIT max_rows
+        FOR UPDATE SKIP LOCKED
+    ) idle
+    WHERE i.id = idle.id
+    RETURNING i.*;
+$$;
+
+CREATE OR REPLACE FUNCTION issues_to_archive(closed_before bigint, max_rows int)
+RETURNS SETOF issues
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT * FROM issues
+    WHERE status = 'closed' AND last_seq > archived_seq AND closed_at < closed_before
+    ORDER BY closed_at
+    LIMIT max_rows;
+$$;
+
+-- Replaces the archive of an issue and deletes the archived messages in one
+-- transaction; messages added after through_seq stay in the messages table.
+CREATE OR REPLACE FUNCTION archive_issue_messages(target uuid, archive bytea, through_seq bigint)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deleted int;
+BEGIN
+    INSERT INTO message_archives (issue_id, data, archived_at)
+    VALUES (target, archive, (extract(epoch FROM now()))::bigint)
+    ON CONFLICT (issue_id)
+    DO UPDATE SET data = EXCLUDED.data, archived_at = EXCLUDED.archived_at;
+
+    DELETE FROM messages WHERE issue_id = target AND seq <= through_seq;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+
+    UPDATE issues SET archived_seq = through_seq WHERE id = target;
+    RETURN deleted;
+END;
+$$;
@@ -0,0 +1,47 @@
+-- Allows at most one active (open or manual) issue per chat and adds the
+-- get_or_create_open_issue function used by POST /api/public/issues.
+
+-- Keep the most recently active issue of each chat and close the others
+UPDATE public.issues i
+SET status = 'closed', closed_at = (extract(epoch FROM now()))::bigint
+FROM (
+    SELECT id, row_number() OVER (
+        PARTITION BY telegram_chat_id ORDER BY last_activity_at DESC, id
+    ) AS position
+    FROM public.issues
+    WHERE status <> 'closed'
+) ranked
+WHERE i.id = ranked.id AND ranked.position > 1;
+
+-- At most one active issue per chat (see get_or_create_open_issue)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_issues_active_chat_id ON public.issues USING btree (telegram_chat_id) TABLESPACE pg_default
+WHERE status <> 'closed';
+
+-- Returns the chat's active issue, creating it if there is none, in one round
+-- trip. The partial unique index makes concurrent calls for one chat agree on
+-- a single issue; the caller knows it was created when the id is new_id.
+CREATE OR REPLACE FUNCTION get_or_create_open_issue(new_id uuid, chat_id text, user_name text)
+RETURNS SETOF issues
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    LOOP
+        RETURN QUERY
+        INSERT INTO issues (id, telegram_chat_id, username, status)
+        VALUES (new_id, chat_id, user_name, 'open')
+        ON CONFLICT (telegram_chat_id) WHERE status <> 'closed' DO NOTHING
+        RETURNING *;
+        IF FOUND THEN
+            RETURN;
+        END IF;
+
+        -- A new statement, so it sees the row a concurrent call committed
+        RETURN QUERY
+        SELECT * FROM issues WHERE telegram_chat_id = chat_id AND status <> 'closed';
+        IF FOUND THEN
+            RETURN;
+        END IF;
+        -- That issue was closed in between: try the insert again
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,17 @@
+-- Adds the add_message_to_issues function used by bulk admin replies
+-- (POST /api/private/issues/bulk/messages) on the Supabase backend.
+
+-- One admin message for many issues (bulk replies). Closed issues are skipped;
+-- locking the issue rows in id order re-checks any closed meanwhile and keeps
+-- overlapping batches from deadlocking.
+CREATE OR REPLACE FUNCTION add_message_to_issues(target_ids uuid[], sender text, body text, sent_at bigint)
+RETURNS SETOF messages
+LANGUAGE sql
+AS $$
+    INSERT INTO messages (issue_id, from_user, text, timestamp)
+    SELECT id, sender, body, sent_at FROM issues
+    WHERE id = ANY(target_ids) AND status <> 'closed'
+    ORDER BY id
+    FOR UPDATE
+    RETURNING *;
+$$;
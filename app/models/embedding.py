@@ -0,0 +1,57 @@
+import base64
+import hashlib
+from typing import Annotated, Any, Optional
+
+import numpy as np
+from pydantic import BeforeValidator, PlainSerializer
+
+# Embeddings are held as float32 arrays: 4 bytes per dimension instead of a
+# list of Python float objects
+EMBEDDING_DTYPE = np.float32
+
+
+def to_embedding(value: Any) -> Optional[np.ndarray]:
+    """Coerce an embedding from any of its stored or transferred forms"""
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value.astype(EMBEDDING_DTYPE, copy=False)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # Raw little-endian float32 buffer, viewed without copying
+        return np.frombuffer(value, dtype="<f4")
+    if isinstance(value, str):
+        # pgvector text form "[0.1,0.2,...]" as returned by PostgREST
+        values = value.strip().strip("[]")
+        if not values:
+            return np.empty(0, dtype=EMBEDDING_DTYPE)
+        return np.fromstring(values, dtype=EMBEDDING_DTYPE, sep=",")
+    return np.asarray(value, dtype=EMBEDDING_DTYPE)
+
+
+def from_base64(data: str) -> np.ndarray:
+    """Decode an embedding sent as base64 of little-endian float32 values"""
+    return np.frombuffer(base64.b64decode(data), dtype="<f4")
+
+
+def to_bytes(embedding: np.ndarray) -> bytes:
+    """Little-endian float32 buffer, the inverse of to_embedding for bytes"""
+    return np.asarray(embedding, dtype="<f4").tobytes()
+
+
+def to_pgvector_text(embedding: Optional[np.ndarray]) -> Optional[str]:
+    """pgvector text literal, accepted wherever PostgREST expects a vector"""
+    if embedding is None:
+        return None
+    return "[" + ",".join(map(str, np.asarray(embedding).tolist())) + "]"
+
+
+def content_hash(text: str) -> str:
+    """Hash of the text an embedding was generated from"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+Embedding = Annotated[
+    np.ndarray,
+    BeforeValidator(to_embedding),
+    PlainSerializer(lambda embedding: embedding.tolist(), when_used="json"),
+]
@@ -1,27 +1,25 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, Union, List, Any
-import json
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+from models.embedding import Embedding
 
 
-class FAQ(BaseModel):
+class FAQSummary(BaseModel):
+    """FAQ without its embedding, for code that only shows or edits the text"""
+
     id: str
     question: str
     answer: str
-    embedding: Optional[List[float]] = None
-
-    @field_validator("embedding", mode="before")
-    @classmethod
-    def parse_embedding(cls, v: Any) -> Optional[List[float]]:
-        if v is None:
-            return None
-        if isinstance(v, list):
-            return v
-        if isinstance(v, str):
-            try:
-                return json.loads(v)
-            except json.JSONDecodeError:
-                return []
-        return []
+    # Hash of the question the embedding was generated from, and the
+    # embedding model it came from (see OpenAIService.embedding_version)
+    content_hash: Optional[str] = None
+    embedding_version: Optional[str] = None
+
+
+class FAQ(FAQSummary):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # float32 array, parsed from pgvector text, raw bytes or a list
+    embedding: Optional[Embedding] = None
 
 
 class FAQCreate(BaseModel):
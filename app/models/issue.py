@@ -1,7 +1,8 @@
 from email import message
 from enum import Enum
+from dataclasses import dataclass
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class IssueStatus(str, Enum):
@@ -16,6 +17,21 @@ class Message(BaseModel):
     from_user: str
     text: str
     timestamp: int
+    # Per-issue sequence number, 1, 2, 3... in insertion order
+    seq: Optional[int] = None
+
+
+@dataclass(slots=True, frozen=True)
+class ChatTurn:
+    """Compact message kept in conversation histories.
+
+    A slotted object with only what a prompt needs takes about a tenth of the
+    memory of a Message model, which adds up over long cached histories.
+    """
+
+    seq: int
+    from_user: str
+    text: str
 
 
 class Issue(BaseModel):
@@ -23,6 +39,13 @@ class Issue(BaseModel):
     telegram_chat_id: str
     username: str
     status: IssueStatus
+    # seq of the latest message in the issue
+    last_seq: int = 0
+    # Unix time of the latest message, or of creation
+    last_activity_at: int = 0
+    closed_at: Optional[int] = None
+    # Messages up to this seq were moved to the compressed archive
+    archived_seq: int = 0
 
 
 class IssueCreate(BaseModel):
@@ -35,6 +58,11 @@ class IssueResponse(BaseModel):
     status: str
 
 
+class IssueCreateResponse(IssueResponse):
+    # False when the chat already had an active issue, which is returned
+    created: bool
+
+
 class MessageCreate(BaseModel):
     message: str
 
@@ -45,8 +73,59 @@ class MessageResponse(BaseModel):
     from_user: str
     text: str
     timestamp: int
+    seq: Optional[int] = None
+
+
+class ClosedIssue(BaseModel):
+    issue_id: str
+    telegram_chat_id: str
+
+
+class SweepResponse(BaseModel):
+    # Idle issues closed by this sweep, for the bot to notify
+    closed: List[ClosedIssue]
+    archived_issues: int
+    archived_messages: int
+
+
+# Largest batch accepted by the bulk endpoints
+MAX_BULK_ISSUES = 500
+
+
+class BulkIssues(BaseModel):
+    issue_ids: List[str] = Field(min_length=1, max_length=MAX_BULK_ISSUES)
+
+
+class BulkStatusUpdate(BulkIssues):
+    status: IssueStatus
+
+
+class BulkMessageCreate(BulkIssues):
+    message: str
+
+
+class BulkOutcome(str, Enum):
+    DONE = "done"
+    NOT_FOUND = "not_found"
+    # Closed issues are never changed or reopened
+    ALREADY_CLOSED = "already_closed"
+    # The issue already had the requested status
+    UNCHANGED = "unchanged"
+
+
+class BulkItemResult(BaseModel):
+    issue_id: str
+    outcome: BulkOutcome
+
+
+class BulkResponse(BaseModel):
+    # One result per distinct issue id, in request order
+    results: List[BulkItemResult]
+    done: int
 
 
 class IssueWithMessages(BaseModel):
     issue_id: str
     messages: List[Message]
+    # Set when a limit cut the page short
+    has_more: bool = False
@@ -0,0 +1,375 @@
+import time
+import inspect
+import functools
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+from monitoring import timing
+
+# Latency buckets in seconds, from a fast cache hit to a slow completion
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _HistogramChild:
+    """Bucket counters for one label combination.
+
+    Observing only bumps two numbers and one bucket slot; cumulative counts
+    are computed when the registry is rendered for a scrape.
+    """
+
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Histogram:
+    """Prometheus-style histogram with a fixed label set"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float, *labelvalues: str):
+        self.labels(*labelvalues).observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for values, child in list(self.children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, child.counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {child.count}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {child.sum}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Counter:
+    """Prometheus-style monotonically increasing counter"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self.children.get(values)
+        if child is None:
+            child = self.children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount: float = 1.0, *labelvalues: str):
+        self.labels(*labelvalues).inc(amount)
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, values)} {child.value}"
+            for values, child in list(self.children.items())
+        ]
+
+
+class Gauge:
+    """Prometheus-style gauge holding the last value set"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *labelvalues: str):
+        self.values[labelvalues] = value
+
+    def render(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {value}"
+            for values, value in list(self.values.items())
+        ]
+
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Storage layer
+DB_OPERATION_SECONDS = REGISTRY.register(
+    Histogram(
+        "db_operation_seconds",
+        "Latency of storage backend calls",
+        ("backend", "method"),
+    )
+)
+
+# OpenAI
+OPENAI_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "openai_request_seconds",
+        "Latency of OpenAI API calls",
+        ("operation", "model"),
+    )
+)
+CHAT_ROUTES = REGISTRY.register(
+    Counter(
+        "chat_routes",
+        "AI replies by model tier and routing reason",
+        ("tier", "reason"),
+    )
+)
+CHAT_REPLY_SECONDS = REGISTRY.register(
+    Histogram(
+        "chat_reply_seconds",
+        "Latency of AI replies by model tier",
+        ("tier",),
+    )
+)
+OPENAI_TOKENS = REGISTRY.register(
+    Histogram(
+        "openai_tokens",
+        "Tokens used per OpenAI API call",
+        ("operation", "model", "kind"),
+        buckets=TOKEN_BUCKETS,
+    )
+)
+
+# HTTP API
+HTTP_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "http_request_seconds",
+        "Latency of API requests by route",
+        ("method", "route", "status"),
+    )
+)
+
+# Startup
+STARTUP_SECONDS = REGISTRY.register(
+    Gauge(
+        "startup_seconds",
+        "Time spent in each API startup step",
+        ("step",),
+    )
+)
+
+# Realtime events
+REALTIME_EVENT_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "realtime_event_lag_seconds",
+        "Delay between the database commit and the realtime event being handled",
+        ("table", "event"),
+    )
+)
+REALTIME_EVENT_HANDLING_SECONDS = REGISTRY.register(
+    Histogram(
+        "realtime_event_handling_seconds",
+        "Time spent handling a realtime event",
+        ("table", "event"),
+    )
+)
+REALTIME_DELIVERY_LAG_SECONDS = REGISTRY.register(
+    Histogram(
+        "realtime_delivery_lag_seconds",
+        "Delay between the database commit and a bot worker receiving the event",
+        ("worker", "kind"),
+    )
+)
+REALTIME_INGRESS_BACKLOG = REGISTRY.register(
+    Gauge(
+        "realtime_ingress_backlog",
+        "Events queued by the realtime ingress for each connected worker",
+        ("worker",),
+    )
+)
+LIVE_FEED_SUBSCRIBERS = REGISTRY.register(
+    Gauge(
+        "live_feed_subscribers",
+        "Dashboards connected to the live feed of this API process",
+    )
+)
+LIVE_FEED_OVERFLOWS = REGISTRY.register(
+    Counter(
+        "live_feed_overflows",
+        "Live feed streams ended because the client fell too far behind",
+    )
+)
+
+# Telegram bots
+BOT_HANDLER_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_handler_seconds",
+        "Latency of Telegram bot handlers",
+        ("bot", "handler"),
+    )
+)
+BOT_API_REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "bot_api_request_seconds",
+        "Latency of bot calls to the Customer Support API",
+        ("method",),
+    )
+)
+BOT_NOTIFICATIONS = REGISTRY.register(
+    Counter(
+        "bot_notifications",
+        "Admin notification messages sent or edited by the admin bot",
+        ("action",),
+    )
+)
+BOT_UPDATES_ROUTED = REGISTRY.register(
+    Counter(
+        "bot_updates_routed",
+        "Telegram updates forwarded to each user bot shard",
+        ("shard",),
+    )
+)
+
+
+def timed(histogram: Histogram, *labelvalues: str, span: Optional[str] = None):
+    """Decorator recording the duration of an async function.
+
+    With `span` set, the duration is also added to the Server-Timing entry of
+    the request being served.
+    """
+
+    def decorator(func):
+        child = histogram.labels(*labelvalues)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+
+        if span is None:
+            return wrapper
+
+        @functools.wraps(func)
+        async def span_wrapper(*args, **kwargs):
+            with timing.span(span):
+                return await wrapper(*args, **kwargs)
+
+        return span_wrapper
+
+    return decorator
+
+
+def timed_handler(bot_name: str, handler):
+    """Wrap a bot handler so its latency is recorded under its own name"""
+    return timed(BOT_HANDLER_SECONDS, bot_name, handler.__name__)(handler)
+
+
+def instrument_async_methods(
+    histogram: Histogram, *labelvalues: str, span: Optional[str] = None
+):
+    """Class decorator timing every public coroutine method.
+
+    The method name is appended as the last label value.
+    """
+
+    def decorator(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(member):
+                continue
+            setattr(cls, name, timed(histogram, *labelvalues, name, span=span)(member))
+        return cls
+
+    return decorator
+
+
+def observe_tokens(operation: str, model: str, usage: Optional[object]):
+    """Record prompt/completion token counts from an OpenAI usage object"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value is not None:
+            OPENAI_TOKENS.observe(value, operation, model, kind.split("_")[0])
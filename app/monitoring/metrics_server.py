@@ -0,0 +1,25 @@
+import logging
+from aiohttp import web
+from monitoring.metrics import REGISTRY, CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=REGISTRY.render().encode("utf-8"),
+        headers={"Content-Type": CONTENT_TYPE},
+    )
+
+
+async def start_metrics_server(port: int, host: str = "127.0.0.1") -> web.AppRunner:
+    """Serve /metrics on a small local HTTP port (used by the bot processes)"""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+
+    logger.info(f"Metrics server listening on http://{host}:{port}/metrics")
+    return runner
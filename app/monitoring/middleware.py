@@ -0,0 +1,117 @@
+import hmac
+import time
+import threading
+from typing import Optional
+from monitoring import timing
+from monitoring.metrics import HTTP_REQUEST_SECONDS
+from monitoring.profiler import ProfileStore, SamplingProfiler
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope, which keeps
+            # label cardinality bounded by the number of routes
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route_path,
+                str(status["code"]),
+            )
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header to every response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = timing.begin_request()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (b"server-timing", timings.header_value().encode("latin-1"))
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class ProfilingMiddleware:
+    """Runs a request under the sampling profiler when asked to.
+
+    Profiling is enabled only when a token is configured, and a request opts in
+    by sending it in the `X-Profile` header. The folded-stack profile is stored
+    in the profile directory and its name returned in `X-Profile-Name`.
+    """
+
+    def __init__(self, app, token: Optional[str], store: ProfileStore):
+        self.app = app
+        self.token = token
+        self.store = store
+        self._lock = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        if not self.token:
+            return False
+        for name, value in scope.get("headers", []):
+            if name == b"x-profile":
+                return hmac.compare_digest(value, self.token.encode("latin-1"))
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        # Profile one request at a time, samples would be mixed otherwise
+        if not self._lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        name = self.store.new_name(f"{scope['method']}_{scope['path']}")
+        profiler = SamplingProfiler(threading.get_ident())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-name", name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            self._lock.release()
+            self.store.save(name, profiler.folded())
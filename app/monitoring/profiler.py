@@ -0,0 +1,90 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval.
+
+    The API runs every request on the event loop thread, so sampling that
+    thread while a request is in flight shows where its time goes (including
+    blocking SDK calls). Other requests served concurrently on the same loop
+    show up in the samples as well.
+
+    Output is in the "folded stacks" format (`frame;frame;frame count`) read
+    by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_name(frame))
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.items())
+
+
+class ProfileStore:
+    """Writes profiles to a directory and reads them back by name"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def new_name(label: str) -> str:
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_")
+        return f"{int(time.time() * 1000)}-{safe_label}.folded"
+
+    def save(self, name: str, content: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def load(self, name: str) -> Optional[str]:
+        # Only plain file names produced by new_name() are accepted
+        if os.path.basename(name) != name or not name.endswith(".folded"):
+            return None
+
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
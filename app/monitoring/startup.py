@@ -0,0 +1,45 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from monitoring.metrics import STARTUP_SECONDS
+
+
+class StartupReport:
+    """Progress and timings of the API warm-up, served by /readyz.
+
+    Each step is also exported as the startup_seconds gauge, so a slower
+    cold start shows up on the metrics dashboard after a deploy.
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        # perf_counter() value when the process started importing the app
+        self.started = time.perf_counter() if started is None else started
+        self.steps: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.attempts = 0
+
+    def record(self, name: str, seconds: float):
+        self.steps[name] = round(seconds, 4)
+        STARTUP_SECONDS.set(seconds, name)
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def mark_ready(self):
+        self.ready = True
+        self.error = None
+        self.record("total", time.perf_counter() - self.started)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": "ready" if self.ready else "error" if self.error else "starting",
+            "error": self.error,
+            "attempts": self.attempts,
+            "steps": self.steps,
+        }
@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Set
+
+
+class RequestTimings:
+    """Time spent per category (db, embedding, ...) during one API request"""
+
+    __slots__ = ("started_at", "durations", "counts", "open_spans")
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.open_spans: Set[str] = set()
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def header_value(self) -> str:
+        """Render as a Server-Timing header value (durations in milliseconds)"""
+        entries = [
+            f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]} calls"'
+            for name, seconds in self.durations.items()
+        ]
+        total = (time.perf_counter() - self.started_at) * 1000
+        entries.append(f"total;dur={total:.1f}")
+        return ", ".join(entries)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def begin_request() -> RequestTimings:
+    """Start collecting timings for the current request context"""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def record(name: str, seconds: float):
+    """Add a duration to the current request (no-op outside a request)"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time a block and add it to the current request under `name`.
+
+    Nested spans with the same name (e.g. a DB method calling another DB
+    method) are only counted once, by the outermost span.
+    """
+    timings = _current_timings.get()
+    if timings is None or name in timings.open_spans:
+        yield
+        return
+
+    timings.open_spans.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.open_spans.discard(name)
+        timings.add(name, time.perf_counter() - start)
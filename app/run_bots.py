@@ -16,6 +16,20 @@ logger = logging.getLogger(__name__)
 # Configuration
 USER_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ADMIN_BOT_TOKEN = os.getenv("TELEGRAM_ADMIN_BOT_TOKEN")
+# Both bots receive realtime events from one ingress process (empty disables it)
+REALTIME_INGRESS_SOCKET = os.getenv(
+    "REALTIME_INGRESS_SOCKET", "/tmp/customer-support-realtime.sock"
+)
+# User bot worker processes; with more than one, chats are sharded across them
+USER_BOT_SHARDS = int(os.getenv("USER_BOT_SHARDS", "1"))
+
+
+def run_realtime_ingress():
+    """Run the shared realtime subscriptions in a separate process"""
+    logger.info("Starting Realtime Ingress...")
+    from database.realtime_ingress import main
+
+    main()
 
 
 def run_user_bot():
@@ -26,6 +40,22 @@ def run_user_bot():
     main()
 
 
+def run_update_router(queues):
+    """Poll Telegram for the user bot and route updates to its shards"""
+    logger.info(f"Starting User Bot update router for {len(queues)} shards...")
+    from telegram.update_router import main
+
+    main(queues)
+
+
+def run_user_bot_shard(index, count, updates):
+    """Run one shard of the user bot in a separate process"""
+    logger.info(f"Starting User Bot shard {index + 1}/{count}...")
+    from telegram.aiogram_bot import main
+
+    main((index, count), updates)
+
+
 def run_admin_bot():
     """Run the admin bot in a separate process"""
     logger.info("Starting Admin Bot...")
@@ -42,23 +72,39 @@ def main():
     print("Both bots are now running!")
     print("Press Ctrl+C to stop the bots\n")
 
-    # Start bots in separate processes
-    user_process = multiprocessing.Process(target=run_user_bot)
-    admin_process = multiprocessing.Process(target=run_admin_bot)
-
-    user_process.start()
-    admin_process.start()
+    # Start bots in separate processes; the bots connect to the ingress
+    # through the socket path inherited from this environment
+    processes = [multiprocessing.Process(target=run_admin_bot)]
+    if USER_BOT_SHARDS > 1:
+        queues = [multiprocessing.Queue() for _ in range(USER_BOT_SHARDS)]
+        processes.append(
+            multiprocessing.Process(target=run_update_router, args=(queues,))
+        )
+        processes.extend(
+            multiprocessing.Process(
+                target=run_user_bot_shard, args=(index, USER_BOT_SHARDS, queue)
+            )
+            for index, queue in enumerate(queues)
+        )
+    else:
+        processes.append(multiprocessing.Process(target=run_user_bot))
+    if REALTIME_INGRESS_SOCKET:
+        os.environ["REALTIME_INGRESS_SOCKET"] = REALTIME_INGRESS_SOCKET
+        processes.insert(0, multiprocessing.Process(target=run_realtime_ingress))
+
+    for process in processes:
+        process.start()
 
     try:
-        # Wait for both processes to finish
-        user_process.join()
-        admin_process.join()
+        # Wait for all processes to finish
+        for process in processes:
+            process.join()
     except KeyboardInterrupt:
         print("\nExiting...")
-        user_process.terminate()
-        admin_process.terminate()
-        user_process.join()
-        admin_process.join()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,286 @@
+import time
+import fcntl
+import asyncio
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from database.similarity import brute_force_search
+from database.storage import StorageBackend
+from models.embedding import EMBEDDING_DTYPE, to_embedding
+from services.faq_snapshot import FAQSnapshot, file_id, read_snapshot, write_snapshot
+
+# Rows widened to float32 at a time when scoring int8 vectors
+SCORE_CHUNK_ROWS = 4096
+# How often a worker looks for a snapshot written by another worker
+SNAPSHOT_CHECK_SECONDS = 1.0
+
+
+class VectorCompressor:
+    """Compressed copies of vectors, good enough to rank search candidates.
+
+    A reduced dimension count keeps the leading components (text-embedding-3
+    vectors are trained to stay meaningful when truncated), int8 stores each
+    component of the unit-length vector in one byte scaled by 127.
+    """
+
+    def __init__(self, dimensions: Optional[int] = None, quantize: bool = False):
+        self.dimensions = dimensions
+        self.quantize = quantize
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["VectorCompressor"]:
+        """Parse "int8", "256", "int8:256" or "float32"; None for "" or "exact"."""
+        parts = [part for part in spec.lower().split(":") if part]
+        if not parts or parts == ["exact"]:
+            return None
+
+        quantize = parts[0] == "int8"
+        if parts[0] in ("int8", "float32"):
+            parts = parts[1:]
+        if len(parts) > 1 or (parts and not parts[0].isdigit()):
+            raise ValueError(f"Invalid FAQ search tier: {spec}")
+
+        return cls(int(parts[0]) if parts else None, quantize)
+
+    @property
+    def name(self) -> str:
+        dtype = "int8" if self.quantize else "float32"
+        return f"{dtype}:{self.dimensions}" if self.dimensions else dtype
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.dimensions:
+            vectors = vectors[..., : self.dimensions]
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Compress a matrix with one vector per row"""
+        vectors = self._normalize(vectors.astype(EMBEDDING_DTYPE, copy=False))
+        if self.quantize:
+            return np.rint(vectors * 127).astype(np.int8)
+        return np.ascontiguousarray(vectors)
+
+    def scores(self, encoded: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of every encoded row to the query"""
+        query = self._normalize(query.astype(EMBEDDING_DTYPE, copy=False))
+        if not self.quantize:
+            return encoded @ query
+
+        # numpy has no fast int8 product, so widen a chunk at a time
+        query = query / 127
+        return np.concatenate(
+            [
+                encoded[start : start + SCORE_CHUNK_ROWS].astype(EMBEDDING_DTYPE)
+                @ query
+                for start in range(0, len(encoded), SCORE_CHUNK_ROWS)
+            ]
+        )
+
+
+def _faq_id(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class FAQSearchIndex:
+    """In-process compressed FAQ vectors for a fast candidate pass.
+
+    Every FAQ is scored against the compressed copy, then the best
+    `candidates` are read back from storage with their full vectors and
+    re-ranked exactly, so scores and the threshold are those of
+    search_similar_questions. The copy is rebuilt after local FAQ edits
+    (invalidate) and every refresh_seconds for edits made by other processes;
+    until then only recall can suffer, never the returned scores.
+
+    With a snapshot_path, API workers share one copy: whoever rebuilds writes
+    it to a memory-mapped snapshot file, and every worker maps that file
+    read-only instead of holding its own. Workers switch to a newer snapshot
+    within SNAPSHOT_CHECK_SECONDS, and a worker starting while the snapshot
+    is current maps it without reading FAQs from storage.
+    """
+
+    def __init__(
+        self,
+        db: StorageBackend,
+        compressor: VectorCompressor,
+        candidates: int = 50,
+        refresh_seconds: float = 300.0,
+        snapshot_path: Optional[str] = None,
+    ):
+        self.db = db
+        self.compressor = compressor
+        self.candidates = candidates
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_path = snapshot_path
+
+        # FAQ ids are str, or bytes when read from a snapshot
+        self._ids: Sequence = []
+        self._vectors: Optional[np.ndarray] = None
+        self._dimension = 0
+        self._version = 0
+        self._file_id = None
+        self._built_at: Optional[float] = None
+        self._checked_at = 0.0
+        self._generation = 0
+        self._edited = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._ids)
+
+    @property
+    def nbytes(self) -> int:
+        return self._vectors.nbytes if self._vectors is not None else 0
+
+    def invalidate(self):
+        """Rebuild before the next search"""
+        self._generation += 1
+        self._edited = True
+        self._built_at = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._built_at is not None
+            and time.monotonic() - self._built_at < self.refresh_seconds
+        )
+
+    async def refresh(self):
+        """Rebuild the compressed copy if it is missing or stale"""
+        if self._is_fresh():
+            self._follow_snapshot()
+            return
+        # Searches keep using the previous copy while another task rebuilds
+        if self._lock.locked() and self._vectors is not None:
+            return
+
+        async with self._lock:
+            if self._is_fresh():
+                return
+            if not self.snapshot_path:
+                await self._rebuild()
+                return
+
+            # One worker rebuilds at a time; closing the file releases the lock
+            with open(f"{self.snapshot_path}.lock", "a") as lock:
+                await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+                # Local edits need a rebuild, otherwise another worker's
+                # snapshot may already be current
+                if self._edited or not self._load_snapshot():
+                    await self._rebuild()
+
+    async def _rebuild(self):
+        generation, built_at = self._generation, time.monotonic()
+        version = time.time_ns()
+        faqs = [
+            faq for faq in await self.db.get_all_faqs() if faq.embedding is not None
+        ]
+
+        # All FAQs share one vector space except halfway through a
+        # re-embedding swap; index the dominant one
+        dimension = Counter(len(faq.embedding) for faq in faqs).most_common(1)
+        dimension = dimension[0][0] if dimension else 0
+        faqs = [faq for faq in faqs if len(faq.embedding) == dimension]
+
+        vectors = None
+        if faqs:
+            vectors = await asyncio.to_thread(
+                self.compressor.encode, np.vstack([faq.embedding for faq in faqs])
+            )
+
+        if self.snapshot_path:
+            await asyncio.to_thread(
+                write_snapshot,
+                self.snapshot_path,
+                version,
+                self.compressor.name,
+                dimension,
+                [faq.id for faq in faqs],
+                vectors,
+            )
+            # Search the mapped file, not a private copy of it
+            self._use_snapshot(read_snapshot(self.snapshot_path))
+        else:
+            # Swapped together so a concurrent search never mixes two builds
+            self._ids, self._vectors, self._dimension, self._version = (
+                [faq.id for faq in faqs],
+                vectors,
+                dimension,
+                version,
+            )
+
+        if generation == self._generation:
+            self._built_at = built_at
+            self._edited = False
+
+    def _use_snapshot(self, snapshot: FAQSnapshot):
+        self._ids, self._vectors, self._dimension, self._version, self._file_id = (
+            snapshot.ids,
+            snapshot.vectors,
+            snapshot.dimension,
+            snapshot.version,
+            snapshot.file_id,
+        )
+
+    def _load_snapshot(self) -> bool:
+        """Map the snapshot if it is current, in place of a rebuild"""
+        snapshot = read_snapshot(self.snapshot_path)
+        if snapshot is None or snapshot.tier != self.compressor.name:
+            return False
+
+        age = max(0.0, time.time() - snapshot.version / 1e9)
+        if age >= self.refresh_seconds:
+            return False
+
+        self._use_snapshot(snapshot)
+        # Expires together with the snapshot, not refresh_seconds from now
+        self._built_at = time.monotonic() - age
+        return True
+
+    def _follow_snapshot(self):
+        """Switch to a snapshot another worker wrote since the last check"""
+        now = time.monotonic()
+        if not self.snapshot_path or now - self._checked_at < SNAPSHOT_CHECK_SECONDS:
+            return
+        self._checked_at = now
+
+        if file_id(self.snapshot_path) in (None, self._file_id):
+            return
+        snapshot = read_snapshot(self.snapshot_path)
+        if (
+            snapshot is not None
+            and snapshot.tier == self.compressor.name
+            and snapshot.version > self._version
+        ):
+            self._use_snapshot(snapshot)
+
+    async def search(
+        self, query_embedding: np.ndarray, match_threshold: float = 0.7, limit: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Same results as db.search_similar_questions, up to recall"""
+        await self.refresh()
+
+        query = to_embedding(query_embedding)
+        ids, vectors, dimension = self._ids, self._vectors, self._dimension
+        if vectors is None or query.shape != (dimension,):
+            # Nothing indexed in this vector space
+            return await self.db.search_similar_questions(query, match_threshold, limit)
+
+        scores = await asyncio.to_thread(self.compressor.scores, vectors, query)
+        count = min(max(self.candidates, limit), len(ids))
+        best = np.argpartition(-scores, count - 1)[:count]
+
+        faqs = await self.db.get_faqs_by_ids([_faq_id(ids[i]) for i in best])
+        return brute_force_search(
+            query,
+            (
+                (
+                    {"id": faq.id, "question": faq.question, "answer": faq.answer},
+                    faq.embedding,
+                )
+                for faq in faqs
+            ),
+            match_threshold,
+            limit,
+        )
@@ -1,52 +1,84 @@
 from typing import List, Optional, Dict, Any
-from models.faq import FAQ
-from database.supabase_db import SupabaseDB
+from models.faq import FAQSummary
+from models.embedding import content_hash
+from database.storage import StorageBackend
 from services.openai_service import OpenAIService
+from services.faq_search import FAQSearchIndex
+from services.lexical_search import LexicalFAQIndex
 
 
 class FAQService:
-    def __init__(self, supabase_db: SupabaseDB, openai_service: OpenAIService):
-        self.supabase_db = supabase_db
+    def __init__(
+        self,
+        db: StorageBackend,
+        openai_service: OpenAIService,
+        faq_search: Optional[FAQSearchIndex] = None,
+        lexical_index: Optional[LexicalFAQIndex] = None,
+    ):
+        self.db = db
         self.openai_service = openai_service
+        self.faq_search = faq_search
+        self.lexical_index = lexical_index
 
-    async def get_all_faqs(self) -> List[FAQ]:
-        return await self.supabase_db.get_all_faqs()
+    def _faq_saved(self, faq: Optional[FAQSummary], embedding_changed: bool = True):
+        """Keep the in-process search indexes in step with storage"""
+        if self.faq_search and embedding_changed:
+            self.faq_search.invalidate()
+        if self.lexical_index:
+            self.lexical_index.upsert(faq)
 
-    async def create_faq(self, question: str, answer: str) -> Optional[FAQ]:
+    def _faq_deleted(self, faq_id: str):
+        if self.faq_search:
+            self.faq_search.invalidate()
+        if self.lexical_index:
+            self.lexical_index.remove(faq_id)
+
+    async def get_all_faqs(self) -> List[FAQSummary]:
+        return await self.db.get_faq_summaries()
+
+    async def create_faq(self, question: str, answer: str) -> Optional[FAQSummary]:
         # Generate embedding for the question
         embedding = await self.openai_service.generate_embedding(question)
 
-        # Create FAQ in Supabase
-        faq = await self.supabase_db.create_faq(question, answer, embedding)
+        # Create FAQ in the database
+        faq = await self.db.create_faq(
+            question, answer, embedding, self.openai_service.embedding_version
+        )
+        self._faq_saved(faq)
 
         return faq
 
-    async def get_faq(self, faq_id: str) -> Optional[FAQ]:
-        return await self.supabase_db.get_faq_by_id(faq_id)
+    async def get_faq(self, faq_id: str) -> Optional[FAQSummary]:
+        return await self.db.get_faq_summary(faq_id)
 
     async def update_faq(
         self, faq_id: str, question: str, answer: str
-    ) -> Optional[FAQ]:
-        # Check if FAQ exists
-        existing_faq = await self.supabase_db.get_faq_by_id(faq_id)
+    ) -> Optional[FAQSummary]:
+        # Check if FAQ exists before paying for an embedding
+        existing_faq = await self.db.get_faq_summary(faq_id)
         if not existing_faq:
             return None
 
-        # Generate new embedding for the updated question
-        embedding = await self.openai_service.generate_embedding(question)
+        # Only the question is embedded, so an answer edit keeps the vector
+        embedding = None
+        if existing_faq.content_hash != content_hash(question):
+            embedding = await self.openai_service.generate_embedding(question)
 
-        # Update FAQ in Supabase
-        updated_faq = await self.supabase_db.update_faq(
-            faq_id, question, answer, embedding
+        # Update FAQ in the database
+        updated_faq = await self.db.update_faq(
+            faq_id,
+            question,
+            answer,
+            embedding,
+            self.openai_service.embedding_version,
         )
+        self._faq_saved(updated_faq, embedding_changed=embedding is not None)
 
         return updated_faq
 
     async def delete_faq(self, faq_id: str) -> bool:
-        # Check if FAQ exists
-        existing_faq = await self.supabase_db.get_faq_by_id(faq_id)
-        if not existing_faq:
-            return False
-
-        # Delete from Supabase
-        return await self.supabase_db.delete_faq(faq_id)
+        # Returns False when there was nothing to delete
+        deleted = await self.db.delete_faq(faq_id)
+        if deleted:
+            self._faq_deleted(faq_id)
+        return deleted
@@ -0,0 +1,134 @@
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Snapshot file: a fixed header, the FAQ ids as fixed-width bytes and the
+# compressed vectors, each section aligned so numpy can view it in place
+MAGIC = b"FAQSNAP1"
+HEADER = struct.Struct("<8sQ16s4sIIII")
+ALIGN = 64
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
+
+
+@dataclass(frozen=True)
+class FAQSnapshot:
+    """Compressed FAQ vectors mapped read-only from a snapshot file.
+
+    `ids` and `vectors` are views of the mapping, so every process reading
+    the same file shares its pages through the OS page cache.
+    """
+
+    version: int
+    tier: str
+    dimension: int
+    ids: np.ndarray
+    vectors: Optional[np.ndarray]
+    file_id: Tuple[int, int]
+
+
+def file_id(path: str) -> Optional[Tuple[int, int]]:
+    """(inode, mtime) identifying the file currently at path"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def write_snapshot(
+    path: str,
+    version: int,
+    tier: str,
+    dimension: int,
+    ids: List[str],
+    vectors: Optional[np.ndarray],
+):
+    """Write a snapshot next to path and atomically rename it into place.
+
+    Processes that mapped the previous file keep reading it until they
+    switch; the rename never exposes a partly written snapshot.
+    """
+    encoded_ids = np.array([faq_id.encode("utf-8") for faq_id in ids], dtype=bytes)
+    if vectors is None:
+        vectors = np.empty((0, 0), dtype=np.float32)
+    id_width = encoded_ids.dtype.itemsize if len(ids) else 0
+
+    header = HEADER.pack(
+        MAGIC,
+        version,
+        tier.encode("ascii"),
+        vectors.dtype.str[1:].encode("ascii"),
+        dimension,
+        len(ids),
+        vectors.shape[1],
+        id_width,
+    )
+    ids_offset = _aligned(HEADER.size)
+    vectors_offset = _aligned(ids_offset + len(ids) * id_width)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".faq-snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.seek(ids_offset)
+            f.write(encoded_ids.tobytes())
+            f.seek(vectors_offset)
+            f.write(np.ascontiguousarray(vectors).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str) -> Optional[FAQSnapshot]:
+    """Map the snapshot at path, or None if there is no valid one"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+
+    # The identity of the file actually mapped, even if it is replaced meanwhile
+    with f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size < HEADER.size:
+            return None
+        data = np.memmap(f, dtype=np.uint8, mode="r")
+    magic, version, tier, dtype, dimension, count, columns, id_width = (
+        HEADER.unpack_from(data)
+    )
+    if magic != MAGIC:
+        return None
+
+    ids_offset = _aligned(HEADER.size)
+    vectors_offset = _aligned(ids_offset + count * id_width)
+    ids = data[ids_offset : ids_offset + count * id_width].view(f"S{id_width or 1}")
+
+    vectors = None
+    if count:
+        dtype = np.dtype("<" + dtype.rstrip(b"\0").decode("ascii"))
+        size = count * columns * dtype.itemsize
+        vectors = (
+            data[vectors_offset : vectors_offset + size]
+            .view(dtype)
+            .reshape(count, columns)
+        )
+
+    return FAQSnapshot(
+        version=version,
+        tier=tier.rstrip(b"\0").decode("ascii"),
+        dimension=dimension,
+        ids=ids,
+        vectors=vectors,
+        file_id=(stat.st_ino, stat.st_mtime_ns),
+    )
@@ -1,105 +1,294 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import time
-from models.issue import Issue, IssueStatus, IssueWithMessages, Message, MessageResponse
-from database.supabase_db import SupabaseDB
+from collections import OrderedDict
+from contextlib import nullcontext
+from models.issue import (
+    BulkOutcome,
+    ChatTurn,
+    Issue,
+    IssueStatus,
+    IssueWithMessages,
+    Message,
+    MessageResponse,
+)
+from database.storage import StorageBackend
 from services.openai_service import OpenAIService
+from services.faq_search import FAQSearchIndex
+from services.lexical_search import LexicalFAQIndex, reciprocal_rank_fusion
+from services.rate_limiter import ConcurrencyLimiter
+from monitoring import timing
 
 
 class IssueService:
-    def __init__(self, supabase_db: SupabaseDB, openai_service: OpenAIService):
-        self.supabase_db = supabase_db
+    def __init__(
+        self,
+        db: StorageBackend,
+        openai_service: OpenAIService,
+        llm_limiter: Optional[ConcurrencyLimiter] = None,
+        history_cache_size: int = 1000,
+        faq_search: Optional[FAQSearchIndex] = None,
+        lexical_index: Optional[LexicalFAQIndex] = None,
+    ):
+        self.db = db
         self.openai_service = openai_service
+        self.llm_limiter = llm_limiter
+        # Compressed search tier, when enabled (FAQ_SEARCH_TIER)
+        self.faq_search = faq_search
+        # Keyword first stage, when enabled (FAQ_LEXICAL_SEARCH)
+        self.lexical_index = lexical_index
+
+        # Conversation history per issue (LRU) as compact ChatTurns, topped
+        # up with only the messages past the last cached seq
+        self.history_cache_size = history_cache_size
+        self._history: "OrderedDict[str, List[ChatTurn]]" = OrderedDict()
 
     async def get_open_issue(self, telegram_chat_id: str) -> Optional[Issue]:
-        return await self.supabase_db.get_open_issue_by_chat_id(telegram_chat_id)
+        return await self.db.get_open_issue_by_chat_id(telegram_chat_id)
 
-    async def create_issue(self, telegram_chat_id: str, username: str) -> Issue:
-        return await self.supabase_db.create_issue(telegram_chat_id, username)
+    async def get_or_create_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> Tuple[Issue, bool]:
+        """The chat's active issue, created if needed; (issue, created)"""
+        return await self.db.get_or_create_open_issue(telegram_chat_id, username)
 
     async def get_issue(self, issue_id: str) -> Optional[Issue]:
-        return await self.supabase_db.get_issue_by_id(issue_id)
+        return await self.db.get_issue_by_id(issue_id)
+
+    async def get_messages(
+        self, issue_id: str, after_seq: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        if limit is None:
+            return await self.db.get_issue_messages(issue_id, after_seq)
+
+        # Ask for one extra message to find out whether there are more
+        page = await self.db.get_issue_messages(issue_id, after_seq, limit + 1)
+        if page and len(page.messages) > limit:
+            page.messages = page.messages[:limit]
+            page.has_more = True
+
+        return page
+
+    async def get_history(self, issue_id: str) -> List[ChatTurn]:
+        """Full conversation of an issue, fetching only messages not seen yet"""
+        history = self._history.get(issue_id, [])
+        last_seq = history[-1].seq if history else 0
+
+        new_messages = await self.db.get_issue_messages(issue_id, last_seq)
+        if new_messages is None:
+            self._history.pop(issue_id, None)
+            return []
+
+        # A concurrent call may have appended the same messages meanwhile
+        history = self._history.get(issue_id, history)
+        last_seq = history[-1].seq if history else 0
+        history = history + [
+            ChatTurn(m.seq, m.from_user, m.text)
+            for m in new_messages.messages
+            if m.seq > last_seq
+        ]
 
-    async def get_messages(self, issue_id: str) -> IssueWithMessages:
-        return await self.supabase_db.get_issue_messages(issue_id)
+        self._history[issue_id] = history
+        self._history.move_to_end(issue_id)
+        while len(self._history) > self.history_cache_size:
+            self._history.popitem(last=False)
+
+        return history
 
     async def add_user_message(
         self, issue_id: str, username: str, message_text: str
     ) -> Optional[MessageResponse]:
-        issue = await self.supabase_db.get_issue_by_id(issue_id)
+        issue = await self.db.get_issue_by_id(issue_id)
 
         print(issue, username, message_text)
 
         if not issue or issue.status == IssueStatus.CLOSED:
             return None
 
-        # Add user message to the issue
-        await self.supabase_db.add_message_to_issue(issue_id, username, message_text)
-
         # If issue is in manual mode, don't generate automatic response
         if issue.status == IssueStatus.MANUAL:
+            await self.db.add_message_to_issue(issue_id, username, message_text)
             return None
 
+        # Reserve an LLM slot before storing anything, so a rejected message
+        # can simply be resent by the user
+        async with self._llm_slot():
+            # Add user message to the issue
+            await self.db.add_message_to_issue(issue_id, username, message_text)
+
+            return await self._generate_ai_reply(issue_id, message_text)
+
+    def _llm_slot(self):
+        """Global cap on in-flight LLM work (raises RateLimitExceeded when full)"""
+        if self.llm_limiter is None:
+            return nullcontext()
+        return self.llm_limiter.slot()
+
+    async def _find_faqs(self, message_text: str) -> List[Dict[str, Any]]:
+        """FAQ entries relevant to a user message, best first"""
+        lexical_matches = []
+        if self.lexical_index:
+            with timing.span("lexical_search"):
+                lexical_matches = await self.lexical_index.search(message_text)
+            # Keyword-obvious questions don't need an embedding
+            if self.lexical_index.is_confident(lexical_matches):
+                return self.lexical_index.fusable(lexical_matches)
+
         # Generate embedding for the user message
-        message_embedding = await self.openai_service.generate_embedding(message_text)
+        with timing.span("embedding"):
+            message_embedding = await self.openai_service.generate_embedding(
+                message_text
+            )
 
         # Search for relevant FAQ entries
-        similar_faqs = await self.supabase_db.search_similar_questions(
-            message_embedding
-        )
+        with timing.span("vector_search"):
+            search = (
+                self.faq_search.search
+                if self.faq_search
+                else self.db.search_similar_questions
+            )
+            similar_faqs = await search(message_embedding)
+
+        if lexical_matches:
+            similar_faqs = reciprocal_rank_fusion(
+                similar_faqs, self.lexical_index.fusable(lexical_matches)
+            )
+        return similar_faqs
+
+    async def _generate_ai_reply(
+        self, issue_id: str, message_text: str
+    ) -> Optional[Message]:
+        # Acknowledgements get a canned reply, no FAQ search needed
+        if self.openai_service.router.is_canned(message_text):
+            similar_faqs = []
+        else:
+            similar_faqs = await self._find_faqs(message_text)
 
         # Get all messages for this issue to provide context
-        issue_with_messages = await self.supabase_db.get_issue_messages(issue_id)
-        messages = issue_with_messages.messages
+        messages = await self.get_history(issue_id)
 
         # Generate AI response
-        ai_response = await self.openai_service.generate_response(
-            messages=messages, faq_context=similar_faqs
-        )
+        with timing.span("completion"):
+            ai_response = await self.openai_service.generate_response(
+                messages=messages, faq_context=similar_faqs
+            )
 
         # Add AI response to the issue
-        ai_message = await self.supabase_db.add_message_to_issue(
-            issue_id, "GPT", ai_response
-        )
+        ai_message = await self.db.add_message_to_issue(issue_id, "GPT", ai_response)
 
         return ai_message
 
     async def add_admin_message(
         self, issue_id: str, admin_username: str, message_text: str
     ) -> Optional[Message]:
-        issue = await self.supabase_db.get_issue_by_id(issue_id)
+        issue = await self.db.get_issue_by_id(issue_id)
 
         if not issue:
             return None
 
         # If issue is in automatic mode, switch to manual
         if issue.status == IssueStatus.OPEN:
-            await self.supabase_db.update_issue_status(issue_id, IssueStatus.MANUAL)
+            await self.db.update_issue_status(issue_id, IssueStatus.MANUAL)
 
         # Add admin message to the issue
-        return await self.supabase_db.add_message_to_issue(
-            issue_id, "Admin", message_text
-        )
+        return await self.db.add_message_to_issue(issue_id, "Admin", message_text)
 
     async def switch_to_manual(self, issue_id: str) -> Optional[Issue]:
-        issue = await self.supabase_db.get_issue_by_id(issue_id)
+        issue = await self.db.get_issue_by_id(issue_id)
 
         if not issue or issue.status != IssueStatus.OPEN:
             return None
 
-        return await self.supabase_db.update_issue_status(issue_id, IssueStatus.MANUAL)
+        return await self.db.update_issue_status(issue_id, IssueStatus.MANUAL)
 
     async def close_issue(self, issue_id: str) -> Optional[Issue]:
-        issue = await self.supabase_db.get_issue_by_id(issue_id)
+        issue = await self.db.get_issue_by_id(issue_id)
 
         if not issue or issue.status == IssueStatus.CLOSED:
             return None
 
-        return await self.supabase_db.update_issue_status(issue_id, IssueStatus.CLOSED)
+        self._history.pop(issue_id, None)
+        return await self.db.update_issue_status(issue_id, IssueStatus.CLOSED)
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: IssueStatus
+    ) -> Dict[str, BulkOutcome]:
+        """Change the status of many issues in two queries; outcome per issue.
+
+        Closed issues are left alone, as with the single issue endpoints.
+        """
+        issue_ids = list(dict.fromkeys(issue_ids))
+        issues = {
+            issue.id: issue for issue in await self.db.get_issues_by_ids(issue_ids)
+        }
+
+        outcomes = {}
+        to_update = []
+        for issue_id in issue_ids:
+            issue = issues.get(issue_id)
+            if not issue:
+                outcomes[issue_id] = BulkOutcome.NOT_FOUND
+            elif issue.status == IssueStatus.CLOSED:
+                outcomes[issue_id] = BulkOutcome.ALREADY_CLOSED
+            elif issue.status == status:
+                outcomes[issue_id] = BulkOutcome.UNCHANGED
+            else:
+                # Until the update says otherwise: it skips issues closed meanwhile
+                outcomes[issue_id] = BulkOutcome.ALREADY_CLOSED
+                to_update.append(issue_id)
+
+        if to_update:
+            for issue in await self.db.update_issues_status(to_update, status):
+                outcomes[issue.id] = BulkOutcome.DONE
+                if status == IssueStatus.CLOSED:
+                    self._history.pop(issue.id, None)
+
+        return outcomes
+
+    async def close_issues(self, issue_ids: List[str]) -> Dict[str, BulkOutcome]:
+        return await self.update_issues_status(issue_ids, IssueStatus.CLOSED)
+
+    async def add_admin_message_to_issues(
+        self, issue_ids: List[str], admin_username: str, message_text: str
+    ) -> Dict[str, BulkOutcome]:
+        """Post one admin message to many issues in at most three queries.
+
+        Like add_admin_message, open issues are switched to manual first.
+        Closed issues are skipped, as with update_issues_status.
+        """
+        issue_ids = list(dict.fromkeys(issue_ids))
+        issues = await self.db.get_issues_by_ids(issue_ids)
+        active_ids = [
+            issue.id for issue in issues if issue.status != IssueStatus.CLOSED
+        ]
+
+        open_ids = [issue.id for issue in issues if issue.status == IssueStatus.OPEN]
+        if open_ids:
+            await self.db.update_issues_status(open_ids, IssueStatus.MANUAL)
+
+        sent = set()
+        if active_ids:
+            messages = await self.db.add_message_to_issues(
+                active_ids, "Admin", message_text
+            )
+            sent = {message.issue_id for message in messages}
+
+        found = {issue.id for issue in issues}
+        outcomes = {}
+        for issue_id in issue_ids:
+            if issue_id in sent:
+                outcomes[issue_id] = BulkOutcome.DONE
+            elif issue_id in found:
+                # Closed before the request, or while it was running
+                outcomes[issue_id] = BulkOutcome.ALREADY_CLOSED
+            else:
+                outcomes[issue_id] = BulkOutcome.NOT_FOUND
+
+        return outcomes
 
     async def get_all_issues(self) -> List[Issue]:
-        return await self.supabase_db.get_all_issues()
+        return await self.db.get_all_issues()
 
     async def get_manual_issues(self) -> List[Issue]:
         """Get all issues in manual mode"""
-        all_issues = await self.supabase_db.get_all_issues()
+        all_issues = await self.db.get_all_issues()
         return [issue for issue in all_issues if issue.status == IssueStatus.MANUAL]
@@ -0,0 +1,63 @@
+import time
+from typing import List, Tuple
+from models.issue import Issue
+from database.storage import StorageBackend
+from database.message_archive import pack_messages
+
+
+class IssueSweeper:
+    """Closes idle issues and moves messages of old closed issues to the archive.
+
+    Issues with no message for idle_seconds are closed; the caller (the user
+    bot, through POST /api/private/issues/sweep) tells their users. Messages of
+    issues closed more than archive_after_seconds ago are compressed into one
+    archive entry per issue and deleted from the messages table, which keeps
+    the live tables and their indexes small. get_issue_messages reads them
+    back on demand. A setting of 0 disables that part of the sweep.
+    """
+
+    def __init__(
+        self,
+        db: StorageBackend,
+        idle_seconds: int = 24 * 3600,
+        archive_after_seconds: int = 30 * 24 * 3600,
+        batch_size: int = 100,
+    ):
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self.archive_after_seconds = archive_after_seconds
+        self.batch_size = batch_size
+
+    async def close_idle(self) -> List[Issue]:
+        if not self.idle_seconds:
+            return []
+
+        idle_before = int(time.time()) - self.idle_seconds
+        return await self.db.close_idle_issues(idle_before, self.batch_size)
+
+    async def archive_closed(self) -> Tuple[int, int]:
+        """(issues, messages) archived, at most batch_size issues per call"""
+        if not self.archive_after_seconds:
+            return 0, 0
+
+        closed_before = int(time.time()) - self.archive_after_seconds
+        issues = await self.db.get_issues_to_archive(closed_before, self.batch_size)
+
+        archived_issues = archived_messages = 0
+        for issue in issues:
+            # Includes any earlier archive, which the new one replaces
+            page = await self.db.get_issue_messages(issue.id)
+            if not page or not page.messages:
+                continue
+
+            archived_messages += await self.db.archive_issue_messages(
+                issue.id, pack_messages(page.messages), page.messages[-1].seq
+            )
+            archived_issues += 1
+        return archived_issues, archived_messages
+
+    async def sweep(self) -> Tuple[List[Issue], int, int]:
+        """Closed issues, archived issues and archived messages"""
+        closed = await self.close_idle()
+        archived_issues, archived_messages = await self.archive_closed()
+        return closed, archived_issues, archived_messages
@@ -0,0 +1,234 @@
+import re
+import math
+import time
+import asyncio
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from database.storage import StorageBackend
+from models.faq import FAQSummary
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset(
+    "a about am an and any are as at be been but by can could did do does for "
+    "from had has have how i if in is it its me my of on or our should so than "
+    "that the their them then there these they this to was we were what when "
+    "where which who why will with would you your".split()
+)
+
+# Question terms count this many times as much as answer terms
+QUESTION_WEIGHT = 2
+
+
+def stem(token: str) -> str:
+    """S-stemmer: fold plurals so "refunds" matches "refund" """
+    if (
+        len(token) > 4
+        and token.endswith("ies")
+        and not token.endswith(("eies", "aies"))
+    ):
+        return token[:-3] + "y"
+    if (
+        len(token) > 3
+        and token.endswith("es")
+        and not token.endswith(("aes", "ees", "oes"))
+    ):
+        return token[:-1]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("us", "ss")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def reciprocal_rank_fusion(
+    *rankings: List[Dict[str, Any]], limit: int = 5, k: int = 60
+) -> List[Dict[str, Any]]:
+    """Merge ranked FAQ lists by summing 1 / (k + rank) per FAQ.
+
+    Ranks rather than scores are combined, so cosine similarities and BM25
+    scores need no common scale. The first list's entry wins for duplicates.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    faqs: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, faq in enumerate(ranking, start=1):
+            scores[faq["id"]] += 1 / (k + rank)
+            faqs.setdefault(faq["id"], faq)
+
+    best = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+    return [faqs[faq_id] for faq_id in best]
+
+
+class BM25:
+    """Inverted index over FAQ questions and answers, updated in place"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.faqs: Dict[str, FAQSummary] = {}
+        self._terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        # term -> faq id -> weighted term frequency
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.faqs)
+
+    def add(self, faq: FAQSummary):
+        self.remove(faq.id)
+
+        terms = Counter(tokenize(faq.answer))
+        for term in tokenize(faq.question):
+            terms[term] += QUESTION_WEIGHT
+
+        self.faqs[faq.id] = faq
+        self._terms[faq.id] = terms
+        self._lengths[faq.id] = sum(terms.values())
+        for term, frequency in terms.items():
+            self._postings[term][faq.id] = frequency
+        self._total_length += self._lengths[faq.id]
+
+    def remove(self, faq_id: str):
+        terms = self._terms.pop(faq_id, None)
+        if terms is None:
+            return
+
+        del self.faqs[faq_id]
+        for term in terms:
+            postings = self._postings[term]
+            del postings[faq_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(faq_id)
+
+    def idf(self, term: str) -> float:
+        frequency = len(self._postings.get(term, ()))
+        return math.log(1 + (len(self.faqs) - frequency + 0.5) / (frequency + 0.5))
+
+    def search(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Best FAQs with their BM25 score and query coverage.
+
+        Coverage is the share of the query's idf mass found in the FAQ; words
+        no FAQ contains count against it, so it drops for off-topic queries.
+        """
+        terms = set(tokenize(text))
+        if not terms or not self.faqs:
+            return []
+
+        idf = {term: self.idf(term) for term in terms}
+        average_length = self._total_length / len(self.faqs)
+        scores: Dict[str, float] = defaultdict(float)
+        for term in terms:
+            for faq_id, frequency in self._postings.get(term, {}).items():
+                length = self._lengths[faq_id]
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                scores[faq_id] += (
+                    idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+                )
+
+        total_idf = sum(idf.values())
+        results = []
+        for faq_id in sorted(scores, key=scores.__getitem__, reverse=True)[:limit]:
+            faq, faq_terms = self.faqs[faq_id], self._terms[faq_id]
+            results.append(
+                {
+                    "id": faq.id,
+                    "question": faq.question,
+                    "answer": faq.answer,
+                    "score": scores[faq_id],
+                    "coverage": sum(idf[t] for t in terms if t in faq_terms)
+                    / total_idf,
+                }
+            )
+        return results
+
+
+class LexicalFAQIndex:
+    """In-process BM25 first stage for the FAQ search behind AI replies.
+
+    A query whose best match covers nearly all of its terms and clearly beats
+    the runner-up is confident: the AI reply can use it without an embedding
+    call. Otherwise the lexical matches are fused with the vector results.
+    FAQ edits through FAQService update the index in place; a full rebuild
+    every refresh_seconds picks up edits made by other processes.
+    """
+
+    def __init__(
+        self,
+        db: StorageBackend,
+        min_coverage: float = 0.8,
+        min_margin: float = 1.5,
+        fusion_min_coverage: float = 0.5,
+        refresh_seconds: float = 300.0,
+    ):
+        self.db = db
+        self.min_coverage = min_coverage
+        self.min_margin = min_margin
+        self.fusion_min_coverage = fusion_min_coverage
+        self.refresh_seconds = refresh_seconds
+
+        self._index = BM25()
+        self._built_at: Optional[float] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def upsert(self, faq: Optional[FAQSummary]):
+        if faq is not None:
+            self._generation += 1
+            self._index.add(faq)
+
+    def remove(self, faq_id: str):
+        self._generation += 1
+        self._index.remove(faq_id)
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._built_at is not None
+            and time.monotonic() - self._built_at < self.refresh_seconds
+        )
+
+    async def refresh(self):
+        """Rebuild from storage if the index is missing or stale"""
+        if self._is_fresh():
+            return
+        # Searches keep using the previous index while another task rebuilds
+        if self._lock.locked() and self._built_at is not None:
+            return
+
+        async with self._lock:
+            if self._is_fresh():
+                return
+
+            generation, built_at = self._generation, time.monotonic()
+            index = BM25(self._index.k1, self._index.b)
+            for faq in await self.db.get_faq_summaries():
+                index.add(faq)
+
+            self._index = index
+            # Rebuild again if a local edit raced with this one
+            self._built_at = built_at if generation == self._generation else 0.0
+
+    async def search(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
+        await self.refresh()
+        return self._index.search(text, limit)
+
+    def is_confident(self, matches: List[Dict[str, Any]]) -> bool:
+        """Whether the best match can stand in for a vector search"""
+        if not matches or matches[0]["coverage"] < self.min_coverage:
+            return False
+        return len(matches) == 1 or (
+            matches[0]["score"] >= self.min_margin * matches[1]["score"]
+        )
+
+    def fusable(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Matches strong enough to join the hybrid ranking"""
+        return [m for m in matches if m["coverage"] >= self.fusion_min_coverage]
@@ -0,0 +1,191 @@
+import json
+import uuid
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Set
+from database.realtime_events import MESSAGE_CREATED, STATUS_CHANGED, RealtimeEvents
+from monitoring.metrics import LIVE_FEED_OVERFLOWS, LIVE_FEED_SUBSCRIBERS
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of a replay the feed cannot do: the client reloads with the
+# REST endpoints and continues from the cursor of this event
+RESET = "reset"
+# SSE comment keeping idle connections open through proxies
+KEEPALIVE = b": keep-alive\n\n"
+
+
+@dataclass(frozen=True)
+class FeedEvent:
+    seq: int
+    kind: str
+    issue_id: str
+    # New and previous status for status changes, empty for messages
+    statuses: tuple
+    frame: bytes
+
+
+class FeedSubscription:
+    """One connected dashboard: its filters and the frames not yet sent"""
+
+    def __init__(
+        self, issue_id: Optional[str], status: Optional[str], max_pending: int
+    ):
+        self.issue_id = issue_id
+        self.status = status
+        self.max_pending = max_pending
+        self.pending: Deque[bytes] = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+
+    def wants(self, event: FeedEvent) -> bool:
+        if self.issue_id is not None and event.issue_id != self.issue_id:
+            return False
+        return self.status is None or self.status in event.statuses
+
+    def push(self, frame: bytes):
+        if len(self.pending) >= self.max_pending:
+            self.overflowed = True
+        else:
+            self.pending.append(frame)
+        self.ready.set()
+
+    async def frames(self, keepalive_seconds: float) -> AsyncIterator[bytes]:
+        """Frames as they are published; ends if the client fell behind"""
+        while True:
+            try:
+                await asyncio.wait_for(self.ready.wait(), keepalive_seconds)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+
+            self.ready.clear()
+            while self.pending:
+                yield self.pending.popleft()
+            if self.overflowed:
+                # The client reconnects with its last cursor and catches up
+                # from the replay buffer
+                LIVE_FEED_OVERFLOWS.inc()
+                return
+
+
+class LiveFeed:
+    """Issue status changes and new messages pushed to connected dashboards.
+
+    A single realtime subscription, opened when the first dashboard connects,
+    feeds every connection of the process. Each event is encoded once as a
+    Server-Sent Events frame whose id is a cursor; the last `buffer_size`
+    events are kept so a client reconnecting with its last cursor gets what
+    it missed. Cursors are only valid in the process that issued them: a
+    cursor from another worker, a restart or beyond the buffer gets a reset
+    event instead.
+    """
+
+    def __init__(
+        self,
+        source_factory: Callable[[], RealtimeEvents],
+        buffer_size: int = 1000,
+        max_pending: int = 1000,
+        keepalive_seconds: float = 15.0,
+    ):
+        self.source_factory = source_factory
+        self.keepalive_seconds = keepalive_seconds
+        self.max_pending = max_pending
+        self.buffer: Deque[FeedEvent] = deque(maxlen=buffer_size)
+        self.subscriptions: Set[FeedSubscription] = set()
+        # Distinguishes this process's cursors from those of other workers
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.source: Optional[RealtimeEvents] = None
+        self._starting = asyncio.Lock()
+
+    async def start(self):
+        """Open the realtime subscription, if not done yet"""
+        async with self._starting:
+            if self.source is not None:
+                return
+
+            source = self.source_factory()
+            source.register_status_changed_callback(self._on_status_changed)
+            source.register_message_created_callback(self._on_message_created)
+            await source.start()
+            self.source = source
+            logger.info("Live feed subscribed to realtime events")
+
+    async def stop(self):
+        if self.source is not None:
+            await self.source.stop()
+            self.source = None
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}-{self.seq}"
+
+    async def _on_status_changed(self, data: Dict[str, Any]):
+        issue = data.get("issue", {})
+        payload = {
+            "issue_id": data.get("issue_id"),
+            "status": issue.get("status"),
+            "old_status": data.get("old_status"),
+            "telegram_chat_id": issue.get("telegram_chat_id"),
+            "username": issue.get("username"),
+            "last_activity_at": issue.get("last_activity_at"),
+        }
+        statuses = (payload["status"], payload["old_status"])
+        self.publish(STATUS_CHANGED, payload["issue_id"], statuses, payload)
+
+    async def _on_message_created(self, data: Dict[str, Any]):
+        self.publish(MESSAGE_CREATED, data.get("issue_id"), (), data["message"])
+
+    def publish(self, kind: str, issue_id: str, statuses: tuple, payload: Dict):
+        self.seq += 1
+        event = FeedEvent(
+            self.seq, kind, issue_id, statuses, self._frame(kind, payload)
+        )
+        self.buffer.append(event)
+        for subscription in self.subscriptions:
+            if subscription.wants(event):
+                subscription.push(event.frame)
+
+    def _frame(self, kind: str, payload: Dict) -> bytes:
+        data = json.dumps(payload, separators=(",", ":"))
+        return f"id: {self.cursor}\nevent: {kind}\ndata: {data}\n\n".encode("utf-8")
+
+    def subscribe(
+        self,
+        issue_id: Optional[str] = None,
+        status: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> FeedSubscription:
+        """Start receiving events, first replaying those after the given cursor"""
+        subscription = FeedSubscription(issue_id, status, self.max_pending)
+        if after is not None:
+            missed = self._events_after(after)
+            if missed is None:
+                subscription.push(self._frame(RESET, {}))
+            else:
+                for event in missed:
+                    if subscription.wants(event):
+                        subscription.push(event.frame)
+
+        self.subscriptions.add(subscription)
+        LIVE_FEED_SUBSCRIBERS.set(len(self.subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: FeedSubscription):
+        self.subscriptions.discard(subscription)
+        LIVE_FEED_SUBSCRIBERS.set(len(self.subscriptions))
+
+    def _events_after(self, cursor: str) -> Optional[list]:
+        """Buffered events after cursor, or None if they can't all be replayed"""
+        epoch, _, seq = cursor.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+
+        seq = int(seq)
+        oldest = self.buffer[0].seq if self.buffer else self.seq + 1
+        if seq < oldest - 1:
+            return None
+        return [event for event in self.buffer if event.seq > seq]
@@ -1,24 +1,224 @@
-import openai
+import re
+import time
+import asyncio
+import numpy as np
+from dataclasses import dataclass
 from typing import List, Optional, Dict, Any
-from models.issue import Message
+from models.issue import ChatTurn
+from models.embedding import from_base64
+from monitoring.metrics import (
+    CHAT_REPLY_SECONDS,
+    CHAT_ROUTES,
+    OPENAI_REQUEST_SECONDS,
+    observe_tokens,
+)
+
+# Whole messages (lowercased, punctuation removed) answered without a model
+CANNED_REPLIES = {
+    "acknowledgement": (
+        "You're welcome! Let me know if there's anything else I can help with."
+    ),
+    "greeting": "Hello! How can I help you today?",
+}
+ACKNOWLEDGEMENTS = frozenset(
+    {
+        "thanks",
+        "thank you",
+        "thanks a lot",
+        "thank you so much",
+        "thx",
+        "ty",
+        "ok",
+        "okay",
+        "ok thanks",
+        "ok thank you",
+        "got it",
+        "great",
+        "great thanks",
+        "cool",
+        "perfect",
+        "awesome",
+        "nice",
+    }
+)
+GREETINGS = frozenset(
+    {
+        "hi",
+        "hello",
+        "hey",
+        "hi there",
+        "hello there",
+        "good morning",
+        "good afternoon",
+        "good evening",
+    }
+)
+
+
+@dataclass(frozen=True)
+class ChatRoute:
+    """Model tier chosen for one AI reply"""
+
+    tier: str  # "canned", "fast" or "full"
+    reason: str
+    model: Optional[str] = None
+    max_tokens: int = 0
+    reply: Optional[str] = None
+
+
+class ModelRouter:
+    """Picks the cheapest model tier that can handle a reply.
+
+    Bare acknowledgements and greetings get a canned reply. A short
+    conversation about a question an FAQ clearly covers goes to the fast
+    model, which mostly has to rephrase the FAQ answer. Everything else
+    goes to the full model.
+    """
+
+    def __init__(
+        self,
+        full_model: str = "gpt-3.5-turbo",
+        fast_model: Optional[str] = None,
+        full_max_tokens: int = 500,
+        fast_max_tokens: int = 250,
+        fast_min_similarity: float = 0.85,
+        fast_min_coverage: float = 0.8,
+        fast_max_history: int = 6,
+        fast_max_message_length: int = 300,
+        canned_replies: bool = True,
+    ):
+        self.full_model = full_model
+        self.fast_model = fast_model or full_model
+        self.full_max_tokens = full_max_tokens
+        self.fast_max_tokens = fast_max_tokens
+        self.fast_min_similarity = fast_min_similarity
+        # Keyword matches carry a coverage instead of a similarity
+        self.fast_min_coverage = fast_min_coverage
+        self.fast_max_history = fast_max_history
+        self.fast_max_message_length = fast_max_message_length
+        self.canned_replies = canned_replies
+
+    @staticmethod
+    def classify(text: str) -> Optional[str]:
+        """ "acknowledgement", "greeting" or None for a real message"""
+        if "?" in text:
+            return None
+
+        if not any(ch.isalnum() for ch in text):
+            # Emoji or punctuation only, e.g. a thumbs up
+            return "acknowledgement" if text.strip() else None
+
+        words = " ".join(re.findall(r"[\w']+", text.lower()))
+        if words in ACKNOWLEDGEMENTS:
+            return "acknowledgement"
+        if words in GREETINGS:
+            return "greeting"
+        return None
+
+    def is_canned(self, text: str) -> bool:
+        """Whether the reply to this message needs no model or FAQ context"""
+        return self.canned_replies and self.classify(text) is not None
+
+    def _covered(self, faq: Dict[str, Any]) -> bool:
+        if faq.get("similarity") is not None:
+            return faq["similarity"] >= self.fast_min_similarity
+        return faq.get("coverage", 0.0) >= self.fast_min_coverage
+
+    def route(
+        self, messages: List[ChatTurn], faq_context: Optional[List[Dict[str, Any]]]
+    ) -> ChatRoute:
+        text = messages[-1].text if messages else ""
+
+        if self.is_canned(text):
+            kind = self.classify(text)
+            return ChatRoute("canned", kind, reply=CANNED_REPLIES[kind])
+
+        if not faq_context or not self._covered(faq_context[0]):
+            reason = "no_faq_match"
+        elif len(messages) > self.fast_max_history:
+            reason = "long_conversation"
+        elif len(text) > self.fast_max_message_length:
+            reason = "long_message"
+        else:
+            return ChatRoute("fast", "faq_match", self.fast_model, self.fast_max_tokens)
+
+        return ChatRoute("full", reason, self.full_model, self.full_max_tokens)
 
 
 class OpenAIService:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        embedding_model: str = "text-embedding-ada-002",
+        embedding_dimensions: Optional[int] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        # Imported here: the package takes about a second to import, and code
+        # that only needs ModelRouter (or the benchmark fakes) never uses it
+        import openai
+
         openai.api_key = api_key
+        self.openai = openai
+        self.embedding_model = embedding_model
+        # Only text-embedding-3 models accept a reduced dimension count
+        self.embedding_dimensions = embedding_dimensions
+        self.router = router or ModelRouter()
+        self.chat_model = self.router.full_model
+
+    @property
+    def embedding_version(self) -> str:
+        """Identifies the vector space embeddings are generated in"""
+        if self.embedding_dimensions:
+            return f"{self.embedding_model}:{self.embedding_dimensions}"
+        return self.embedding_model
 
-    async def generate_embedding(self, text: str) -> List[float]:
+    def _embedding_options(self) -> Dict[str, Any]:
+        # base64 is a quarter of the JSON size and decodes straight to float32
+        options = {"model": self.embedding_model, "encoding_format": "base64"}
+        if self.embedding_dimensions:
+            options["dimensions"] = self.embedding_dimensions
+        return options
+
+    async def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for text using OpenAI's embedding model"""
+        start = time.perf_counter()
         # Remove await as the OpenAI client already returns the response directly
-        response = openai.embeddings.create(input=text, model="text-embedding-ada-002")
-        return response.data[0].embedding
+        response = self.openai.embeddings.create(
+            input=text, **self._embedding_options()
+        )
+        OPENAI_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, "embedding", self.embedding_model
+        )
+        observe_tokens("embedding", self.embedding_model, response.usage)
+
+        return from_base64(response.data[0].embedding)
+
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed a batch of texts in one request, without blocking the loop"""
+        start = time.perf_counter()
+        response = await asyncio.to_thread(
+            self.openai.embeddings.create, input=texts, **self._embedding_options()
+        )
+        OPENAI_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, "embedding_batch", self.embedding_model
+        )
+        observe_tokens("embedding_batch", self.embedding_model, response.usage)
+
+        data = sorted(response.data, key=lambda item: item.index)
+        return [from_base64(item.embedding) for item in data]
 
     async def generate_response(
         self,
-        messages: List[Message],
+        messages: List[ChatTurn],
         faq_context: Optional[List[Dict[str, Any]]] = None,
     ) -> str:
-        """Generate a response using OpenAI's GPT model"""
+        """Generate a response using the model tier picked by the router"""
+        route = self.router.route(messages, faq_context)
+        CHAT_ROUTES.inc(1, route.tier, route.reason)
+        if route.reply is not None:
+            CHAT_REPLY_SECONDS.observe(0.0, route.tier)
+            return route.reply
+
         system_message = {
             "role": "system",
             "content": "You are a helpful customer support assistant. Be concise and friendly in your responses.",
@@ -41,11 +241,16 @@ class OpenAIService:
                 }
             )
 
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
+        start = time.perf_counter()
+        response = self.openai.chat.completions.create(
+            model=route.model,
             messages=formatted_messages,
-            max_tokens=500,
+            max_tokens=route.max_tokens,
             temperature=0.7,
         )
+        elapsed = time.perf_counter() - start
+        OPENAI_REQUEST_SECONDS.observe(elapsed, "completion", route.model)
+        CHAT_REPLY_SECONDS.observe(elapsed, route.tier)
+        observe_tokens("completion", route.model, response.usage)
 
         return response.choices[0].message.content
@@ -0,0 +1,146 @@
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Tuple
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is rejected by admission control"""
+
+    def __init__(self, message: str, retry_after: float):
+        self.message = message
+        self.retry_after = retry_after
+        super().__init__(self.message)
+
+    @property
+    def retry_after_header(self) -> str:
+        """Value for the Retry-After header (whole seconds, at least 1)"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """Token bucket holding up to `capacity` tokens, refilled at `rate` tokens/sec"""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, rate: float, now: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = now
+
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float, amount: float = 1.0) -> float:
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        self.refill(now)
+        if self.tokens >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return math.inf
+        return (amount - self.tokens) / self.rate
+
+    def is_idle(self, now: float) -> bool:
+        """A full bucket carries no state and can be dropped"""
+        self.refill(now)
+        return self.tokens >= self.capacity
+
+
+class KeyedRateLimiter:
+    """Token buckets keyed by an arbitrary string (chat id, issue id, ...)"""
+
+    def __init__(self, capacity: float, per_minute: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._evict_idle(now)
+            bucket = TokenBucket(self.capacity, self.rate, now)
+            self.buckets[key] = bucket
+        return bucket
+
+    def _evict_idle(self, now: float):
+        """Drop buckets that have refilled completely to keep memory bounded"""
+        for key in [k for k, b in self.buckets.items() if b.is_idle(now)]:
+            del self.buckets[key]
+
+    def check(self, key: str) -> float:
+        """Return seconds to wait before `key` may proceed (0 if allowed now)"""
+        now = time.monotonic()
+        return self._bucket(key, now).wait_time(now)
+
+    def consume(self, key: str):
+        self._bucket(key, time.monotonic()).tokens -= 1
+
+    def refund(self, key: str):
+        """Give back a token taken by `consume`"""
+        bucket = self._bucket(key, time.monotonic())
+        bucket.tokens = min(bucket.capacity, bucket.tokens + 1)
+
+
+class MessageRateLimiter:
+    """Per-chat and per-issue admission control for incoming user messages"""
+
+    def __init__(
+        self,
+        chat_capacity: float,
+        chat_per_minute: float,
+        issue_capacity: float,
+        issue_per_minute: float,
+    ):
+        self.chat_limiter = KeyedRateLimiter(chat_capacity, chat_per_minute)
+        self.issue_limiter = KeyedRateLimiter(issue_capacity, issue_per_minute)
+
+    def _limits(
+        self, telegram_chat_id: str, issue_id: str
+    ) -> Tuple[Tuple[KeyedRateLimiter, str], ...]:
+        return (
+            (self.chat_limiter, telegram_chat_id),
+            (self.issue_limiter, issue_id),
+        )
+
+    def acquire(self, telegram_chat_id: str, issue_id: str):
+        """Take one token from both buckets or raise RateLimitExceeded"""
+        limits = self._limits(telegram_chat_id, issue_id)
+
+        # Check every bucket first so a rejection never consumes tokens
+        retry_after = max(limiter.check(key) for limiter, key in limits)
+        if retry_after > 0:
+            raise RateLimitExceeded("Too many messages", retry_after)
+
+        for limiter, key in limits:
+            limiter.consume(key)
+
+    def release(self, telegram_chat_id: str, issue_id: str):
+        """Give back the tokens of an `acquire` whose message was rejected later"""
+        for limiter, key in self._limits(telegram_chat_id, issue_id):
+            limiter.refund(key)
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight operations and rejects immediately instead of queueing"""
+
+    def __init__(self, max_in_flight: int, retry_after: float = 2.0):
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.in_flight >= self.max_in_flight:
+            raise RateLimitExceeded("Too many requests in progress", self.retry_after)
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
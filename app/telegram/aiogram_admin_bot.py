@@ -1,6 +1,7 @@
 import os
 import logging
 import asyncio
+from typing import NamedTuple, Optional
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import ParseMode, InlineKeyboardMarkup, InlineKeyboardButton
@@ -9,8 +10,15 @@ from aiogram.dispatcher.filters import Command
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.utils.exceptions import MessageNotModified
 
 from telegram.client.api_client import ApiClient, ApiClientError
+from models.issue import BulkOutcome, BulkResponse
+from telegram.transcript import TranscriptPages
+from telegram.notifications import NotificationDigest
+from database.realtime_events import get_realtime_source
+from monitoring.metrics import timed_handler
+from monitoring.metrics_server import start_metrics_server
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +32,29 @@ logger = logging.getLogger(__name__)
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000/api")
 ADMIN_BOT_TOKEN = os.getenv("TELEGRAM_ADMIN_BOT_TOKEN")
+METRICS_PORT = int(os.getenv("ADMIN_BOT_METRICS_PORT", "9102"))
+TRANSCRIPT_PAGE_SIZE = int(os.getenv("TRANSCRIPT_PAGE_SIZE", "15"))
+NOTIFY_DIGEST_SECONDS = float(os.getenv("NOTIFY_DIGEST_SECONDS", "2"))
+NOTIFY_DIGEST_LINES = int(os.getenv("NOTIFY_DIGEST_LINES", "5"))
+
+
+class BulkStatusAction(NamedTuple):
+    """A bulk action of the /issues list that changes the issues' status"""
+
+    status: str
+    button: str
+    question: str
+    done: str
+
+
+BULK_STATUS_ACTIONS = {
+    "open": BulkStatusAction(
+        "open", "Return all to AI", "Return {count} issues to the AI?", "Returned"
+    ),
+    "close": BulkStatusAction("closed", "Close all", "Close {count} issues?", "Closed"),
+}
+# Skipped issues listed in the result of a bulk action
+BULK_SKIPPED_SHOWN = 20
 
 # Initialize bot and dispatcher with FSM storage
 storage = MemoryStorage()
@@ -33,11 +64,35 @@ dp = Dispatcher(bot, storage=storage)
 # Initialize API client
 api_client = ApiClient(API_BASE_URL)
 
+# Rendered transcript pages, invalidated by realtime message events
+transcripts = TranscriptPages(api_client, page_size=TRANSCRIPT_PAGE_SIZE)
+
+
+async def is_reading(chat_id: str, issue_id: str) -> bool:
+    """Whether the admin has the issue open in the bot"""
+    # A bulk reply leaves the issue but keeps active_issue_id in the data
+    state = dp.current_state(chat=chat_id)
+    if await state.get_state() != AdminStates.in_issue.state:
+        return False
+    data = await state.get_data()
+    return data.get("active_issue_id") == issue_id
+
+
+# One notification per admin and issue, edited as new messages arrive
+notifications = NotificationDigest(
+    bot,
+    api_client,
+    is_reading,
+    window_seconds=NOTIFY_DIGEST_SECONDS,
+    lines_shown=NOTIFY_DIGEST_LINES,
+)
+
 # Define states for conversation handling
 
 
 class AdminStates(StatesGroup):
     in_issue = State()  # Admin is currently working on an issue
+    bulk_reply = State()  # Admin is writing one reply for the listed issues
 
 
 class CustomerSupportAdminBot:
@@ -45,26 +100,51 @@ class CustomerSupportAdminBot:
         # Register handlers
         self.register_handlers()
 
+    @staticmethod
+    def _timed(handler):
+        return timed_handler("admin_bot", handler)
+
     def register_handlers(self):
-        dp.register_message_handler(self.start_command, Command("start"))
-        dp.register_message_handler(self.help_command, Command("help"))
-        dp.register_message_handler(self.register_command, Command("register"))
-        dp.register_message_handler(self.list_issues_command, Command("issues"))
+        dp.register_message_handler(self._timed(self.start_command), Command("start"))
+        dp.register_message_handler(self._timed(self.help_command), Command("help"))
+        dp.register_message_handler(
+            self._timed(self.register_command), Command("register")
+        )
+        dp.register_message_handler(
+            self._timed(self.list_issues_command), Command("issues")
+        )
         dp.register_message_handler(
-            self.exit_issue_command, Command("exit"), state=AdminStates.in_issue
+            self._timed(self.exit_issue_command),
+            Command("exit"),
+            state=[AdminStates.in_issue, AdminStates.bulk_reply],
         )
 
         # Register callback query handler for inline buttons
         dp.register_callback_query_handler(
-            self.button_callback, lambda c: c.data.startswith("issue:")
+            self._timed(self.button_callback), lambda c: c.data.startswith("issue:")
+        )
+        dp.register_callback_query_handler(
+            self._timed(self.page_callback),
+            lambda c: c.data.startswith("page:"),
+            state="*",
+        )
+        dp.register_callback_query_handler(
+            self._timed(self.bulk_callback),
+            lambda c: c.data.startswith("bulk:"),
+            state="*",
         )
 
         # Register message handler for issue conversation
         dp.register_message_handler(
-            self.handle_message,
+            self._timed(self.handle_message),
             state=AdminStates.in_issue,
             content_types=types.ContentTypes.TEXT,
         )
+        dp.register_message_handler(
+            self._timed(self.handle_bulk_reply),
+            state=AdminStates.bulk_reply,
+            content_types=types.ContentTypes.TEXT,
+        )
 
     async def start_command(self, message: types.Message):
         """Send a message when the command /start is issued."""
@@ -82,8 +162,8 @@ class CustomerSupportAdminBot:
             "Here are the available commands:\n\n"
             "/start - Start the bot\n"
             "/register - Register yourself as an admin\n"
-            "/issues - List all open issues\n"
-            "/exit - Exit the current issue conversation\n"
+            "/issues - List all open issues, with bulk reply and close\n"
+            "/exit - Exit the current issue conversation or bulk reply\n"
             "/help - Show this help message"
         )
 
@@ -112,7 +192,7 @@ class CustomerSupportAdminBot:
                     "Sorry, I couldn't register you as an admin due to a technical issue. Please try again later."
                 )
 
-    async def list_issues_command(self, message: types.Message):
+    async def list_issues_command(self, message: types.Message, state: FSMContext):
         """List all open issues."""
         try:
             # Get only manual issues
@@ -136,6 +216,17 @@ class CustomerSupportAdminBot:
                     ]
                 )
 
+            # Bulk actions apply to the issues listed here, even if more
+            # issues need manual assistance by the time they are used
+            await state.update_data(listed_issue_ids=[i.issue_id for i in issues])
+            keyboard.append(
+                [InlineKeyboardButton("Reply to all", callback_data="bulk:reply")]
+                + [
+                    InlineKeyboardButton(action.button, callback_data=f"bulk:{name}")
+                    for name, action in BULK_STATUS_ACTIONS.items()
+                ]
+            )
+
             reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
             await message.reply(
                 f"Found {len(issues)} issues requiring manual assistance\n\nSelect an issue to view and respond:",
@@ -153,6 +244,11 @@ class CustomerSupportAdminBot:
         data = await state.get_data()
         issue_id = data.get("active_issue_id")
 
+        if await state.get_state() == AdminStates.bulk_reply.state:
+            await state.reset_state(with_data=False)
+            await message.reply("Bulk reply cancelled.")
+            return
+
         # Reset state
         await state.finish()
 
@@ -181,33 +277,105 @@ class CustomerSupportAdminBot:
 
         # Store issue ID in state
         await state.update_data(active_issue_id=issue_id)
+        notifications.mark_read(callback_query.message.chat.id, issue_id)
 
         # Fetch and display issue details
         await self.fetch_and_display_issue(callback_query.message, issue_id)
 
-    async def fetch_and_display_issue(self, message: types.Message, issue_id: str):
-        """Fetch and display issue details."""
-        try:
-            # Get issue messages
-            issue_with_messages = await api_client.get_issue_messages(issue_id)
+    async def page_callback(self, callback_query: types.CallbackQuery):
+        """Show an older or newer page of an issue transcript."""
+        await callback_query.answer()
+
+        _, issue_id, page = callback_query.data.split(":")
+        await self.fetch_and_display_issue(
+            callback_query.message, issue_id, page=int(page)
+        )
+
+    async def bulk_callback(
+        self, callback_query: types.CallbackQuery, state: FSMContext
+    ):
+        """Run a bulk action of the /issues list, confirming status changes."""
+        await callback_query.answer()
 
-            # Format messages
-            messages_text = "\n\n".join(
-                f"[{msg.from_user}]\n{msg.text}" for msg in issue_with_messages.messages
+        action, *confirmed = callback_query.data.split(":")[1:]
+        issue_ids = (await state.get_data()).get("listed_issue_ids")
+        if action == "cancel" or not issue_ids:
+            await callback_query.message.edit_text(
+                "Cancelled." if issue_ids else "Use /issues to list the issues again."
             )
+            return
 
-            response_text = (
-                f"Issue #{issue_id}\n\n"
-                f"Messages:\n{messages_text}\n\n"
-                f"Reply to this message to respond to the user.\n"
-                f"Use /exit to exit this conversation."
+        if action == "reply":
+            await AdminStates.bulk_reply.set()
+            await callback_query.message.edit_text(
+                f"Send the reply for the {len(issue_ids)} listed issues, "
+                f"or /exit to cancel."
             )
+            return
+
+        bulk_action = BULK_STATUS_ACTIONS[action]
+        if not confirmed:
+            keyboard = [
+                [
+                    InlineKeyboardButton("Yes", callback_data=f"bulk:{action}:yes"),
+                    InlineKeyboardButton("Cancel", callback_data="bulk:cancel"),
+                ]
+            ]
+            await callback_query.message.edit_text(
+                bulk_action.question.format(count=len(issue_ids)),
+                reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard),
+            )
+            return
+
+        try:
+            if bulk_action.status == "closed":
+                response = await api_client.close_issues(issue_ids)
+            else:
+                response = await api_client.update_issues_status(
+                    issue_ids, bulk_action.status
+                )
+            await callback_query.message.edit_text(
+                describe_bulk(bulk_action.done, response)
+            )
+        except ApiClientError as e:
+            logger.error(f"Error in bulk_callback: {e}")
+            await callback_query.message.edit_text(
+                "Sorry, I couldn't update the issues due to a technical issue. Please try again later."
+            )
+
+    async def handle_bulk_reply(self, message: types.Message, state: FSMContext):
+        """Send one admin message to every issue of the /issues list."""
+        if message.text.startswith("/"):
+            return
+
+        issue_ids = (await state.get_data()).get("listed_issue_ids", [])
+        await state.reset_state(with_data=False)
+        try:
+            response = await api_client.add_admin_message_to_issues(
+                issue_ids, message.text
+            )
+            await message.reply(describe_bulk("Replied to", response))
+        except ApiClientError as e:
+            logger.error(f"Error in handle_bulk_reply: {e}")
+            await message.reply(
+                "Sorry, I couldn't send your message due to a technical issue. Please try again later."
+            )
+
+    async def fetch_and_display_issue(
+        self, message: types.Message, issue_id: str, page: Optional[int] = None
+    ):
+        """Fetch and display a page of the issue transcript (newest by default)."""
+        try:
+            response_text, reply_markup = await transcripts.render(issue_id, page)
 
             # If message is a callback result, edit it, otherwise send new message
             if hasattr(message, "edit_text"):
-                await message.edit_text(response_text)
+                try:
+                    await message.edit_text(response_text, reply_markup=reply_markup)
+                except MessageNotModified:
+                    pass
             else:
-                await message.reply(response_text)
+                await message.reply(response_text, reply_markup=reply_markup)
         except ApiClientError as e:
             logger.error(f"Error in fetch_and_display_issue: {e}")
             error_message = "Sorry, I couldn't fetch the issue due to a technical issue. Please try again later."
@@ -247,6 +415,18 @@ class CustomerSupportAdminBot:
             )
 
 
+def describe_bulk(done: str, response: BulkResponse) -> str:
+    """Summary of a bulk action: the count done and the issues skipped"""
+    lines = [f"{done} {response.done} of {len(response.results)} issues."]
+    skipped = [r for r in response.results if r.outcome != BulkOutcome.DONE]
+    for result in skipped[:BULK_SKIPPED_SHOWN]:
+        reason = result.outcome.value.replace("_", " ")
+        lines.append(f"Issue #{result.issue_id}: {reason}")
+    if len(skipped) > BULK_SKIPPED_SHOWN:
+        lines.append(f"...and {len(skipped) - BULK_SKIPPED_SHOWN} more skipped")
+    return "\n".join(lines)
+
+
 async def handle_manual_mode(data):
     """Handle issue switched to manual mode from realtime events"""
     try:
@@ -257,26 +437,14 @@ async def handle_manual_mode(data):
             logger.error(f"Invalid manual mode data: {data}")
             return
 
-        # Create inline keyboard for quick action
-        keyboard = [
-            [InlineKeyboardButton("View Issue", callback_data=f"issue:{issue_id}")]
-        ]
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-
         # Get all registered admins
         admins = await api_client.get_all_admins()
 
-        # Send notification to all admins
+        # Send notification to all admins; new messages of the issue update it
         for admin in admins:
+            admin_chat_id = admin.telegram_chat_id
             try:
-                await bot.send_message(
-                    chat_id=admin.telegram_chat_id,
-                    text=f"Manual assistance requested!\n\n"
-                    f"Issue ID: {issue_id}\n"
-                    f"User: {username}\n\n"
-                    f"Click below to view and respond:",
-                    reply_markup=reply_markup,
-                )
+                await notifications.open_card(admin_chat_id, issue_id, username)
                 logger.info(f"Sent manual mode notification to admin {admin_chat_id}")
             except Exception as e:
                 logger.error(
@@ -296,79 +464,41 @@ async def handle_new_message(data):
             logger.error(f"Invalid new message data: {data}")
             return
 
-        # Get message details
-        from_user = message_data.get("from_user", "Unknown")
-        text = message_data.get("text", "")
-
-        # Create inline keyboard for quick action
-        keyboard = [
-            [InlineKeyboardButton("View Issue", callback_data=f"issue:{issue_id}")]
-        ]
-        reply_markup = InlineKeyboardMarkup(inline_keyboard=keyboard)
-
-        try:
-            # Get issue to verify it's in manual mode
-            issue = await api_client.get_issue(issue_id)
-
-            # Only send notifications for manual issues
-            if issue.status != "manual":
-                logger.info(f"Skipping notification for non-manual issue {issue_id}")
-                return
-
-            # Get all admins
-            admins = await api_client.get_all_admins()
+        # The newest transcript page of the issue is out of date now
+        transcripts.invalidate(issue_id, message_data.get("seq"))
 
-            # Send notifications to all admins
-            for admin in admins:
-                state = await dp.current_state(chat=admin.telegram_chat_id).get_data()
-
-                print(state)
-                admin_chat_id = admin.telegram_chat_id
-                try:
-                    # Check if this admin is already working on this issue
-                    if state.get("active_issue_id") == issue_id:
-                        # Send simple message without buttons for admins already working on this issue
-                        await bot.send_message(chat_id=admin_chat_id, text=text)
-                        logger.info(
-                            f"Sent simple update to admin {admin_chat_id} already working on issue {issue_id}"
-                        )
-                    else:
-                        # Send full notification with buttons for other admins
-                        await bot.send_message(
-                            chat_id=admin_chat_id,
-                            text=f"New message in Manual Issue #{issue_id}\n\n"
-                            f"From: {from_user}\n"
-                            f"Message: {text}\n\n"
-                            f"Click below to view and respond:",
-                            reply_markup=reply_markup,
-                        )
-                        logger.info(
-                            f"Sent notification with button to admin {admin_chat_id}"
-                        )
-                except Exception as e:
-                    logger.error(
-                        f"Error sending notification to admin {admin_chat_id}: {e}"
-                    )
-        except ApiClientError as e:
-            logger.error(f"Error getting issue in handle_new_message: {e}")
+        # Admins are notified once per burst of messages
+        notifications.add(issue_id, message_data)
     except Exception as e:
         logger.error(f"Error handling new message: {e}")
 
 
+async def handle_admin_message(data):
+    """Handle admin replies from realtime events"""
+    issue_id = data.get("issue_id")
+    if issue_id:
+        transcripts.invalidate(issue_id, data.get("message", {}).get("seq"))
+
+
 def main():
     """Start the bot."""
-    from database.realtime_handler import realtime_handler
+    realtime = get_realtime_source("admin_bot")
 
     # Create bot instance
     admin_bot = CustomerSupportAdminBot()
 
     # Register callbacks for realtime events
-    realtime_handler.register_manual_mode_callback(handle_manual_mode)
-    realtime_handler.register_new_message_callback(handle_new_message)
+    realtime.register_manual_mode_callback(handle_manual_mode)
+    realtime.register_new_message_callback(handle_new_message)
+    realtime.register_admin_message_callback(handle_admin_message)
 
     # Start realtime handler
     loop = asyncio.get_event_loop()
-    loop.create_task(realtime_handler.start())
+    loop.create_task(realtime.start())
+
+    # Expose metrics on a local port (0 disables it)
+    if METRICS_PORT:
+        loop.create_task(start_metrics_server(METRICS_PORT))
 
     # Start bot
     executor.start_polling(dp, skip_updates=True)
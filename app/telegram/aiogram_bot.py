@@ -1,6 +1,8 @@
 import os
 import logging
 import asyncio
+import multiprocessing
+from typing import Optional
 from dotenv import load_dotenv
 from aiogram import Bot, Dispatcher, types
 from aiogram.types import ParseMode
@@ -8,6 +10,10 @@ from aiogram.utils import executor
 from aiogram.dispatcher.filters import Command
 
 from telegram.client.api_client import ApiClient, ApiClientError
+from telegram.update_router import chat_id_of
+from database.realtime_events import OrderedLanes, Shard, get_realtime_source
+from monitoring.metrics import timed_handler
+from monitoring.metrics_server import start_metrics_server
 
 # Load environment variables
 load_dotenv()
@@ -21,6 +27,10 @@ logger = logging.getLogger(__name__)
 # Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000/api")
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+METRICS_PORT = int(os.getenv("USER_BOT_METRICS_PORT", "9101"))
+# Shard i of a sharded user bot serves metrics on this port + i
+SHARD_METRICS_PORT = int(os.getenv("USER_BOT_SHARD_METRICS_PORT", "9110"))
+SWEEP_INTERVAL = float(os.getenv("ISSUE_SWEEP_INTERVAL_SECONDS", "300"))
 
 # Initialize bot and dispatcher
 bot = Bot(token=BOT_TOKEN)
@@ -35,15 +45,19 @@ class CustomerSupportBot:
         # Register handlers
         self.register_handlers()
 
+    @staticmethod
+    def _timed(handler):
+        return timed_handler("user_bot", handler)
+
     def register_handlers(self):
-        dp.register_message_handler(self.start_command, Command("start"))
-        dp.register_message_handler(self.help_command, Command("help"))
-        dp.register_message_handler(self.new_issue_command, Command("new"))
-        dp.register_message_handler(self.status_command, Command("status"))
-        dp.register_message_handler(self.manual_command, Command("manual"))
-        dp.register_message_handler(self.close_command, Command("close"))
+        dp.register_message_handler(self._timed(self.start_command), Command("start"))
+        dp.register_message_handler(self._timed(self.help_command), Command("help"))
+        dp.register_message_handler(self._timed(self.new_issue_command), Command("new"))
+        dp.register_message_handler(self._timed(self.status_command), Command("status"))
+        dp.register_message_handler(self._timed(self.manual_command), Command("manual"))
+        dp.register_message_handler(self._timed(self.close_command), Command("close"))
         dp.register_message_handler(
-            self.handle_message, content_types=types.ContentTypes.TEXT
+            self._timed(self.handle_message), content_types=types.ContentTypes.TEXT
         )
 
     async def start_command(self, message: types.Message):
@@ -74,18 +88,16 @@ class CustomerSupportBot:
         username = message.from_user.username or f"user_{chat_id}"
 
         try:
-            # Check if user already has an open issue
-            existing_issue = await api_client.get_user_issue(chat_id)
-            if existing_issue:
+            # Returns the active issue instead if the user already has one
+            new_issue = await api_client.create_issue(chat_id, f"@{username}")
+            if not new_issue.created:
                 await message.reply(
-                    f"You already have an active support request (ID: {existing_issue.issue_id}).\n"
-                    f"Current status: {existing_issue.status}\n\n"
+                    f"You already have an active support request (ID: {new_issue.issue_id}).\n"
+                    f"Current status: {new_issue.status}\n\n"
                     f"Just send your messages and I'll help you!"
                 )
                 return
 
-            # Create new issue
-            new_issue = await api_client.create_issue(chat_id, f"@{username}")
             await message.reply(
                 f"Support request created successfully! (ID: {new_issue.issue_id})\n\n"
                 f"Please describe your issue, and I'll do my best to help you."
@@ -175,6 +187,15 @@ class CustomerSupportBot:
                 "Sorry, I couldn't close your support request due to a technical issue. Please try again later."
             )
 
+    @staticmethod
+    def _slow_down_text(retry_after: int = None) -> str:
+        """Friendly reply for messages rejected by the API rate limits"""
+        wait = f" about {retry_after} seconds" if retry_after else " a moment"
+        return (
+            "You're sending messages a bit too fast, or we're very busy right now. 🙏\n"
+            f"Please wait{wait} and send your message again."
+        )
+
     async def handle_message(self, message: types.Message):
         """Handle user messages and forward them to the API."""
         chat_id = str(message.chat.id)
@@ -201,6 +222,10 @@ class CustomerSupportBot:
                     "Use /new to create one."
                 )
         except ApiClientError as e:
+            if e.is_rate_limited:
+                await message.reply(self._slow_down_text(e.retry_after))
+                return
+
             logger.error(f"Error in handle_message: {e}")
             await message.reply(
                 "Sorry, I couldn't process your message due to a technical issue. Please try again later."
@@ -225,22 +250,89 @@ async def handle_admin_message(data):
         logger.error(f"Error handling admin message: {e}")
 
 
-def main():
-    """Start the bot."""
-    from database.realtime_handler import realtime_handler
+async def sweep_idle_issues():
+    """Periodically close idle issues and let their users know"""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            result = await api_client.sweep_issues()
+        except ApiClientError as e:
+            logger.error(f"Error sweeping issues: {e}")
+            continue
+
+        for issue in result.closed:
+            try:
+                await bot.send_message(
+                    chat_id=issue.telegram_chat_id,
+                    text=(
+                        f"Your support request (ID: {issue.issue_id}) was closed "
+                        "because there has been no activity for a while.\n"
+                        "Use /new if you still need help."
+                    ),
+                )
+            except Exception as e:
+                logger.error(f"Error notifying user {issue.telegram_chat_id}: {e}")
+
+        if result.closed or result.archived_issues:
+            logger.info(
+                f"Closed {len(result.closed)} idle issues, archived "
+                f"{result.archived_messages} messages of "
+                f"{result.archived_issues} issues"
+            )
+
+
+async def process_routed_updates(updates: multiprocessing.Queue):
+    """Handle the updates routed to this shard, in order per chat"""
+    Bot.set_current(bot)
+    Dispatcher.set_current(dp)
+
+    lanes = OrderedLanes()
+    loop = asyncio.get_running_loop()
+    while True:
+        data = await loop.run_in_executor(None, updates.get)
+        update = types.Update.to_object(data)
+        lanes.submit(str(chat_id_of(data)), dp.process_update(update))
+
+
+def main(
+    shard: Optional[Shard] = None, updates: Optional[multiprocessing.Queue] = None
+):
+    """Start the bot.
+
+    A shard (see run_bots.py) handles the updates of its chats, which the
+    update router passes in through `updates`, instead of polling Telegram.
+    """
+    index = shard[0] if shard else 0
+    worker = f"user_bot_{index}" if shard else "user_bot"
+    realtime = get_realtime_source(worker, shard)
 
     # Create bot instance
     customer_bot = CustomerSupportBot()
 
     # Register callback for admin messages
-    realtime_handler.register_admin_message_callback(handle_admin_message)
+    realtime.register_admin_message_callback(handle_admin_message)
 
     # Start realtime handler
     loop = asyncio.get_event_loop()
-    loop.create_task(realtime_handler.start())
+    loop.create_task(realtime.start())
+
+    # Expose metrics on a local port (0 disables it)
+    metrics_port = METRICS_PORT
+    if shard:
+        metrics_port = SHARD_METRICS_PORT + index if SHARD_METRICS_PORT else 0
+    if metrics_port:
+        loop.create_task(start_metrics_server(metrics_port))
+
+    # Close idle issues in the background (0 disables it); the first shard
+    # sweeps for all of them
+    if SWEEP_INTERVAL and index == 0:
+        loop.create_task(sweep_idle_issues())
 
     # Start bot
-    executor.start_polling(dp, skip_updates=True)
+    if updates is None:
+        executor.start_polling(dp, skip_updates=True)
+    else:
+        executor.start(dp, process_routed_updates(updates))
 
 
 if __name__ == "__main__":
@@ -2,12 +2,23 @@ import aiohttp
 import logging
 from typing import List, Optional, Dict, Any
 
-from models.issue import Issue, IssueResponse, IssueWithMessages, MessageResponse
+from models.issue import (
+    BulkResponse,
+    Issue,
+    IssueCreateResponse,
+    IssueResponse,
+    IssueWithMessages,
+    Message,
+    MessageResponse,
+    SweepResponse,
+)
 from models.admin import Admin
+from monitoring.metrics import BOT_API_REQUEST_SECONDS, instrument_async_methods
 
 logger = logging.getLogger(__name__)
 
 
+@instrument_async_methods(BOT_API_REQUEST_SECONDS)
 class ApiClient:
     """Client wrapper for the Customer Support API"""
 
@@ -15,14 +26,18 @@ class ApiClient:
         self.base_url = base_url
 
     async def _make_request(
-        self, method: str, endpoint: str, json_data: Optional[Dict[str, Any]] = None
+        self,
+        method: str,
+        endpoint: str,
+        json_data: Optional[Dict[str, Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Make a request to the API"""
         async with aiohttp.ClientSession() as session:
             try:
                 url = f"{self.base_url}{endpoint}"
                 async with getattr(session, method.lower())(
-                    url, json=json_data
+                    url, json=json_data, params=params
                 ) as response:
                     if response.status in (200, 201):
                         return await response.json()
@@ -37,6 +52,9 @@ class ApiClient:
                         raise ApiClientError(
                             f"Error {response.status}: {error_detail}",
                             status_code=response.status,
+                            retry_after=_parse_retry_after(
+                                response.headers.get("Retry-After")
+                            ),
                         )
             except aiohttp.ClientError as e:
                 logger.error(f"API request error: {e}")
@@ -54,14 +72,16 @@ class ApiClient:
                 return None
             raise
 
-    async def create_issue(self, telegram_chat_id: str, username: str) -> IssueResponse:
-        """Create a new issue"""
+    async def create_issue(
+        self, telegram_chat_id: str, username: str
+    ) -> IssueCreateResponse:
+        """Create a new issue, or get the active one (created is False then)"""
         data = await self._make_request(
             "POST",
             "/public/issues",
             {"telegram_chat_id": telegram_chat_id, "username": username},
         )
-        return IssueResponse(**data)
+        return IssueCreateResponse(**data)
 
     async def add_user_message(
         self, issue_id: str, message: str
@@ -110,11 +130,31 @@ class ApiClient:
         data = await self._make_request("GET", f"/private/issues/{issue_id}")
         return Issue(**data)
 
-    async def get_issue_messages(self, issue_id: str) -> IssueWithMessages:
-        """Get all messages for an issue"""
-        data = await self._make_request("GET", f"/private/issues/{issue_id}/messages")
+    async def get_issue_messages(
+        self, issue_id: str, after: int = 0, limit: Optional[int] = None
+    ) -> IssueWithMessages:
+        """Get the messages for an issue, or only those with seq > after"""
+        params = {"after": after}
+        if limit is not None:
+            params["limit"] = limit
+
+        data = await self._make_request(
+            "GET", f"/private/issues/{issue_id}/messages", params=params
+        )
         return IssueWithMessages(**data)
 
+    async def get_new_messages(
+        self, issue_id: str, after: int, limit: int = 100
+    ) -> List[Message]:
+        """Get every message after the given seq, following has_more"""
+        messages: List[Message] = []
+        while True:
+            page = await self.get_issue_messages(issue_id, after, limit)
+            messages.extend(page.messages)
+            if not page.has_more or not page.messages:
+                return messages
+            after = page.messages[-1].seq
+
     async def add_admin_message(self, issue_id: str, message: str) -> Dict[str, Any]:
         """Add an admin message to an issue"""
         data = await self._make_request(
@@ -127,11 +167,62 @@ class ApiClient:
         data = await self._make_request("POST", f"/private/issues/{issue_id}/close")
         return data
 
+    async def close_issues(self, issue_ids: List[str]) -> BulkResponse:
+        """Close many issues at once"""
+        data = await self._make_request(
+            "POST", "/private/issues/bulk/close", {"issue_ids": issue_ids}
+        )
+        return BulkResponse(**data)
+
+    async def update_issues_status(
+        self, issue_ids: List[str], status: str
+    ) -> BulkResponse:
+        """Set the status of many issues at once"""
+        data = await self._make_request(
+            "POST",
+            "/private/issues/bulk/status",
+            {"issue_ids": issue_ids, "status": status},
+        )
+        return BulkResponse(**data)
+
+    async def add_admin_message_to_issues(
+        self, issue_ids: List[str], message: str
+    ) -> BulkResponse:
+        """Add the same admin message to many issues"""
+        data = await self._make_request(
+            "POST",
+            "/private/issues/bulk/messages",
+            {"issue_ids": issue_ids, "message": message},
+        )
+        return BulkResponse(**data)
+
+    async def sweep_issues(self) -> SweepResponse:
+        """Close idle issues and archive old messages"""
+        data = await self._make_request("POST", "/private/issues/sweep")
+        return SweepResponse(**data)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[int]:
+    """Parse a Retry-After header given in seconds"""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
 
 class ApiClientError(Exception):
     """Exception raised for API client errors"""
 
-    def __init__(self, message: str, status_code: int = None):
+    def __init__(
+        self, message: str, status_code: int = None, retry_after: int = None
+    ):
         self.message = message
         self.status_code = status_code
+        self.retry_after = retry_after
         super().__init__(self.message)
+
+    @property
+    def is_rate_limited(self) -> bool:
+        return self.status_code == 429
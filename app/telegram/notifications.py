@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.exceptions import (
+    MessageCantBeEdited,
+    MessageNotModified,
+    MessageToEditNotFound,
+)
+
+from telegram.client.api_client import ApiClient
+from telegram.transcript import PAGE_CHROME, TELEGRAM_MESSAGE_LIMIT, fit_entries
+from monitoring.metrics import BOT_NOTIFICATIONS
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationCard:
+    """The live notification of one issue in one admin chat"""
+
+    __slots__ = ("username", "message_id", "lines", "unread")
+
+    def __init__(self, username: str, lines_shown: int):
+        self.username = username
+        self.message_id: Optional[int] = None
+        self.lines: Deque[str] = deque(maxlen=lines_shown)
+        self.unread = 0
+
+
+class NotificationDigest:
+    """New-message notifications, one edited Telegram message per admin and issue.
+
+    Messages of an issue are collected for `window_seconds` and then go out
+    together: each admin's card for the issue is edited with the latest lines
+    and the unread count, or sent if there is none yet. Admins reading the
+    issue get the new lines as one plain message instead. Telegram calls thus
+    grow with the number of busy issues, not of messages. Opening the issue
+    marks its card read; the next message starts a new one.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        api_client: ApiClient,
+        is_reading: Callable[[str, str], Awaitable[bool]],
+        window_seconds: float = 2.0,
+        lines_shown: int = 5,
+        max_cards: int = 1000,
+    ):
+        self.bot = bot
+        self.api_client = api_client
+        self.is_reading = is_reading
+        self.window_seconds = window_seconds
+        self.lines_shown = lines_shown
+        self.max_cards = max_cards
+        # issue_id -> messages waiting for the next flush of the issue
+        self._pending: Dict[str, List[dict]] = {}
+        self._flushers = set()
+        # (admin chat id, issue_id) -> card, LRU
+        self._cards: "OrderedDict[Tuple[str, str], NotificationCard]" = OrderedDict()
+
+    def add(self, issue_id: str, message: dict):
+        """Queue a user message of a manual issue for its admins"""
+        pending = self._pending.get(issue_id)
+        if pending is not None:
+            pending.append(message)
+            return
+
+        self._pending[issue_id] = [message]
+        task = asyncio.get_event_loop().create_task(self._flush_issue(issue_id))
+        self._flushers.add(task)
+        task.add_done_callback(self._flushers.discard)
+
+    def mark_read(self, chat_id, issue_id: str):
+        self._cards.pop((str(chat_id), issue_id), None)
+
+    async def open_card(self, chat_id, issue_id: str, username: str):
+        """Send a fresh card, e.g. when the issue is switched to manual mode"""
+        card = NotificationCard(username, self.lines_shown)
+        self._store(str(chat_id), issue_id, card)
+        await self._send(str(chat_id), issue_id, card)
+
+    async def _flush_issue(self, issue_id: str):
+        # One flush at a time per issue; messages arriving during a flush
+        # wait for the next window
+        while True:
+            await asyncio.sleep(self.window_seconds)
+            messages, self._pending[issue_id] = self._pending[issue_id], []
+            try:
+                await self._notify(issue_id, messages)
+            except Exception as e:
+                logger.error(f"Error notifying admins of issue {issue_id}: {e}")
+
+            if not self._pending[issue_id]:
+                del self._pending[issue_id]
+                return
+
+    async def _notify(self, issue_id: str, messages: List[dict]):
+        # Only manual issues need an admin
+        issue = await self.api_client.get_issue(issue_id)
+        if issue.status != "manual":
+            logger.info(f"Skipping notification for non-manual issue {issue_id}")
+            return
+
+        lines = [
+            f"{message.get('from_user', 'Unknown')}: {message.get('text', '')}"
+            for message in messages
+        ]
+        for admin in await self.api_client.get_all_admins():
+            chat_id = admin.telegram_chat_id
+            try:
+                if await self.is_reading(chat_id, issue_id):
+                    texts = [message.get("text", "") for message in messages]
+                    await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=fit_entries(texts, TELEGRAM_MESSAGE_LIMIT),
+                    )
+                    BOT_NOTIFICATIONS.inc(1, "sent")
+                else:
+                    await self._update_card(chat_id, issue_id, issue.username, lines)
+            except Exception as e:
+                logger.error(f"Error sending notification to admin {chat_id}: {e}")
+
+    async def _update_card(
+        self, chat_id: str, issue_id: str, username: str, lines: List[str]
+    ):
+        card = self._cards.get((chat_id, issue_id))
+        if card is None:
+            card = NotificationCard(username, self.lines_shown)
+        card.lines.extend(lines)
+        card.unread += len(lines)
+        self._store(chat_id, issue_id, card)
+
+        if card.message_id is not None:
+            try:
+                await self.bot.edit_message_text(
+                    self._render(issue_id, card),
+                    chat_id=chat_id,
+                    message_id=card.message_id,
+                    reply_markup=self._keyboard(issue_id),
+                )
+                BOT_NOTIFICATIONS.inc(1, "edited")
+                return
+            except MessageNotModified:
+                return
+            except (MessageToEditNotFound, MessageCantBeEdited):
+                # Deleted by the admin, or too old to edit
+                card.message_id = None
+
+        await self._send(chat_id, issue_id, card)
+
+    async def _send(self, chat_id: str, issue_id: str, card: NotificationCard):
+        sent = await self.bot.send_message(
+            chat_id=chat_id,
+            text=self._render(issue_id, card),
+            reply_markup=self._keyboard(issue_id),
+        )
+        card.message_id = sent.message_id
+        BOT_NOTIFICATIONS.inc(1, "sent")
+
+    def _store(self, chat_id: str, issue_id: str, card: NotificationCard):
+        self._cards[(chat_id, issue_id)] = card
+        self._cards.move_to_end((chat_id, issue_id))
+        while len(self._cards) > self.max_cards:
+            self._cards.popitem(last=False)
+
+    @staticmethod
+    def _render(issue_id: str, card: NotificationCard) -> str:
+        text = (
+            f"Manual assistance requested!\n\n"
+            f"Issue ID: {issue_id}\n"
+            f"User: {card.username}\n\n"
+        )
+        if card.unread:
+            body = fit_entries(
+                list(card.lines), TELEGRAM_MESSAGE_LIMIT - PAGE_CHROME, "\n"
+            )
+            text += f"Unread messages: {card.unread}\n{body}\n\n"
+        return text + "Click below to view and respond:"
+
+    @staticmethod
+    def _keyboard(issue_id: str) -> InlineKeyboardMarkup:
+        return InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton("View Issue", callback_data=f"issue:{issue_id}")]
+            ]
+        )
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from models.issue import Message
+from telegram.client.api_client import ApiClient
+
+# Telegram rejects messages longer than this
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Room left for the header and footer around the messages of a page
+PAGE_CHROME = 256
+
+
+def fit_entries(entries: List[str], limit: int, separator: str = "\n\n") -> str:
+    """Join entries within limit characters, trimming only the longest ones"""
+    budget = limit - len(separator) * max(len(entries) - 1, 0)
+    if sum(len(entry) for entry in entries) <= budget:
+        return separator.join(entries)
+
+    # Give every entry an equal share; whatever short entries leave unused
+    # is shared among the longer ones
+    cap, remaining, count = budget, budget, len(entries)
+    for length in sorted(len(entry) for entry in entries):
+        share = remaining // count
+        if length > share:
+            cap = share
+            break
+        remaining -= length
+        count -= 1
+
+    return separator.join(
+        entry if len(entry) <= cap else entry[: max(cap - 1, 0)] + "…"
+        for entry in entries
+    )
+
+
+class TranscriptPages:
+    """Paginated, cached transcripts of issue conversations.
+
+    Page n holds the messages with seq in (n * page_size, (n + 1) * page_size],
+    so a full page never changes and a new message only affects the newest
+    page. Rendered pages are cached per issue (LRU over issues) and checked
+    against the issue's last_seq, so a missed realtime event can't leave a
+    stale page behind.
+    """
+
+    def __init__(self, api_client: ApiClient, page_size: int = 15, max_issues=200):
+        self.api_client = api_client
+        self.page_size = page_size
+        self.max_issues = max_issues
+        # issue_id -> page -> (seq of the last message on the page, body)
+        self._pages: "OrderedDict[str, Dict[int, Tuple[int, str]]]" = OrderedDict()
+
+    def page_of(self, seq: int) -> int:
+        return max(seq - 1, 0) // self.page_size
+
+    def page_count(self, last_seq: int) -> int:
+        return self.page_of(last_seq) + 1
+
+    def invalidate(self, issue_id: str, seq: Optional[int] = None):
+        """Drop the cached page holding seq, or every page of the issue"""
+        pages = self._pages.get(issue_id)
+        if pages is None:
+            return
+
+        if seq is None:
+            del self._pages[issue_id]
+        else:
+            pages.pop(self.page_of(seq), None)
+
+    async def render(
+        self, issue_id: str, page: Optional[int] = None
+    ) -> Tuple[str, InlineKeyboardMarkup]:
+        """Text and navigation buttons for a page (the newest one by default)"""
+        issue = await self.api_client.get_issue(issue_id)
+        pages = self.page_count(issue.last_seq)
+        page = pages - 1 if page is None else min(max(page, 0), pages - 1)
+
+        body = await self._page_body(issue_id, page, issue.last_seq)
+        text = (
+            f"Issue #{issue_id} (page {page + 1}/{pages})\n\n"
+            f"Messages:\n{body}\n\n"
+            f"Reply to this message to respond to the user.\n"
+            f"Use /exit to exit this conversation."
+        )
+        return text, self._keyboard(issue_id, page, pages)
+
+    async def _page_body(self, issue_id: str, page: int, last_seq: int) -> str:
+        expected_seq = min(last_seq, (page + 1) * self.page_size)
+
+        pages = self._pages.setdefault(issue_id, {})
+        self._pages.move_to_end(issue_id)
+        cached = pages.get(page)
+        if cached and cached[0] == expected_seq:
+            return cached[1]
+
+        page_messages = await self.api_client.get_issue_messages(
+            issue_id, after=page * self.page_size, limit=self.page_size
+        )
+        messages = page_messages.messages
+        body = self._format(messages)
+
+        # The issue may have been evicted or invalidated meanwhile
+        pages = self._pages.setdefault(issue_id, pages)
+        pages[page] = (messages[-1].seq if messages else expected_seq, body)
+        while len(self._pages) > self.max_issues:
+            self._pages.popitem(last=False)
+
+        return body
+
+    @staticmethod
+    def _format(messages: List[Message]) -> str:
+        if not messages:
+            return "(no messages yet)"
+
+        return fit_entries(
+            [f"[{msg.from_user}]\n{msg.text}" for msg in messages],
+            TELEGRAM_MESSAGE_LIMIT - PAGE_CHROME,
+        )
+
+    @staticmethod
+    def _keyboard(issue_id: str, page: int, pages: int) -> InlineKeyboardMarkup:
+        buttons = []
+        if page > 0:
+            buttons.append(
+                InlineKeyboardButton(
+                    "« Older", callback_data=f"page:{issue_id}:{page - 1}"
+                )
+            )
+        if page < pages - 1:
+            buttons.append(
+                InlineKeyboardButton(
+                    "Newer »", callback_data=f"page:{issue_id}:{page + 1}"
+                )
+            )
+
+        return InlineKeyboardMarkup(inline_keyboard=[buttons] if buttons else [])
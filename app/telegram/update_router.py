@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from aiogram import Bot
+from database.realtime_events import shard_for
+from monitoring.metrics import BOT_UPDATES_ROUTED
+from monitoring.metrics_server import start_metrics_server
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+METRICS_PORT = int(os.getenv("USER_BOT_METRICS_PORT", "9101"))
+POLL_TIMEOUT = 20
+
+
+def chat_id_of(update: Dict[str, Any]) -> Optional[int]:
+    """Chat an update belongs to, which decides the shard handling it"""
+    for field in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if field in update:
+            return update[field]["chat"]["id"]
+
+    callback_query = update.get("callback_query")
+    if callback_query:
+        if "message" in callback_query:
+            return callback_query["message"]["chat"]["id"]
+        return callback_query["from"]["id"]
+
+    for field in update.values():
+        if isinstance(field, dict) and "from" in field:
+            return field["from"]["id"]
+    return None
+
+
+async def route_updates(shards: List[multiprocessing.Queue]):
+    """Long-poll Telegram and hand each update to the shard owning its chat.
+
+    Telegram allows one getUpdates consumer per bot token, so the shards never
+    poll themselves. Updates without a chat go to the first shard.
+    """
+    bot = Bot(token=BOT_TOKEN)
+
+    # Skip updates that arrived while the bot was down, like skip_updates=True
+    pending = await bot.get_updates(offset=-1, timeout=1)
+    offset = pending[-1].update_id + 1 if pending else None
+
+    logger.info(f"Routing user bot updates to {len(shards)} shards")
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Error getting updates: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            data = update.to_python()
+            chat_id = chat_id_of(data)
+            shard = shard_for(chat_id, len(shards)) if chat_id is not None else 0
+            shards[shard].put(data)
+            BOT_UPDATES_ROUTED.inc(1, str(shard))
+
+
+async def serve(shards: List[multiprocessing.Queue]):
+    # Expose metrics on a local port (0 disables it)
+    if METRICS_PORT:
+        await start_metrics_server(METRICS_PORT)
+
+    await route_updates(shards)
+
+
+def main(shards: List[multiprocessing.Queue]):
+    """Run the update router feeding the given shard queues"""
+    asyncio.run(serve(shards))
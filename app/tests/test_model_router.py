@@ -0,0 +1,36 @@
+import pytest
+from services.openai_service import ModelRouter
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "У меня не работает оплата",
+        "我的订单没有到",
+        "Mi pedido no llegó 😞",
+        "спасибо, но заказ так и не пришёл 👍",
+    ],
+)
+def test_non_latin_and_mixed_messages_are_real_messages(text):
+    assert ModelRouter.classify(text) is None
+
+
+@pytest.mark.parametrize("text", ["👍", "🙏🙏", "!!", "👌 :)"])
+def test_emoji_only_messages_are_acknowledgements(text):
+    assert ModelRouter.classify(text) == "acknowledgement"
+
+
+@pytest.mark.parametrize(
+    "text, kind",
+    [
+        ("Thanks!", "acknowledgement"),
+        ("ok thanks 👍", "acknowledgement"),
+        ("Hi", "greeting"),
+    ],
+)
+def test_english_canned_messages(text, kind):
+    assert ModelRouter.classify(text) == kind
+
+
+def test_blank_message_is_not_canned():
+    assert ModelRouter.classify("   ") is None